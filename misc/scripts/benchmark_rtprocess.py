@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Throughput benchmark of the real time processing functions.
+
+Every predefined process of obspy.realtime.signal is applied to random data
+split into packets, as done by RtTrace.append() for every appended packet.
+Throughput is given in samples per second for a single channel, including
+the creation of a Trace object per packet.
+
+:copyright:
+    The ObsPy Development Team (devs@obspy.org)
+:license:
+    GNU Lesser General Public License, Version 3
+    (http://www.gnu.org/copyleft/lesser.html)
+"""
+from obspy import Trace, UTCDateTime
+from obspy.realtime import RtTrace
+from obspy.realtime.rttrace import _applyRtProcess
+import numpy as np
+import time
+
+
+STARTTIME = UTCDateTime(2012, 1, 1)
+PROCESSES = [
+    ('integrate', {}),
+    ('differentiate', {}),
+    ('boxcar', {'width': 50}),
+    ('tauc', {'width': 50}),
+    ('kurtosis', {'win': 3.0}),
+    ('mwpIntegral', {'mem_time': 240, 'ref_time': STARTTIME + 10,
+                     'max_time': 120, 'gain': 1.610210e+09}),
+]
+
+
+def benchmark(process, options, npts=20000, packet=512, sampling_rate=20.0,
+              repeat=5):
+    """
+    Returns the throughput of a real time process in samples per second
+    (best of ``repeat`` runs).
+    """
+    np.random.seed(815)
+    data = np.random.randn(npts)
+    header = {'network': 'XX', 'station': 'TEST', 'channel': 'BHZ',
+              'sampling_rate': sampling_rate}
+    best = None
+    for _i in xrange(repeat):
+        rt_trace = RtTrace()
+        rt_trace.registerRtProcess(process, **options)
+        entry = rt_trace.processing[0]
+        t = time.time()
+        for i in xrange(0, npts, packet):
+            header['starttime'] = STARTTIME + i / sampling_rate
+            tr = Trace(data=data[i:i + packet].copy(), header=header)
+            _applyRtProcess(entry, tr)
+        elapsed = time.time() - t
+        if best is None or elapsed < best:
+            best = elapsed
+    return npts / best
+
+
+if __name__ == '__main__':
+    print "samples/s per channel, 20000 samples in 512 sample packets"
+    for process, options in PROCESSES:
+        print "%-15s %.1e" % (process, benchmark(process, options))
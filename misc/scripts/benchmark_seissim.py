@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of instrument simulation with cached spectral operators.
+
+Runs Stream.simulate() on three day-long 20 Hz components of the same
+instrument (STS-2 removal, 1 Hz simulation, pre_filt) with the operator cache
+of obspy.signal.invsim disabled, with a cold and with a warm cache.
+
+:copyright:
+    The ObsPy Development Team (devs@obspy.org)
+:license:
+    GNU Lesser General Public License, Version 3
+    (http://www.gnu.org/copyleft/lesser.html)
+"""
+from obspy import Stream, Trace, UTCDateTime
+from obspy.signal import invsim, cornFreq2Paz
+import numpy as np
+import time
+
+
+PAZ_STS2 = {'poles': [-0.037004 + 0.037016j, -0.037004 - 0.037016j,
+                      -251.33 + 0j, -131.04 - 467.29j, -131.04 + 467.29j],
+            'zeros': [0j, 0j], 'gain': 60077000.0,
+            'sensitivity': 2516778400.0}
+
+
+def getStream(sampling_rate=20.0, duration=86400):
+    """
+    Returns three components of random data of the same station.
+    """
+    np.random.seed(815)
+    st = Stream()
+    for cha in ('BHZ', 'BHN', 'BHE'):
+        header = {'network': 'XX', 'station': 'TEST', 'channel': cha,
+                  'sampling_rate': sampling_rate,
+                  'starttime': UTCDateTime(2012, 1, 1)}
+        data = np.random.randn(int(duration * sampling_rate)) * 1e4
+        st.append(Trace(data=data, header=header))
+    return st
+
+
+def benchmark(st, repeat=3):
+    """
+    Returns the best run times of Stream.simulate() in seconds without
+    cache, with a cold cache and with a warm cache.
+    """
+    kwargs = {'paz_remove': PAZ_STS2, 'paz_simulate': cornFreq2Paz(1.0),
+              'pre_filt': (0.005, 0.01, 8.0, 9.0)}
+    cache_bytes = invsim.SIMULATION_CACHE_BYTES
+    times = {'none': [], 'cold': [], 'warm': []}
+    try:
+        for _i in xrange(repeat):
+            invsim.SIMULATION_CACHE_BYTES = 0
+            invsim.clearSimulationCache()
+            t = time.time()
+            st.copy().simulate(**kwargs)
+            times['none'].append(time.time() - t)
+            invsim.SIMULATION_CACHE_BYTES = cache_bytes
+            invsim.clearSimulationCache()
+            t = time.time()
+            st.copy().simulate(**kwargs)
+            times['cold'].append(time.time() - t)
+            t = time.time()
+            st.copy().simulate(**kwargs)
+            times['warm'].append(time.time() - t)
+    finally:
+        invsim.SIMULATION_CACHE_BYTES = cache_bytes
+        invsim.clearSimulationCache()
+    return min(times['none']), min(times['cold']), min(times['warm'])
+
+
+if __name__ == '__main__':
+    st = getStream()
+    none, cold, warm = benchmark(st)
+    print "%d traces of %d samples" % (len(st), st[0].stats.npts)
+    print "no cache:   %.2f s" % none
+    print "cold cache: %.2f s" % cold
+    print "warm cache: %.2f s" % warm
@@ -1745,6 +1745,10 @@ class Stream(object):
         are performed in one go in the frequency domain, otherwise only the
         specified step is performed.
 
+        The combined spectral operator is cached and reused for all traces
+        of the same instrument with the same number of samples and sampling
+        rate.
+
         .. note::
 
             This operation is performed in place on the actual data arrays. The
@@ -1878,6 +1882,14 @@ class Stream(object):
             This also makes an entry with information on the applied processing
             in ``stats.processing`` of every trace.
 
+        .. note::
+
+            Traces with identical sampling rate and number of samples are
+            processed together in one call of the respective batch variant of
+            the trigger routine (see
+            :data:`obspy.signal.trigger.BATCH_TRIGGER_FUNCTIONS`), so the
+            overhead is nearly independent of the number of traces.
+
         .. rubric:: _`Supported Trigger`
 
         ``'classicstalta'``
@@ -1919,8 +1931,31 @@ class Stream(object):
             st.trigger('recstalta', sta=3, lta=10)
             st.plot()
         """
+        from obspy.signal.trigger import BATCH_TRIGGER_FUNCTIONS
+        batch_func = BATCH_TRIGGER_FUNCTIONS.get(type.lower())
+        if batch_func is None:
+            for tr in self:
+                tr.trigger(type, **options)
+            return
+        # group traces that can be stacked into one 2-D array
+        groups = {}
         for tr in self:
-            tr.trigger(type, **options)
+            key = (tr.stats.sampling_rate, tr.stats.npts)
+            groups.setdefault(key, []).append(tr)
+        for (spr, _), traces in groups.iteritems():
+            if len(traces) == 1:
+                traces[0].trigger(type, **options)
+                continue
+            kwargs = options.copy()
+            for key in ['sta', 'lta']:
+                if key in kwargs:
+                    kwargs['n%s' % (key)] = int(kwargs.pop(key) * spr)
+            data = np.array([tr.data for tr in traces], dtype='float64')
+            charfct = batch_func(data, **kwargs)
+            proc_info = "trigger:%s:%s" % (type.lower(), kwargs)
+            for tr, cft in zip(traces, charfct):
+                tr.data = cft
+                tr._addProcessingInfo(proc_info)
 
     def resample(self, sampling_rate, window='hanning', no_filter=True,
                  strict_length=False):
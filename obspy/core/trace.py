@@ -1088,6 +1088,10 @@ class Trace(object):
         performed in one go in the frequency domain, otherwise only the
         specified step is performed.
 
+        The combined spectral operator is cached, so simulating many traces
+        of the same instrument with the same number of samples and sampling
+        rate only evaluates the instrument responses once.
+
         .. note::
 
             This operation is performed in place on the actual data arrays. The
@@ -41,7 +41,7 @@ Basic Usage
         st.plot()
 """
 
-from client import Client
+from client import Client, PooledClient
 
 
 if __name__ == '__main__':
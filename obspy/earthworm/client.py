@@ -12,8 +12,12 @@ Earthworm Wave Server client for ObsPy.
 """
 
 from fnmatch import fnmatch
-from obspy import Stream, UTCDateTime
-from obspy.earthworm.waveserver import readWaveServerV, getMenu
+from obspy import Stream, Trace, UTCDateTime
+from obspy.earthworm.waveserver import readWaveServerV, getMenu, \
+    WaveServerConnection
+import Queue
+import threading
+import time
 
 
 class Client(object):
@@ -224,6 +228,202 @@ class Client(object):
         return response
 
 
+class PooledClient(Client):
+    """
+    A Earthworm Wave Server client keeping its connections open.
+
+    Up to ``max_connections`` connections to the server are kept open and
+    reused, many channels are requested concurrently over these
+    connections. The menu of the server is cached for ``menu_ttl`` seconds.
+
+    :type host: str
+    :param host: Host name of the remote Earthworm Wave Server server.
+    :type port: int
+    :param port: Port of the remote Earthworm Wave Server server.
+    :type timeout: int, optional
+    :param timeout: Seconds before a connection timeout is raised (default is
+        ``None``).
+    :type debug: bool, optional
+    :param debug: Enables verbose output of the connection handling (default is
+        ``False``).
+    :type max_connections: int, optional
+    :param max_connections: Maximum number of open connections (default is
+        ``4``).
+    :type menu_ttl: float, optional
+    :param menu_ttl: Seconds the menu of the server is cached (default is
+        ``60``).
+
+    .. rubric:: Example
+
+    >>> from obspy.earthworm.client import PooledClient
+    >>> from obspy import UTCDateTime
+    >>> client = PooledClient("pele.ess.washington.edu", 16017)
+    >>> t = UTCDateTime() - 2000  # now - 2000 seconds
+    >>> st = client.getWaveforms([('UW', 'TUCA', '', 'BH?', t, t + 10),
+    ...                           ('UW', 'LON', '', 'BHZ', t, t + 10)])
+    ... # doctest: +SKIP
+    >>> client.close()
+    """
+    def __init__(self, host, port, timeout=None, debug=False,
+                 max_connections=4, menu_ttl=60.0):
+        """
+        Initializes a pooled Earthworm Wave Server client.
+
+        See :class:`obspy.earthworm.client.PooledClient` for all parameters.
+        """
+        Client.__init__(self, host, port, timeout=timeout, debug=debug)
+        self.max_connections = max_connections
+        self.menu_ttl = menu_ttl
+        self._pool = Queue.Queue()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._menu = None
+        self._menu_time = None
+
+    def _acquire(self):
+        """
+        Returns an idle connection, opens a new one if possible.
+        """
+        try:
+            return self._pool.get_nowait()
+        except Queue.Empty:
+            pass
+        with self._lock:
+            if len(self._connections) < self.max_connections:
+                conn = WaveServerConnection(self.host, self.port,
+                                            self.timeout)
+                self._connections.append(conn)
+                return conn
+        return self._pool.get()
+
+    def _release(self, conn):
+        self._pool.put(conn)
+
+    def close(self):
+        """
+        Closes all connections of the pool.
+        """
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+
+    def getMenu(self):
+        """
+        Returns the cached list of tanks on the server.
+
+        See :func:`obspy.earthworm.waveserver.getMenu` for the format.
+        """
+        now = time.time()
+        if self._menu is None or now - self._menu_time > self.menu_ttl:
+            conn = self._acquire()
+            try:
+                self._menu = conn.getMenu()
+            finally:
+                self._release(conn)
+            self._menu_time = now
+        return self._menu
+
+    def availability(self, network="*", station="*", location="*",
+                     channel="*"):
+        """
+        Gets a list of data available on the server.
+
+        See :meth:`obspy.earthworm.client.Client.availability`, the menu of
+        the server is cached for ``menu_ttl`` seconds.
+        """
+        pattern = ".".join((network, station, location, channel))
+        response = [(x[3], x[1], x[4], x[2], UTCDateTime(x[5]),
+                     UTCDateTime(x[6])) for x in self.getMenu()]
+        return [x for x in response if fnmatch(".".join(x[:4]), pattern)]
+
+    def getWaveform(self, network, station, location, channel, starttime,
+                    endtime, cleanup=True):
+        """
+        Retrieves waveform data from Earthworm Wave Server and returns an ObsPy
+        Stream object.
+
+        See :meth:`getWaveforms`, wildcards are allowed in all codes.
+        """
+        return self.getWaveforms([(network, station, location, channel,
+                                   starttime, endtime)], cleanup=cleanup)
+
+    def getWaveforms(self, requests, cleanup=True):
+        """
+        Retrieves waveform data of many channels concurrently.
+
+        :type requests: list of tuples
+        :param requests: Network, station, location, channel, starttime and
+            endtime of each request. Network, station, location and channel
+            codes may contain wildcards which are resolved with the cached
+            menu of the server. Use ``''`` or ``'--'`` for empty location
+            codes.
+        :type cleanup: bool
+        :param cleanup: Specifies whether perfectly aligned traces should be
+            merged or not.
+        :return: ObsPy :class:`~obspy.core.stream.Stream` object with the
+            traces in the order of the requests.
+        """
+        # resolve wildcards with the menu
+        jobs = []
+        for network, station, location, channel, starttime, endtime in \
+                requests:
+            if location == '':
+                location = '--'
+            codes = (network, station, location, channel)
+            if any(c in "".join(codes) for c in "*?["):
+                scnls = [(x[1], x[3], x[0], x[2] or '--') for x in
+                         sorted(self.availability(*codes))]
+            else:
+                scnls = [(station, channel, network, location)]
+            for scnl in scnls:
+                jobs.append((scnl, starttime, endtime))
+        results = [None] * len(jobs)
+        work = Queue.Queue()
+        for i, job in enumerate(jobs):
+            work.put((i, job))
+        errors = []
+
+        def worker():
+            conn = self._acquire()
+            try:
+                while True:
+                    try:
+                        i, (scnl, starttime, endtime) = work.get_nowait()
+                    except Queue.Empty:
+                        break
+                    results[i] = conn.readWaveServerV(
+                        scnl, starttime, endtime, merge=cleanup)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self._release(conn)
+
+        threads = [threading.Thread(target=worker)
+                   for _i in xrange(min(self.max_connections, len(jobs)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        st = Stream()
+        for (scnl, starttime, endtime), (headers, all_data) in \
+                zip(jobs, results):
+            traces = []
+            for header, data in zip(headers, all_data):
+                stats = {'network': header['network'],
+                         'station': header['station'],
+                         'location': header['location'],
+                         'channel': header['channel'],
+                         'sampling_rate': header['sampling_rate'],
+                         'starttime': UTCDateTime(header['starttime'])}
+                traces.append(Trace(data=data, header=stats))
+            part = Stream(traces=traces)
+            part.trim(starttime, endtime)
+            st += part
+        return st
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod(exclude_empty=True)
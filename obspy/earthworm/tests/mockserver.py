@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+A minimal local Earthworm Wave Server for testing.
+
+It answers MENU and GETSCNLRAW requests, several requests can be sent over
+one connection.
+
+:copyright:
+    The ObsPy Development Team (devs@obspy.org)
+:license:
+    GNU General Public License (GPLv2)
+    (http://www.gnu.org/licenses/old-licenses/gpl-2.0.html)
+"""
+
+import SocketServer
+import numpy as np
+import struct
+import threading
+
+
+def tracebuf2Packets(trace, samples=100, datatype='s4'):
+    """
+    Splits a Trace into tracebuf2 packets.
+
+    :rtype: list of tuples
+    :return: Start time, end time and binary tracebuf2 packet.
+    """
+    endian = '>' if datatype[0] in 'ts' else '<'
+    dtype = np.dtype(endian + datatype[0].replace('s', 'i').replace(
+        't', 'f') + datatype[1])
+    stats = trace.stats
+    location = stats.location or '--'
+    packets = []
+    for i in xrange(0, stats.npts, samples):
+        data = trace.data[i:i + samples].astype(dtype)
+        start = stats.starttime.timestamp + i * stats.delta
+        end = start + (len(data) - 1) * stats.delta
+        head = struct.pack(endian + '2i3d7s9s4s3s2s3s2s2s', 1, len(data),
+                           start, end, stats.sampling_rate, stats.station,
+                           stats.network, stats.channel, location, '20',
+                           datatype, '', '')
+        packets.append((start, end, head + data.tostring()))
+    return packets
+
+
+class _MockWaveServerHandler(SocketServer.StreamRequestHandler):
+    """
+    Handles a single client connection of a MockWaveServer.
+    """
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            server.requests.append(line.strip())
+            tokens = line.split()
+            if tokens[0] == 'MENU:':
+                entries = []
+                for (sta, chan, net, loc), packets in \
+                        sorted(server.tanks.items()):
+                    entries.append('1 %s %s %s %s %f %f %s' % (
+                        sta, chan, net, loc, packets[0][0], packets[-1][1],
+                        server.datatype))
+                self.wfile.write('%s %s \n' % (tokens[1], ' '.join(entries)))
+            elif tokens[0] == 'GETSCNLRAW:':
+                rid = tokens[1]
+                scnl = tuple(tokens[2:6])
+                start, end = float(tokens[6]), float(tokens[7])
+                packets = server.tanks.get(scnl)
+                if packets is None:
+                    self.wfile.write('%s 0 %s FN\n' % (rid, ' '.join(scnl)))
+                    continue
+                dat = ''.join([p[2] for p in packets
+                               if p[1] >= start and p[0] <= end])
+                self.wfile.write('%s 1 %s F %s %f %f %d\n' % (
+                    rid, ' '.join(scnl), server.datatype, start, end,
+                    len(dat)))
+                self.wfile.write(dat)
+            else:
+                self.wfile.write('ERROR\n')
+
+
+class MockWaveServer(SocketServer.ThreadingTCPServer):
+    """
+    Earthworm Wave Server on localhost serving the given traces.
+
+    :type stream: :class:`~obspy.core.stream.Stream`
+    :param stream: Traces to serve, one tank per trace.
+    :type datatype: str, optional
+    :param datatype: tracebuf2 data type of the packets.
+
+    The server runs in a background thread, its address is available as
+    :attr:`host` and :attr:`port`.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, stream, datatype='s4'):
+        SocketServer.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0),
+                                                 _MockWaveServerHandler)
+        self.datatype = datatype
+        self.tanks = {}
+        for tr in stream:
+            scnl = (tr.stats.station, tr.stats.channel, tr.stats.network,
+                    tr.stats.location or '--')
+            self.tanks[scnl] = tracebuf2Packets(tr, datatype=datatype)
+        self.connections = 0
+        self.requests = []
+        self.host, self.port = self.server_address
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Shuts the server down.
+        """
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+The obspy.earthworm.client.PooledClient test suite.
+"""
+from obspy import read, Stream
+from obspy.earthworm import PooledClient
+from obspy.earthworm.tests.mockserver import MockWaveServer, \
+    tracebuf2Packets
+from obspy.earthworm import waveserver
+from obspy.earthworm.waveserver import decodeTraceBuf2, tracebuf2, \
+    WaveServerConnection
+import numpy as np
+import unittest
+import warnings
+
+
+class PooledClientTestCase(unittest.TestCase):
+    """
+    Test cases for obspy.earthworm.client.PooledClient.
+    """
+    def setUp(self):
+        # three channels of two stations
+        st = read()
+        for tr in st:
+            tr.data = tr.data.astype('int32')
+        st2 = st.copy()
+        for tr in st2:
+            tr.stats.station = 'XYZ'
+            tr.stats.location = '00'
+            tr.data = tr.data[::-1].copy()
+        self.stream = st + st2
+        self.server = MockWaveServer(self.stream)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_decodeTraceBuf2(self):
+        """
+        Vectorized decoding has to match decoding packet by packet.
+        """
+        tr = self.stream[0]
+        packets = tracebuf2Packets(tr, samples=70)
+        little = tracebuf2Packets(self.stream[1], samples=70, datatype='i2')
+        dat = ''.join([p[2] for p in packets + little])
+        headers, all_data = decodeTraceBuf2(dat)
+        self.assertEqual(list(headers['channel']), ['EHZ', 'EHN'])
+        self.assertEqual(list(headers['npts']), [3000, 3000])
+        np.testing.assert_array_equal(all_data[0], tr.data)
+        np.testing.assert_array_equal(all_data[1],
+                                      self.stream[1].data.astype('int16'))
+        self.assertEqual(all_data[1].dtype, np.dtype('=i2'))
+        self.assertEqual(headers['starttime'][0], tr.stats.starttime.timestamp)
+        # a missing packet results in two blocks
+        dat = ''.join([p[2] for p in packets[:3] + packets[4:]])
+        headers, all_data = decodeTraceBuf2(dat)
+        self.assertEqual(list(headers['npts']), [210, 2720])
+        # one block per packet without merging
+        headers, all_data = decodeTraceBuf2(dat, merge=False)
+        self.assertEqual(len(headers), len(packets) - 1)
+        tb = tracebuf2()
+        tb.readTB2(packets[-1][2])
+        np.testing.assert_array_equal(all_data[-1], tb.data)
+        self.assertEqual(headers['starttime'][-1], tb.start.timestamp)
+        # truncated packets are ignored
+        headers, all_data = decodeTraceBuf2(dat[:-10])
+        self.assertEqual(headers['npts'].sum(), 2930 - 3000 % 70)
+        self.assertEqual(len(decodeTraceBuf2('')[0]), 0)
+
+    def test_getWaveforms(self):
+        """
+        Concurrent requests over persistent connections with cached menu.
+        """
+        client = PooledClient(self.server.host, self.server.port, timeout=10,
+                              max_connections=2)
+        t = self.stream[0].stats.starttime
+        st = client.getWaveforms([('BW', 'RJOB', '', 'EH?', t + 5, t + 10),
+                                  ('BW', 'XYZ', '00', '*', t + 5, t + 10),
+                                  ('BW', 'RJOB', '', 'EHZ', t, t + 30)])
+        self.assertEqual([tr.id for tr in st], [
+            'BW.RJOB..EHE', 'BW.RJOB..EHN', 'BW.RJOB..EHZ',
+            'BW.XYZ.00.EHE', 'BW.XYZ.00.EHN', 'BW.XYZ.00.EHZ',
+            'BW.RJOB..EHZ'])
+        expected = self.stream.copy()
+        expected.trim(t + 5, t + 10)
+        for tr in st[:6]:
+            self.assertEqual(tr.stats.npts, 501)
+            exp = expected.select(id=tr.id)[0]
+            self.assertEqual(tr.stats.starttime, exp.stats.starttime)
+            np.testing.assert_array_equal(tr.data, exp.data)
+        np.testing.assert_array_equal(st[-1].data, self.stream[0].data)
+        # connections are reused and the menu is requested once
+        st = client.getWaveform('BW', 'RJOB', '', 'EH*', t, t + 1)
+        self.assertEqual(len(st), 3)
+        self.assertEqual(self.server.connections, 2)
+        menus = [r for r in self.server.requests if r.startswith('MENU')]
+        self.assertEqual(len(menus), 1)
+        self.assertEqual(len(client.availability('BW', 'XYZ')), 3)
+        # unknown channels return empty streams, closed connections are
+        # reopened
+        client.close()
+        st = client.getWaveform('BW', 'RJOB', '', 'BHZ', t, t + 1)
+        self.assertEqual(st, Stream())
+        self.assertEqual(self.server.connections, 3)
+        client.close()
+
+    def test_readWaveServerVFlag(self):
+        """
+        Requests not answered with flag F warn and return no data.
+        """
+        conn = WaveServerConnection(self.server.host, self.server.port,
+                                    timeout=10)
+        t = self.stream[0].stats.starttime.timestamp
+        # warnings already issued by other tests are not repeated otherwise
+        getattr(waveserver, '__warningregistry__', {}).clear()
+        try:
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter('always')
+                headers, all_data = conn.readWaveServerV(
+                    ('RJOB', 'BHZ', 'BW', '--'), t, t + 1)
+        finally:
+            conn.close()
+        self.assertEqual(len(headers), 0)
+        self.assertEqual(len(all_data), 0)
+        self.assertEqual(len(w), 1)
+        self.assertTrue('flag FN' in str(w[0].message))
+
+
+def suite():
+    return unittest.makeSuite(PooledClientTestCase, 'test')
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -11,9 +11,10 @@ Low-level Earthworm Wave Server tools.
 
 from obspy import Trace, UTCDateTime, Stream
 from obspy.core import Stats
-import struct
-import socket
 import numpy as np
+import socket
+import struct
+import warnings
 
 
 RETURNFLAG_KEY = {
@@ -197,6 +198,13 @@ def getMenu(server, port, scnl=None):
     sock = sendSockReq(server, port, getstr)
     r = getSockCharLine(sock, 2.)
     sock.close()
+    return _parseMenu(r, rid)
+
+
+def _parseMenu(r, rid):
+    """
+    Parses the response line of a MENU request into a list of tanks.
+    """
     if r:
         tokens = r.split()
         if tokens[0] == rid:
@@ -271,3 +279,221 @@ def tracebufs2obspyStream(tbuflist):
         tlist.append(tb.getObspyTrace())
     strm = Stream(tlist)
     return strm
+
+
+def _tracebuf2Header(endian):
+    """
+    Returns the numpy.dtype of a tracebuf2 header with given byte order.
+    """
+    return np.dtype([('pinno', endian + 'i4'), ('nsamp', endian + 'i4'),
+                     ('starttime', endian + 'f8'), ('endtime', endian + 'f8'),
+                     ('samprate', endian + 'f8'), ('station', 'S7'),
+                     ('network', 'S9'), ('channel', 'S4'),
+                     ('location', 'S3'), ('version', 'S2'),
+                     ('datatype', 'S3'), ('quality', 'S2'), ('pad', 'S2')])
+
+
+# header of the contiguous sample blocks returned by decodeTraceBuf2()
+TRACEBUF2_BLOCK = np.dtype([('network', 'S9'), ('station', 'S7'),
+                            ('location', 'S3'), ('channel', 'S4'),
+                            ('starttime', 'f8'), ('sampling_rate', 'f8'),
+                            ('npts', 'i8')])
+
+
+def decodeTraceBuf2(dat, merge=True):
+    """
+    Decodes all tracebuf2 packets of a Wave Server response at once.
+
+    Only the packet boundaries are located packet by packet, all headers are
+    parsed as one structured array and the samples of consecutive packets
+    are merged into contiguous blocks without creating an object per
+    packet.
+
+    :type dat: str
+    :param dat: Concatenated tracebuf2 packets.
+    :type merge: bool, optional
+    :param merge: Merge consecutive packets of a channel without gap into
+        one block (default is ``True``).
+    :rtype: tuple of :class:`numpy.ndarray` and list
+    :return: Headers of all blocks as structured array of type
+        :data:`TRACEBUF2_BLOCK` (``'--'`` locations are returned empty)
+        and the list of corresponding data arrays in native byte order.
+    """
+    # locate packets
+    offsets = []
+    dtypes = []
+    p = 0
+    while p + 64 <= len(dat):
+        dtype = dat[p + 57:p + 59]
+        if dtype not in DATATYPE_KEY:
+            break
+        dtype = getNumpyType(dtype)
+        nsamp = struct.unpack(dtype.str[0] + 'i', dat[p + 4:p + 8])[0]
+        nbytes = 64 + nsamp * dtype.itemsize
+        if p + nbytes > len(dat):
+            break  # not enough data specified in header
+        offsets.append(p)
+        dtypes.append(dtype)
+        p += nbytes
+    if not offsets:
+        return np.empty(0, dtype=TRACEBUF2_BLOCK), []
+    # parse all headers at once
+    buf = np.frombuffer(dat, dtype='u1')
+    offsets = np.array(offsets)
+    index = offsets[:, np.newaxis] + np.arange(64)
+    raw = buf[index]
+    big = np.array([d.str[0] == '>' for d in dtypes])
+    native = _tracebuf2Header('=')
+    headers = np.empty(len(offsets), dtype=native)
+    for endian, mask in (('>', big), ('<', ~big)):
+        if mask.any():
+            headers[mask] = raw[mask].view(_tracebuf2Header(endian)).ravel()
+    # sample bytes of all packets in one array
+    data_mask = np.ones(len(buf), dtype='bool')
+    data_mask[index.ravel()] = False
+    data_mask[offsets[-1] + 64 + headers['nsamp'][-1] *
+              dtypes[-1].itemsize:] = False
+    samples = buf[data_mask]
+    nbytes = headers['nsamp'] * np.array([d.itemsize for d in dtypes])
+    ends = np.cumsum(nbytes)
+    # blocks of consecutive packets without gaps
+    ids = np.char.add(np.char.add(headers['network'], headers['station']),
+                      np.char.add(headers['location'], headers['channel']))
+    first = np.ones(len(offsets), dtype='bool')
+    if merge:
+        delta = 1.0 / headers['samprate']
+        gap = headers['starttime'][1:] - headers['endtime'][:-1] - delta[:-1]
+        first[1:] = (ids[1:] != ids[:-1]) | \
+            (headers['datatype'][1:] != headers['datatype'][:-1]) | \
+            (headers['samprate'][1:] != headers['samprate'][:-1]) | \
+            (np.abs(gap) > 0.5 * delta[:-1])
+    starts = np.nonzero(first)[0]
+    stops = np.append(starts[1:], len(offsets))
+    blocks = np.empty(len(starts), dtype=TRACEBUF2_BLOCK)
+    for field in ('network', 'station', 'location', 'channel'):
+        blocks[field] = headers[field][starts]
+    blocks['location'][blocks['location'] == '--'] = ''
+    blocks['starttime'] = headers['starttime'][starts]
+    blocks['sampling_rate'] = headers['samprate'][starts]
+    all_data = []
+    for start, stop in zip(starts, stops):
+        dtype = dtypes[start]
+        chunk = samples[ends[start] - nbytes[start]:ends[stop - 1]]
+        all_data.append(chunk.view(dtype).astype(dtype.newbyteorder('=')))
+    blocks['npts'] = [len(data) for data in all_data]
+    return blocks, all_data
+
+
+class WaveServerConnection(object):
+    """
+    Persistent connection to a Wave Server for several requests.
+
+    The connection is (re-)established on demand, a request failing on an
+    existing connection is repeated once on a new connection.
+
+    :type server: str
+    :param server: Host name of the Wave Server.
+    :type port: int
+    :param port: Port of the Wave Server.
+    :type timeout: float, optional
+    :param timeout: Socket timeout in seconds (default is ``None``).
+    """
+    def __init__(self, server, port, timeout=None):
+        self.server = server
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+        self.buffer = ''
+
+    def close(self):
+        """
+        Closes the connection.
+        """
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except socket.error:
+                pass
+        self.sock = None
+        self.buffer = ''
+
+    def _readLine(self):
+        while '\n' not in self.buffer:
+            indat = self.sock.recv(8192)
+            if not indat:
+                raise socket.error('connection closed by server')
+            self.buffer += indat
+        line, self.buffer = self.buffer.split('\n', 1)
+        return line
+
+    def _readBytes(self, nbytes):
+        chunks = [self.buffer[:nbytes]]
+        btoread = nbytes - len(chunks[0])
+        self.buffer = self.buffer[nbytes:]
+        while btoread:
+            indat = self.sock.recv(min(btoread, 65536))
+            if not indat:
+                raise socket.error('connection closed by server')
+            btoread -= len(indat)
+            chunks.append(indat)
+        return ''.join(chunks)
+
+    def request(self, reqstr, data=False):
+        """
+        Sends a request and returns the response line and the binary data
+        announced by its last token.
+
+        :type reqstr: str
+        :param reqstr: Request string.
+        :type data: bool, optional
+        :param data: Response contains binary data if flag is ``'F'``.
+        :rtype: tuple
+        :return: Response line and data (``''`` if no data is returned).
+        """
+        if not reqstr.endswith('\n'):
+            reqstr += '\n'
+        for retry in (True, False):
+            reconnect = self.sock is None
+            try:
+                if reconnect:
+                    self.sock = socket.create_connection(
+                        (self.server, self.port), self.timeout)
+                self.sock.sendall(reqstr)
+                line = self._readLine()
+                dat = ''
+                tokens = line.split()
+                if data and len(tokens) > 6 and tokens[6] == 'F':
+                    dat = self._readBytes(int(tokens[-1]))
+                return line, dat
+            except (socket.error, socket.timeout):
+                self.close()
+                if reconnect or not retry:
+                    raise
+
+    def getMenu(self):
+        """
+        Returns list of tanks on server, see :func:`getMenu`.
+        """
+        rid = 'getMenu'
+        line, _ = self.request('MENU: %s SCNL' % rid)
+        return _parseMenu(line, rid)
+
+    def readWaveServerV(self, scnl, start, end, merge=True):
+        """
+        Reads data for specified time interval and scnl.
+
+        :rtype: tuple
+        :return: Block headers and data, see :func:`decodeTraceBuf2`.
+        """
+        rid = 'rwserv'
+        scnlstr = '%s %s %s %s' % scnl
+        reqstr = 'GETSCNLRAW: %s %s %f %f' % (rid, scnlstr, start, end)
+        line, dat = self.request(reqstr, data=True)
+        tokens = line.split()
+        if len(tokens) < 7 or tokens[6] != 'F':
+            flag = tokens[6] if len(tokens) > 6 else 'FU'
+            msg = 'readWaveServerV returned flag %s - %s'
+            warnings.warn(msg % (flag, RETURNFLAG_KEY.get(flag,
+                                                          'unknown flag')))
+            return decodeTraceBuf2('')
+        return decodeTraceBuf2(dat, merge=merge)
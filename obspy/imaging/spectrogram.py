@@ -50,13 +50,119 @@ def _nearestPow2(x):
         return b
 
 
+def computeSpectrogram(data, samp_rate, per_lap=0.9, wlen=None, mult=8.0,
+                       decimate=1, chunksize=1024, mmap=None):
+    """
+    Computes the spectrogram of the input data block by block.
+
+    The data is processed in overlapping blocks of ``chunksize`` windows,
+    so only the output array has to fit into memory. Each block gives
+    exactly the columns of a spectrogram computed in one shot.
+
+    :param data: Input data
+    :type samp_rate: float
+    :param samp_rate: Samplerate in Hz
+    :type per_lap: float
+    :param per_lap: Percentage of overlap of sliding window, ranging from 0
+        to 1.
+    :type wlen: int or float
+    :param wlen: Window length for fft in seconds.
+    :type mult: float
+    :param mult: Pad zeros to lengh mult * wlen.
+    :type decimate: int
+    :param decimate: Average the power of this number of consecutive
+        columns (windows) into one column of the output.
+    :type chunksize: int
+    :param chunksize: Number of windows computed at once.
+    :type mmap: str
+    :param mmap: Filename of a memory-mapped file to write the output to
+        instead of a new array in memory.
+    :rtype: tuple of :class:`numpy.ndarray`
+    :return: Power spectral density (frequencies x time), frequencies and
+        times of the column centers in seconds.
+
+    .. rubric:: Example
+
+    >>> data = np.sin(np.arange(3000) / 2.0)
+    >>> specgram, freq, time = computeSpectrogram(data, 100, decimate=4)
+    >>> specgram.shape
+    (513, 56)
+    >>> freq[specgram[:, 0].argmax()]  # doctest: +ELLIPSIS
+    7.91...
+    """
+    # enforce float for samp_rate
+    samp_rate = float(samp_rate)
+
+    # set wlen from samp_rate if not specified otherwise
+    if not wlen:
+        wlen = samp_rate / 100.
+
+    npts = len(data)
+    # nfft needs to be an integer, otherwise a deprecation will be raised
+    nfft = int(_nearestPow2(wlen * samp_rate))
+    if nfft > npts:
+        nfft = int(_nearestPow2(npts / 8.0))
+
+    if mult is not None:
+        mult = int(_nearestPow2(mult))
+        mult = mult * nfft
+    nlap = int(nfft * float(per_lap))
+    step = nfft - nlap
+    nwin = max((npts - nlap) // step, 1)
+    decimate = max(int(decimate), 1)
+    # blocks of a single window are avoided, mlab warns about them
+    chunk = max(max(chunksize // decimate, 1) * decimate, 2)
+    ncols = -(-nwin // decimate)
+
+    if MATPLOTLIB_VERSION >= [0, 99, 0]:
+        kwargs = {'pad_to': mult}
+    else:
+        kwargs = {}
+    mean = data.mean()
+    specgram = None
+    time = np.empty(ncols)
+    first = 0
+    while first < nwin:
+        count = min(chunk, nwin - first)
+        if nwin - first - count == 1:
+            count += 1
+        start = first * step
+        block = data[start:start + (count - 1) * step + nfft] - mean
+        # Here we call not plt.specgram as this already produces a plot
+        # matplotlib.mlab.specgram should be faster as it computes only the
+        # arrays
+        spec, freq, t = mlab.specgram(block, Fs=samp_rate, NFFT=nfft,
+                                      noverlap=nlap, **kwargs)
+        t += start / samp_rate
+        if decimate > 1:
+            index = np.arange(0, spec.shape[1], decimate)
+            counts = np.diff(np.append(index, spec.shape[1]))
+            spec = np.add.reduceat(spec, index, axis=1) / counts
+            t = np.add.reduceat(t, index) / counts
+        if specgram is None:
+            shape = (spec.shape[0], ncols)
+            if mmap:
+                specgram = np.memmap(mmap, dtype=spec.dtype, mode='w+',
+                                     shape=shape)
+            else:
+                specgram = np.empty(shape, dtype=spec.dtype)
+        col = first // decimate
+        specgram[:, col:col + spec.shape[1]] = spec
+        time[col:col + spec.shape[1]] = t
+        first += count
+    return specgram, freq, time
+
+
 def spectrogram(data, samp_rate, per_lap=0.9, wlen=None, log=False,
                 outfile=None, fmt=None, axes=None, dbscale=False,
                 mult=8.0, cmap=None, zorder=None, title=None, show=True,
-                sphinx=False, clip=[0.0, 1.0]):
+                sphinx=False, clip=[0.0, 1.0], decimate=1, chunksize=1024):
     """
     Computes and plots spectrogram of the input data.
 
+    The spectrogram is computed block by block, see
+    :func:`computeSpectrogram`.
+
     :param data: Input data
     :type samp_rate: float
     :param samp_rate: Samplerate in Hz
@@ -99,44 +205,29 @@ def spectrogram(data, samp_rate, per_lap=0.9, wlen=None, log=False,
     :param clip: adjust colormap to clip at lower and/or upper end. The given
         percentages of the amplitude range (linear or logarithmic depending
         on option `dbscale`) are clipped.
+    :type decimate: int
+    :param decimate: Average the power of this number of consecutive windows
+        into one column. Reduces memory usage and plotting time of long
+        traces with high overlaps.
+    :type chunksize: int
+    :param chunksize: Number of windows computed at once.
     """
     # enforce float for samp_rate
     samp_rate = float(samp_rate)
+    end = len(data) / samp_rate
 
-    # set wlen from samp_rate if not specified otherwise
-    if not wlen:
-        wlen = samp_rate / 100.
-
-    npts = len(data)
-    # nfft needs to be an integer, otherwise a deprecation will be raised
-    #XXX add condition for too many windows => calculation takes for ever
-    nfft = int(_nearestPow2(wlen * samp_rate))
-    if nfft > npts:
-        nfft = int(_nearestPow2(npts / 8.0))
-
-    if mult != None:
-        mult = int(_nearestPow2(mult))
-        mult = mult * nfft
-    nlap = int(nfft * float(per_lap))
-
-    data = data - data.mean()
-    end = npts / samp_rate
-
-    # Here we call not plt.specgram as this already produces a plot
-    # matplotlib.mlab.specgram should be faster as it computes only the
-    # arrays
-    # XXX mlab.specgram uses fft, would be better and faster use rfft
-    if MATPLOTLIB_VERSION >= [0, 99, 0]:
-        specgram, freq, time = mlab.specgram(data, Fs=samp_rate, NFFT=nfft,
-                                              pad_to=mult, noverlap=nlap)
-    else:
-        specgram, freq, time = mlab.specgram(data, Fs=samp_rate,
-                                                NFFT=nfft, noverlap=nlap)
-    # db scale and remove zero/offset for amplitude
+    specgram, freq, time = computeSpectrogram(data, samp_rate,
+                                              per_lap=per_lap, wlen=wlen,
+                                              mult=mult, decimate=decimate,
+                                              chunksize=chunksize)
+    # db scale and remove zero/offset for amplitude, in place to avoid
+    # copies of large spectrograms
+    specgram = specgram[1:, :]
     if dbscale:
-        specgram = 10 * np.log10(specgram[1:, :])
+        np.log10(specgram, specgram)
+        specgram *= 10
     else:
-        specgram = np.sqrt(specgram[1:, :])
+        np.sqrt(specgram, specgram)
     freq = freq[1:]
 
     vmin, vmax = clip
@@ -3,10 +3,13 @@
 The obspy.imaging.spectogram test suite.
 """
 
+from matplotlib import mlab
 from obspy import UTCDateTime, Stream, Trace
+from obspy.core.util import NamedTemporaryFile
 from obspy.core.util.decorator import skipIf
 from obspy.imaging import spectrogram
 import numpy as np
+import warnings
 import os
 import time
 import unittest
@@ -50,6 +53,45 @@ class SpectrogramTestCase(unittest.TestCase):
         stat = os.stat(outfile)
         self.assertTrue(abs(stat.st_mtime - time.time()) < 3)
 
+    def test_computeSpectrogram(self):
+        """
+        Spectrogram computed in blocks has to match the one shot mlab
+        spectrogram.
+        """
+        np.random.seed(815)
+        data = np.random.randint(0, 1000, 5000)
+        expected, freq, time = mlab.specgram(data - data.mean(), Fs=200.0,
+                                             NFFT=256, pad_to=2048,
+                                             noverlap=230)
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            for chunksize in (1, 3, 10, 1024):
+                result = spectrogram.computeSpectrogram(
+                    data, 200.0, wlen=1.28, chunksize=chunksize)
+                np.testing.assert_array_almost_equal(result[0] / expected,
+                                                     1.0, 10)
+                np.testing.assert_array_equal(result[1], freq)
+                np.testing.assert_array_almost_equal(result[2], time)
+            self.assertEqual(len(w), 0)
+        # decimation of columns, last column averages the remaining windows
+        with NamedTemporaryFile() as tf:
+            specgram, _, times = spectrogram.computeSpectrogram(
+                data, 200.0, wlen=1.28, decimate=4, chunksize=10,
+                mmap=tf.name)
+            self.assertTrue(isinstance(specgram, np.memmap))
+            self.assertEqual(specgram.shape, (1025, 46))
+            np.testing.assert_array_almost_equal(
+                specgram[:, 1] / expected[:, 4:8].mean(axis=1), 1.0, 10)
+            np.testing.assert_array_almost_equal(
+                specgram[:, -1] / expected[:, 180:].mean(axis=1), 1.0, 10)
+            self.assertAlmostEqual(times[1], time[4:8].mean())
+            del specgram
+        # plotting with decimation
+        tr = Trace(data=data, header={'sampling_rate': 200.0})
+        with NamedTemporaryFile(suffix='.png') as tf:
+            tr.spectrogram(outfile=tf.name, decimate=4, show=False)
+            self.assertTrue(os.path.getsize(tf.name) > 0)
+
 
 def suite():
     return unittest.makeSuite(SpectrogramTestCase, 'test')
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+Module for handling ObsPy RtStream objects.
+
+:copyright:
+    The ObsPy Development Team (devs@obspy.org)
+:license:
+    GNU Lesser General Public License, Version 3
+    (http://www.gnu.org/copyleft/lesser.html)
+"""
+
+from obspy import Stream, Trace
+from obspy.realtime.rttrace import RtTrace, _applyRtProcess
+import copy
+import numpy as np
+
+
+class RtStream(Stream):
+    """
+    A container for several continuous real time channels.
+
+    Appended data packets are routed by their id to one
+    :class:`~obspy.realtime.rttrace.RtTrace` per channel, which is created on
+    first arrival of data for this id. Registered processes are applied to
+    all channels, processes without memory (NumPy ufuncs and the predefined
+    ``'scale'`` and ``'offset'`` processes) are applied in a single call to
+    all packets of the same sampling rate and data type.
+
+    :type traces: list of :class:`~obspy.realtime.rttrace.RtTrace`, optional
+    :param traces: Initial channels, one RtTrace per id. Processes already
+        registered on these channels are applied before the processes of the
+        RtStream.
+    :type max_length: int, optional
+    :param max_length: maximum trace length in seconds of all channels
+
+    .. rubric:: Example
+
+    >>> from obspy import read
+    >>> from obspy.realtime import RtStream
+    >>> st = read()
+    >>> rt_stream = RtStream(max_length=20)
+    >>> rt_stream.registerRtProcess('boxcar', width=10)
+    1
+    >>> rt_stream.registerRtProcess('scale', factor=2.0)
+    2
+    >>> for i in range(3):
+    ...     packets = st.slice(st[0].stats.starttime + i * 10,
+    ...                        st[0].stats.starttime + i * 10 + 9.99)
+    ...     processed = rt_stream.append(packets)
+    >>> print(rt_stream)  # doctest: +ELLIPSIS
+    3 Trace(s) in Stream:
+    BW.RJOB..EHZ | 2009-08-24T00:20:13.000000Z ... | 100.0 Hz, 2000 samples
+    BW.RJOB..EHN | 2009-08-24T00:20:13.000000Z ... | 100.0 Hz, 2000 samples
+    BW.RJOB..EHE | 2009-08-24T00:20:13.000000Z ... | 100.0 Hz, 2000 samples
+    >>> window = rt_stream.getLatest(5)
+    >>> print(window)  # doctest: +ELLIPSIS
+    3 Trace(s) in Stream:
+    BW.RJOB..EHZ | 2009-08-24T00:20:28.000000Z ... | 100.0 Hz, 500 samples
+    BW.RJOB..EHN | 2009-08-24T00:20:28.000000Z ... | 100.0 Hz, 500 samples
+    BW.RJOB..EHE | 2009-08-24T00:20:28.000000Z ... | 100.0 Hz, 500 samples
+    """
+    def __init__(self, traces=None, max_length=None):
+        """
+        Initializes an RtStream.
+        """
+        if max_length is not None and max_length <= 0:
+            raise ValueError("Input max_length out of bounds: %s" % max_length)
+        self.max_length = max_length
+        # initialize processing list
+        self.processing = []
+        super(RtStream, self).__init__(traces=traces)
+        self._channels = {}
+        # index of the first process of this RtStream in the processing list
+        # of each channel by id
+        self._offsets = {}
+        for tr in self.traces:
+            if not isinstance(tr, RtTrace):
+                msg = "Only obspy.realtime.RtTrace objects are allowed"
+                raise TypeError(msg)
+            if tr.getId() in self._channels:
+                msg = "More than one RtTrace for id %s" % tr.getId()
+                raise ValueError(msg)
+            self._channels[tr.getId()] = tr
+            self._offsets[tr.getId()] = len(tr.processing)
+
+    def __add__(self, other):  # @UnusedVariable
+        """
+        Too ambiguous, throw an Error.
+
+        .. seealso:: :meth:`obspy.realtime.RtStream.append`.
+        """
+        msg = "Too ambiguous for realtime stream data. Try: RtStream.append()"
+        raise NotImplementedError(msg)
+
+    __iadd__ = __add__
+
+    def registerRtProcess(self, process, **options):
+        """
+        Adds real-time processing algorithm to processing list of all current
+        and future channels of this RtStream.
+
+        See :meth:`obspy.realtime.rttrace.RtTrace.registerRtProcess` for all
+        parameters.
+
+        :rtype: int
+        :return: Length of processing list after registering new processing
+            function.
+        """
+        # validate the process before changing any channel
+        RtTrace().registerRtProcess(process, **options)
+        self.processing.append((process, options))
+        for channel in self.traces:
+            channel.registerRtProcess(process, **options)
+        return len(self.processing)
+
+    def append(self, data, gap_overlap_check=False, verbose=False):
+        """
+        Appends Trace objects to the channels of this RtStream.
+
+        Each Trace is routed by its id to the channel with the same id, see
+        :meth:`obspy.realtime.rttrace.RtTrace.append` for the handling of
+        single packets.
+
+        :type data: :class:`~obspy.core.trace.Trace`,
+            :class:`~obspy.core.stream.Stream` or list of
+            :class:`~obspy.core.trace.Trace`
+        :param data: Data packet(s) to append, several packets of the same
+            channel are appended in the given order.
+        :type gap_overlap_check: bool, optional
+        :param gap_overlap_check: Raise TypeError on gaps or overlaps instead
+            of re-initializing the processing memory of the channel.
+        :type verbose: bool, optional
+        :param verbose: Print additional information to stdout
+        :rtype: :class:`~obspy.core.stream.Stream`
+        :return: Processed data packets in the given order.
+        """
+        if isinstance(data, Trace):
+            data = [data]
+        for trace in data:
+            if not isinstance(trace, Trace):
+                msg = "Only obspy.core.trace.Trace objects are allowed"
+                raise TypeError(msg)
+        results = [None] * len(data)
+        # split into rounds holding at most one packet per channel
+        rounds = [[]]
+        ids = set()
+        for i, trace in enumerate(data):
+            id = trace.getId()
+            if id in ids:
+                rounds.append([])
+                ids = set()
+            ids.add(id)
+            rounds[-1].append(i)
+        for indices in rounds:
+            if not indices:
+                continue
+            packets = []
+            for i in indices:
+                channel = self._getChannel(data[i].getId())
+                gap = channel._checkAppend(data[i], gap_overlap_check,
+                                           verbose)
+                if self.processing or channel.processing:
+                    trace = data[i].copy()
+                else:
+                    trace = data[i]
+                packets.append((channel, trace, gap))
+                results[i] = trace
+            self._process(packets)
+            for channel, trace, gap in packets:
+                channel._appendProcessed(trace, gap)
+        return Stream(traces=results)
+
+    def getLatest(self, seconds, ids=None):
+        """
+        Returns synchronized windows of the latest data of all channels
+        without copying any data.
+
+        All windows end at the earliest end time of the selected channels, so
+        the returned Stream can directly be passed to multi-channel detectors,
+        e.g. :func:`~obspy.signal.trigger.coincidenceTrigger`.
+
+        :type seconds: float
+        :param seconds: Length of the windows in seconds.
+        :type ids: list of str, optional
+        :param ids: Ids of the channels to use, defaults to all channels.
+        :rtype: :class:`~obspy.core.stream.Stream`
+        :return: One Trace per channel. The data arrays are views of the
+            channel buffers and are only valid until the next call of
+            :meth:`append`.
+        """
+        if ids is None:
+            channels = [tr for tr in self.traces if tr.have_appended_data]
+        else:
+            channels = [self._channels[id] for id in ids]
+        if not channels:
+            return Stream()
+        endtime = min([tr.stats.endtime for tr in channels])
+        starttime = max([tr.stats.starttime for tr in channels])
+        windows = []
+        for channel in channels:
+            stats = channel.stats
+            end = int(round((endtime - stats.starttime) *
+                            stats.sampling_rate)) + 1
+            start = int(round((starttime - stats.starttime) *
+                              stats.sampling_rate))
+            npts = int(seconds * stats.sampling_rate + 0.5)
+            start = min(max(start, end - npts, 0), end)
+            tr = Trace(header=stats.copy())
+            tr.data = channel.data[start:end]
+            tr.stats.starttime = stats.starttime + start * stats.delta
+            windows.append(tr)
+        return Stream(traces=windows)
+
+    def copy(self):
+        """
+        Returns a deepcopy of this RtStream.
+        """
+        new = self.__class__(max_length=self.max_length)
+        ids = dict((id(tr), key) for key, tr in self._channels.iteritems())
+        for tr in self.traces:
+            channel = tr.copy()
+            new.traces.append(channel)
+            new._channels[ids[id(tr)]] = channel
+        new._offsets = copy.copy(self._offsets)
+        new.processing = copy.copy(self.processing)
+        return new
+
+    def _getChannel(self, id):
+        """
+        Returns the RtTrace of the given id, a new one is created if needed.
+        """
+        channel = self._channels.get(id)
+        if channel is None:
+            channel = RtTrace(max_length=self.max_length)
+            for process, options in self.processing:
+                channel.registerRtProcess(process, **options)
+            self.traces.append(channel)
+            self._channels[id] = channel
+            self._offsets[id] = 0
+        return channel
+
+    def _process(self, packets):
+        """
+        Applies all registered processes to packets of different channels.
+        """
+        groups = {}
+        for packet in packets:
+            channel, trace, gap = packet
+            # processes registered on the channel itself come first
+            for entry in channel.processing[:self._offsets[trace.getId()]]:
+                _applyRtProcess(entry, trace, gap)
+            key = (trace.stats.sampling_rate, trace.data.dtype)
+            groups.setdefault(key, []).append(packet)
+        for i, (process, options) in enumerate(self.processing):
+            if isinstance(process, np.ufunc) or \
+                    (not hasattr(process, '__call__') and
+                     self._entry(packets[0], i)[2] is None):
+                # no memory, process all packets of a group at once
+                for group in groups.itervalues():
+                    self._processGroup(i, group)
+                continue
+            for packet in packets:
+                _applyRtProcess(self._entry(packet, i), packet[1], packet[2])
+
+    def _entry(self, packet, index):
+        """
+        Returns the processing list entry of the channel of a packet for the
+        process with the given index in the processing list of this RtStream.
+        """
+        channel, trace, _gap = packet
+        return channel.processing[self._offsets[trace.getId()] + index]
+
+    def _processGroup(self, index, group):
+        """
+        Applies a process without memory to a group of packets with the same
+        sampling rate and data type.
+        """
+        entry = self._entry(group[0], index)
+        if len(group) == 1:
+            _applyRtProcess(entry, group[0][1])
+            return
+        traces = [trace for _channel, trace, _gap in group]
+        batch = Trace(data=np.concatenate([tr.data for tr in traces]),
+                      header={'sampling_rate': traces[0].stats.sampling_rate})
+        _applyRtProcess(entry, batch)
+        offsets = np.cumsum([len(tr.data) for tr in traces])[:-1]
+        for tr, data in zip(traces, np.split(batch.data, offsets)):
+            tr.data = data
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(exclude_empty=True)
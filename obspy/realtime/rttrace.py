@@ -32,6 +32,38 @@ REALTIME_PROCESS_FUNCTIONS = {
 }
 
 
+def _applyRtProcess(entry, trace, reset_memory=False):
+    """
+    Applies a single registered real-time process to the data of a Trace.
+
+    :type entry: tuple
+    :param entry: Processing list entry ``(process, options, rtmemory_list)``
+        as created by :meth:`RtTrace.registerRtProcess`.
+    :type trace: :class:`~obspy.core.trace.Trace`
+    :param trace: Trace to process, its data are replaced by the result.
+    :type reset_memory: bool, optional
+    :param reset_memory: Re-initialize the processing memory before
+        processing, e.g. after a gap or overlap.
+    """
+    process_name, options, rtmemory_list = entry
+    # if gap or overlap, clear memory
+    if reset_memory and rtmemory_list is not None:
+        for n in range(len(rtmemory_list)):
+            rtmemory_list[n] = RtMemory()
+    # apply processing
+    dtype = trace.data.dtype
+    if hasattr(process_name, '__call__'):
+        # check if direct function call
+        trace.data = process_name(trace.data, **options)
+    else:
+        # got predefined function
+        func = REALTIME_PROCESS_FUNCTIONS[process_name.lower()][0]
+        options['rtmemory_list'] = rtmemory_list
+        trace.data = func(trace, **options)
+    # assure dtype is not changed
+    trace.data = np.require(trace.data, dtype=dtype)
+
+
 class RtTrace(Trace):
     """
     An object containing data of a continuous series constructed dynamically
@@ -44,6 +76,17 @@ class RtTrace(Trace):
     :type max_length: int, optional
     :param max_length: maximum trace length in seconds
 
+    The data are kept in a preallocated buffer of twice the maximum trace
+    length and :attr:`data` is a view of the current part of this buffer, so
+    appending packets does not reallocate memory.
+
+    .. note::
+        Arrays obtained from :attr:`data` (or :meth:`getLatest`) are only
+        valid until the next call of :meth:`append`: when the buffer is full,
+        the samples to keep are moved to its beginning, overwriting the
+        memory these arrays refer to. Use ``rt_trace.data.copy()`` to keep
+        the data of a certain state.
+
     .. rubric:: Example
 
     RtTrace has been built to handle real time processing of periodically
@@ -171,6 +214,8 @@ class RtTrace(Trace):
         Trace object before it is appended.  This RtTrace will be truncated
         from the beginning to RtTrace.max_length, if specified.
         Sampling rate, data type and trace.id of both traces must match.
+        Arrays obtained from :attr:`data` before appending may be
+        overwritten by this call, see the note in :class:`RtTrace`.
 
         :type trace: :class:`~obspy.core.trace.Trace`
         :param trace:  :class:`~obspy.core.trace.Trace` object to append to
@@ -191,6 +236,25 @@ class RtTrace(Trace):
             # only add Trace objects
             raise TypeError("Only obspy.core.trace.Trace objects are allowed")
 
+        gap_or_overlap = self._checkAppend(trace, gap_overlap_check, verbose)
+        # first apply all registered processing to a single copy of Trace
+        if self.processing:
+            trace = trace.copy()
+        for proc in self.processing:
+            _applyRtProcess(proc, trace, gap_or_overlap)
+        self._appendProcessed(trace, gap_or_overlap)
+        return trace
+
+    def _checkAppend(self, trace, gap_overlap_check=False, verbose=False):
+        """
+        Checks if a Trace object can be appended to this RtTrace.
+
+        See :meth:`append` for the parameters.
+
+        :rtype: bool
+        :return: ``True`` if there is a gap or overlap between the end of this
+            RtTrace and the start of the Trace.
+        """
         # sanity checks
         if self.have_appended_data:
             #  check id
@@ -254,49 +318,110 @@ class RtTrace(Trace):
                 if verbose:
                     print "%s: self.stats.starttime adjusted by: %gs" \
                         % (self.__class__.__name__, diff - self.stats.delta)
-        # first apply all registered processing to Trace
-        for proc in self.processing:
-            process_name, options, rtmemory_list = proc
-            # if gap or overlap, clear memory
-            if gap_or_overlap and rtmemory_list != None:
-                for n in range(len(rtmemory_list)):
-                    rtmemory_list[n] = RtMemory()
-            # apply processing
-            trace = trace.copy()
-            dtype = trace.data.dtype
-            if hasattr(process_name, '__call__'):
-                # check if direct function call
-                trace.data = process_name(trace.data, **options)
-            else:
-                # got predefined function
-                func = REALTIME_PROCESS_FUNCTIONS[process_name.lower()][0]
-                options['rtmemory_list'] = rtmemory_list
-                trace.data = func(trace, **options)
-            # assure dtype is not changed
-            trace.data = np.require(trace.data, dtype=dtype)
+        return gap_or_overlap
+
+    def _appendProcessed(self, trace, gap_or_overlap=False):
+        """
+        Appends an already checked and processed Trace object to the buffer
+        of this RtTrace and trims it to max_length.
+        """
         # if first data, set stats
         if not self.have_appended_data:
-            self.data = np.array(trace.data)
             self.stats = Stats(header=trace.stats)
+            self._resetBuffer(trace.data)
             self.have_appended_data = True
-            return trace
+            return
         # handle all following data sets
-        # fix Trace.__add__ parameters
-        # TODO: IMPORTANT? Should check for gaps and overlaps and handle
-        # more elegantly
-        sum_trace = Trace.__add__(self, trace, method=0,
-            interpolation_samples=0, fill_value='latest', sanity_checks=True)
-        # Trace.__add__ returns new Trace, so update to this RtTrace
-        self.data = sum_trace.data
+        if gap_or_overlap or self.data is not getattr(self, '_view', None):
+            # fix Trace.__add__ parameters
+            # TODO: IMPORTANT? Should check for gaps and overlaps and handle
+            # more elegantly
+            sum_trace = Trace.__add__(self, trace, method=0,
+                interpolation_samples=0, fill_value='latest',
+                sanity_checks=True)
+            # Trace.__add__ returns new Trace, so update to this RtTrace
+            self._resetBuffer(sum_trace.data)
+        else:
+            # contiguous data are written directly into the buffer
+            self._writeBuffer(trace.data)
         # left trim if data length exceeds max_length
-        if self.max_length != None:
+        if self.max_length is not None:
             max_samples = int(self.max_length * self.stats.sampling_rate + 0.5)
-            if np.size(self.data) > max_samples:
-                starttime = self.stats.starttime + (np.size(self.data) - \
+            if self._end - self._start > max_samples:
+                starttime = self.stats.starttime + (self._end - self._start -
                     max_samples) / self.stats.sampling_rate
-                self._ltrim(starttime, pad=False, nearest_sample=True,
-                            fill_value=None)
-        return trace
+                self._start = self._end - max_samples
+                self._setView()
+                self.stats.starttime = starttime
+
+    def getLatest(self, seconds):
+        """
+        Returns the latest data of this RtTrace without copying any data.
+
+        :type seconds: float
+        :param seconds: Length of the returned data in seconds.
+        :rtype: :class:`~obspy.core.trace.Trace`
+        :return: Trace with the data of the last seconds of this RtTrace. The
+            data array is a view of the buffer of this RtTrace and is only
+            valid until the next call of :meth:`append`.
+        """
+        npts = min(int(seconds * self.stats.sampling_rate + 0.5),
+                   len(self.data))
+        tr = Trace(header=self.stats.copy())
+        tr.data = self.data[len(self.data) - npts:]
+        tr.stats.starttime = self.stats.starttime + \
+            (len(self.data) - npts) * self.stats.delta
+        return tr
+
+    def _resetBuffer(self, data, extra=0):
+        """
+        Allocates a new buffer with room for at least extra more samples and
+        copies data into it.
+        """
+        capacity = 2 * (len(data) + extra)
+        if self.max_length is not None and self.stats.sampling_rate > 0:
+            max_samples = int(self.max_length * self.stats.sampling_rate + 0.5)
+            capacity = max(capacity, 2 * max_samples)
+        self._buffer = np.empty(max(capacity, 1), dtype=data.dtype)
+        self._buffer[:len(data)] = data
+        self._start = 0
+        self._end = len(data)
+        self._setView()
+
+    def _writeBuffer(self, data):
+        """
+        Appends data to the buffer. If the buffer is full, the samples to keep
+        are moved to its beginning or, if it is too small, into a new buffer
+        of twice the needed size. Appending is therefore amortized
+        O(len(data)).
+        """
+        npts = len(data)
+        if self._end + npts > len(self._buffer):
+            keep = self._end - self._start
+            if self.max_length is not None:
+                max_samples = int(self.max_length * self.stats.sampling_rate +
+                                  0.5)
+                keep = min(keep, max(max_samples - npts, 0))
+            # samples dropped from the beginning
+            self.stats.starttime += (self._end - self._start - keep) * \
+                self.stats.delta
+            if keep + npts > len(self._buffer) // 2:
+                self._resetBuffer(self._buffer[self._end - keep:self._end],
+                                  npts)
+            else:
+                self._buffer[:keep] = self._buffer[self._end - keep:self._end]
+                self._start = 0
+                self._end = keep
+        self._buffer[self._end:self._end + npts] = data
+        self._end += npts
+        self._setView()
+
+    def _setView(self):
+        """
+        Sets the data of this RtTrace to the current view of the buffer.
+        """
+        self._view = self._buffer[self._start:self._end]
+        self.data = self._view
 
     def registerRtProcess(self, process, **options):
         """
@@ -368,10 +493,16 @@ class RtTrace(Trace):
         """
         # XXX: ugly hack to allow deepcopy of an RtTrace object containing
         # registered NumPy function (numpy.ufunc) calls
-        temp = copy.copy(self.processing)
+        temp = self.processing
         self.processing = []
-        new = copy.deepcopy(self, *args, **kwargs)
-        new.processing = temp
+        try:
+            new = copy.deepcopy(self, *args, **kwargs)
+        finally:
+            self.processing = temp
+        # processes themselves are shared, their memory is copied
+        new.processing = [(process, copy.deepcopy(options),
+                           copy.deepcopy(rtmemory_list))
+                          for process, options, rtmemory_list in temp]
         return new
 
 
@@ -24,6 +24,7 @@ in a previous packet, so has to be retrieved from memory see
 import math
 import sys
 import numpy as np
+from scipy.signal import lfilter
 from obspy.core.trace import Trace, UTCDateTime
 from obspy.realtime.rtmemory import RtMemory
 
@@ -116,13 +117,14 @@ def integrate(trace, rtmemory_list=None):
         rtmemory.initialize(sample.dtype, memory_size_input,
                             memory_size_output, 0, 0)
 
-    sum = rtmemory.output[0]
+    # running sum, the carried value is added to the first increment so the
+    # summation order is the same as for a sample by sample accumulation
+    increments = sample * delta_time
+    increments[0] += rtmemory.output[0]
+    cumulative = np.cumsum(increments)
+    sample[:] = cumulative
 
-    for i in range(np.size(sample)):
-        sum += sample[i] * delta_time
-        sample[i] = sum
-
-    rtmemory.output[0] = sum
+    rtmemory.output[0] = cumulative[-1]
 
     return sample
 
@@ -166,13 +168,12 @@ def differentiate(trace, rtmemory_list=None):
         rtmemory.input[0] = sample[0]
 
     previous_sample = rtmemory.input[0]
+    last_sample = sample[-1]
 
-    for i in range(np.size(sample)):
-        diff = (sample[i] - previous_sample) / delta_time
-        previous_sample = sample[i]
-        sample[i] = diff
+    sample[1:] = np.diff(sample) / delta_time
+    sample[0] = (sample[0] - previous_sample) / delta_time
 
-    rtmemory.input[0] = previous_sample
+    rtmemory.input[0] = last_sample
 
     return sample
 
@@ -218,44 +219,44 @@ def boxcar(trace, width, rtmemory_list=None):
     # initialize array for time-series results
     new_sample = np.zeros(np.size(sample), sample.dtype)
 
-    i = 0
-    i1 = i - width
-    i2 = i      # causal boxcar of width width
-    sum = 0.0
-    icount = 0
-    for i in range(np.size(sample)):
-        value = 0.0
-        if (icount == 0):    # first pass, accumulate sum
-            for n in range(i1, i2 + 1):
-                if (n < 0):
-                    value = rtmemory.input[width + n]
-                else:
-                    value = sample[n]
-                sum += value
-                icount = icount + 1
-        else:                # later passes, update sum
-            if ((i1 - 1) < 0):
-                value = rtmemory.input[width + (i1 - 1)]
-            else:
-                value = sample[(i1 - 1)]
-            sum -= value
-            if (i2 < 0):
-                value = rtmemory.input[width + i2]
-            else:
-                value = sample[i2]
-            sum += value
-        if (icount > 0):
-            new_sample[i] = (float)(sum / float(icount))
-        else:
-            new_sample[i] = 0.0
-        i1 = i1 + 1
-        i2 = i2 + 1
+    # causal boxcar over the current and the preceding width samples: the
+    # running sum is the first window sum followed by the cumulative sum of
+    # entering minus leaving samples
+    npts = np.size(sample)
+    if npts > 0:
+        values = np.concatenate((rtmemory.input, sample)).astype(np.float64)
+        running_sum = np.empty(npts, np.float64)
+        running_sum[0] = values[:width + 1].sum()
+        running_sum[1:] = values[width + 1:] - values[:npts - 1]
+        np.cumsum(running_sum, out=running_sum)
+        new_sample[:] = running_sum / float(width + 1)
 
     rtmemory.updateInput(sample)
 
     return new_sample
 
 
+def _runningSquareSum(memory, values, carried_sum):
+    """
+    Running sum of squares over a window of the length of memory.
+
+    :type memory: numpy.ndarray
+    :param memory: Values preceding ``values``, the window length is the
+        length of this array.
+    :type values: numpy.ndarray
+    :param values: New values.
+    :type carried_sum: float
+    :param carried_sum: Sum of squares of ``memory``.
+    :rtype: NumPy :class:`numpy.ndarray`
+    :return: Sum of squares of the window ending at each of the new values.
+    """
+    width = np.size(memory)
+    squares = np.concatenate((memory, values)).astype(np.float64) ** 2
+    steps = squares[width:] - squares[:np.size(values)]
+    steps[0] += carried_sum
+    return np.cumsum(steps)
+
+
 def tauc(trace, width, rtmemory_list=None):
     """
     Calculate instantaneous period in a fixed window (Tau_c).
@@ -289,6 +290,9 @@ def tauc(trace, width, rtmemory_list=None):
         rtmemory_list = [RtMemory(), RtMemory()]
 
     sample = trace.data
+    if np.size(sample) < 1:
+        return sample
+
     delta_time = trace.stats.delta
 
     rtmemory = rtmemory_list[0]
@@ -313,39 +317,24 @@ def tauc(trace, width, rtmemory_list=None):
         rtmemory_dval.initialize(sample.dtype, memory_size_input,
                                  memory_size_output, 0, 0)
 
-    new_sample = np.zeros(np.size(sample), sample.dtype)
-    deriv = np.zeros(np.size(sample), sample.dtype)
-
-    #sample_last = rtmemory.input[width - 1]
-    sample_d = 0.0
-    deriv_d = 0.0
-    xval = rtmemory.output[0]
-    dval = rtmemory_dval.output[0]
-
-    for i in range(np.size(sample)):
-
-        sample_d = sample[i]
-        deriv_d = (sample_d - sample_last) / delta_time
-        indexBegin = i - width
-        if (indexBegin >= 0):
-            xval = xval - (sample[indexBegin]) * (sample[indexBegin]) \
-                + sample_d * sample_d
-            dval = dval - deriv[indexBegin] * deriv[indexBegin] \
-                + deriv_d * deriv_d
-        else:
-            index = i
-            xval = xval - rtmemory.input[index] * rtmemory.input[index] \
-                + sample_d * sample_d
-            dval = dval \
-                - rtmemory_dval.input[index] * rtmemory_dval.input[index] \
-                + deriv_d * deriv_d
-        deriv[i] = deriv_d
-        sample_last = sample_d
-        # if (xval > _MIN_FLOAT_VAL &  & dval > _MIN_FLOAT_VAL) {
-        if (dval > _MIN_FLOAT_VAL):
-            new_sample[i] = _TWO_PI * math.sqrt(xval / dval)
-        else:
-            new_sample[i] = 0.0
+    npts = np.size(sample)
+    new_sample = np.zeros(npts, sample.dtype)
+    deriv = np.empty(npts, sample.dtype)
+    deriv[0] = (sample[0] - sample_last) / delta_time
+    deriv[1:] = np.diff(sample) / delta_time
+
+    # running sums of squared samples and derivatives over the last width
+    # values, carried over from the previous call
+    xval = _runningSquareSum(rtmemory.input, sample, rtmemory.output[0])
+    dval = _runningSquareSum(rtmemory_dval.input, deriv,
+                             rtmemory_dval.output[0])
+
+    # if (xval > _MIN_FLOAT_VAL &  & dval > _MIN_FLOAT_VAL) {
+    valid = dval > _MIN_FLOAT_VAL
+    new_sample[valid] = _TWO_PI * np.sqrt(xval[valid] / dval[valid])
+
+    xval = xval[-1]
+    dval = dval[-1]
 
     # update memory
     rtmemory.output[0] = xval
@@ -455,35 +444,34 @@ def mwpIntegral(trace, max_time, ref_time, mem_time=1.0, gain=1.0,
     mwp_amp_at_pick = rtmemory.output[_AMP_AT_PICK]
     mwp_int_int_sum = rtmemory.output[_INT_INT_SUM]
     polarity = rtmemory.output[_POLARITY]
-    amplitude = 0.0
-    for n in range(ioffset_mwp_min, ioffset_mwp_max):
-        if n >= 0:
-            amplitude = trace.data[n]
-        elif n >= -(np.size(rtmemory.input)):
-            # value in memory array
-            index = n + np.size(rtmemory.input)
-            amplitude = rtmemory.input[index]
-        else:
-            msg = "Error: Mwp: attempt to access rtmemory.input array of " + \
-                "size=%d at invalid index=%d: this should not happen!" % \
-                (np.size(rtmemory.input), n + np.size(rtmemory.input))
-            print msg
-            continue  # should never reach here
+    indices = np.arange(ioffset_mwp_min, ioffset_mwp_max)
+    if indices.size > 0:
+        # negative indices refer to values in memory array
+        values = np.concatenate((rtmemory.input, trace.data))
+        amplitude = values[indices + np.size(rtmemory.input)]
         disp_amp = amplitude - mwp_amp_at_pick
-        # check displacement polarity
-        if disp_amp >= 0.0:  # pos
-            # check if past extremum
-            if polarity < 0:  # passed from neg to pos displacement
-                mwp_int_int_sum *= -1.0
-                mwp_int_int_sum = 0
-            polarity = 1
-        elif disp_amp < 0.0:  # neg
-            # check if past extremum
-            if polarity > 0:  # passed from pos to neg displacement
-                mwp_int_int_sum = 0
-            polarity = -1
-        mwp_int_int_sum += (amplitude - mwp_amp_at_pick) * delta_time / gain
-        new_sample[n] = mwp_int_int_sum
+        # check displacement polarity, the integral restarts whenever the
+        # displacement passes an extremum
+        signs = np.where(disp_amp >= 0.0, 1, -1)
+        previous_signs = np.empty_like(signs)
+        previous_signs[0] = polarity
+        previous_signs[1:] = signs[:-1]
+        restart = previous_signs * signs < 0
+        increments = disp_amp * delta_time / gain
+        if not restart[0]:
+            increments[0] += mwp_int_int_sum
+        sums = np.cumsum(increments)
+        # subtract the sum reached before the last restart
+        last_restart = np.where(restart, np.arange(indices.size), -1)
+        last_restart = np.maximum.accumulate(last_restart)
+        sums -= np.where(last_restart >= 0,
+                         (sums - increments)[last_restart], 0.0)
+        mwp_int_int_sum = sums[-1]
+        polarity = signs[-1]
+        # (negative indices wrap around and are overwritten by later samples)
+        negative = indices < 0
+        new_sample[indices[negative]] = sums[negative]
+        new_sample[indices[~negative]] = sums[~negative]
 
     rtmemory.output[_INT_INT_SUM] = mwp_int_int_sum
     rtmemory.output[_POLARITY] = polarity
@@ -609,20 +597,33 @@ def kurtosis(trace, win=3.0, rtmemory_list=None):
     mu2_last = rtmemory_mu2.input[0]
     k4_bar_last = rtmemory_k4_bar.input[0]
 
-    # do recursive kurtosis
-    for i in xrange(npts):
-        mu1 = a1 * mu1_last + C1 * sample[i]
-        dx2 = (sample[i] - mu1_last) * (sample[i] - mu1_last)
-        mu2 = a1 * mu2_last + C2 * dx2
-        dx2 = dx2 / mu2_last
-        k4_bar = (1 + C1 - 2 * C1 * dx2) * k4_bar_last + C1 * dx2 * dx2
-        kappa4[i] = k4_bar + bias
-        mu1_last = mu1
-        mu2_last = mu2
-        k4_bar_last = k4_bar
-
-    rtmemory_mu1.input[0] = mu1_last
-    rtmemory_mu2.input[0] = mu2_last
-    rtmemory_k4_bar.input[0] = k4_bar_last
+    # do recursive kurtosis, the first order recursions of mean and variance
+    # are linear filters with the last values as initial state
+    mu1 = lfilter([C1], [1.0, -a1], sample, zi=[a1 * mu1_last])[0]
+    mu1_previous = np.empty(npts, np.float64)
+    mu1_previous[0] = mu1_last
+    mu1_previous[1:] = mu1[:-1]
+    dx2 = (sample - mu1_previous) * (sample - mu1_previous)
+    mu2 = lfilter([C2], [1.0, -a1], dx2, zi=[a1 * mu2_last])[0]
+    mu2_previous = np.empty(npts, np.float64)
+    mu2_previous[0] = mu2_last
+    mu2_previous[1:] = mu2[:-1]
+    dx2 = dx2 / mu2_previous
+    # the k4_bar recursion has data dependent coefficients and is evaluated
+    # on plain floats
+    gain = (1 + C1 - 2 * C1 * dx2).tolist()
+    excitation = (C1 * dx2 * dx2).tolist()
+    k4_bar_last = float(k4_bar_last)
+    k4_bar_values = []
+    append = k4_bar_values.append
+    for g, e in zip(gain, excitation):
+        k4_bar_last = g * k4_bar_last + e
+        append(k4_bar_last)
+    k4_bar = np.array(k4_bar_values, np.float64)
+    kappa4[:] = k4_bar + bias
+
+    rtmemory_mu1.input[0] = mu1[-1]
+    rtmemory_mu2.input[0] = mu2[-1]
+    rtmemory_k4_bar.input[0] = k4_bar[-1]
 
     return kappa4
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+The obspy.realtime.rtstream test suite.
+"""
+from obspy import read, Stream, Trace
+from obspy.realtime import RtStream, RtTrace
+import numpy as np
+import unittest
+
+
+class RtStreamTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # three channels with 3000 samples at 100 Hz, one channel at 50 Hz
+        self.st = read()
+        for tr in self.st:
+            tr.data = tr.data.astype('f8')
+        tr = self.st[0].copy()
+        tr.stats.channel = 'LHZ'
+        tr.decimate(2, no_filter=True)
+        self.st.append(tr)
+
+    def _packets(self, seconds):
+        """
+        Splits test stream into packets of the given length ordered by time.
+        """
+        packets = []
+        starttime = self.st[0].stats.starttime
+        for i in xrange(int(30 / seconds)):
+            t = starttime + i * seconds
+            for tr in self.st:
+                tr = tr.copy()
+                tr.trim(t, t + seconds - 0.001, nearest_sample=False)
+                packets.append(tr)
+        return packets
+
+    def test_routing(self):
+        """
+        Data packets have to be routed to their channel and processed like
+        for a single RtTrace per channel.
+        """
+        processes = [('boxcar', {'width': 50}), (np.abs, {}),
+                     ('scale', {'factor': 3.0}), ('int', {}),
+                     ('offset', {'offset': 2.5})]
+        rt_stream = RtStream(max_length=12)
+        for process, options in processes:
+            rt_stream.registerRtProcess(process, **options)
+        rt_traces = {}
+        packets = self._packets(3)
+        # several packets per channel in a single call
+        results = rt_stream.append(packets[:10])
+        results += rt_stream.append(Stream(traces=packets[10:20]))
+        for packet in packets[20:]:
+            results += rt_stream.append(packet)
+        self.assertEqual(len(results), len(packets))
+        for packet, result in zip(packets, results):
+            rt_trace = rt_traces.get(packet.id)
+            if rt_trace is None:
+                rt_trace = RtTrace(max_length=12)
+                for process, options in processes:
+                    rt_trace.registerRtProcess(process, **options)
+                rt_traces[packet.id] = rt_trace
+            expected = rt_trace.append(packet)
+            self.assertEqual(result.id, packet.id)
+            np.testing.assert_array_almost_equal(result.data, expected.data)
+        self.assertEqual(len(rt_stream), 4)
+        for channel in rt_stream:
+            expected = rt_traces[channel.id]
+            self.assertEqual(channel.stats.starttime, expected.stats.starttime)
+            self.assertEqual(channel.stats.npts,
+                             12 * channel.stats.sampling_rate)
+            np.testing.assert_array_almost_equal(channel.data, expected.data)
+        # processes registered later are applied to all channels
+        self.assertEqual(rt_stream.registerRtProcess('scale', factor=0.0), 6)
+        packets = self._packets(30)
+        self.assertRaises(TypeError, rt_stream.append, packets[0],
+                          gap_overlap_check=True)
+        self.assertRaises(NotImplementedError, rt_stream.registerRtProcess,
+                          'unknown')
+        self.assertRaises(NotImplementedError, rt_stream.__add__, rt_stream)
+
+    def test_getLatest(self):
+        """
+        Windows of all channels have to cover the same time span.
+        """
+        rt_stream = RtStream()
+        self.assertEqual(len(rt_stream.getLatest(5)), 0)
+        packets = self._packets(10)
+        # last packet of the first channel is missing
+        packets.remove(packets[-4])
+        rt_stream.append(packets)
+        windows = rt_stream.getLatest(5)
+        self.assertEqual(len(windows), 4)
+        for tr, channel in zip(windows, rt_stream):
+            self.assertEqual(tr.id, channel.id)
+            self.assertEqual(tr.stats.npts, 5 * tr.stats.sampling_rate)
+            self.assertEqual(tr.stats.starttime,
+                             self.st[0].stats.starttime + 15)
+            self.assertTrue(np.may_share_memory(tr.data, channel.data))
+            expected = channel.slice(tr.stats.starttime, tr.stats.endtime)
+            np.testing.assert_array_equal(tr.data, expected.data)
+        # selection of channels, windows are limited to the available data
+        windows = rt_stream.getLatest(100, ids=['BW.RJOB..EHN',
+                                                'BW.RJOB..LHZ'])
+        self.assertEqual([tr.stats.channel for tr in windows], ['EHN', 'LHZ'])
+        # last sample of the 50 Hz channel is 10 ms before the end of EHN
+        self.assertEqual([tr.stats.npts for tr in windows], [2999, 1500])
+        self.assertEqual(windows[0].stats.endtime, windows[1].stats.endtime)
+        self.assertTrue(isinstance(windows[0], Trace))
+
+    def test_initialTraces(self):
+        """
+        Initial channels have to be RtTrace objects with unique ids.
+        """
+        rt_trace = RtTrace()
+        rt_trace.append(self.st[0].copy())
+        rt_stream = RtStream(traces=[rt_trace])
+        self.assertEqual(rt_stream.registerRtProcess('scale', factor=2.0), 1)
+        tr = self.st[0].copy()
+        tr.stats.starttime = rt_trace.stats.endtime + tr.stats.delta
+        rt_stream.append(tr)
+        self.assertEqual(len(rt_stream), 1)
+        self.assertEqual(len(rt_trace), 2 * len(tr))
+        np.testing.assert_array_equal(rt_trace.data[len(tr):], tr.data * 2)
+        # plain traces and duplicate ids are rejected
+        self.assertRaises(TypeError, RtStream, traces=[self.st[0].copy()])
+        self.assertRaises(ValueError, RtStream, traces=[rt_trace, rt_trace])
+
+    def test_initialTracesWithProcesses(self):
+        """
+        Processes registered on initial channels are applied before the
+        processes of the RtStream, also if the RtStream has none.
+        """
+        packets = self._packets(5)[:8]
+
+        def initialChannels():
+            channels = []
+            for tr in self.st:
+                channel = RtTrace()
+                channel.stats.network = tr.stats.network
+                channel.stats.station = tr.stats.station
+                channel.stats.channel = tr.stats.channel
+                channel.registerRtProcess('scale', factor=2.0)
+                channels.append(channel)
+            return channels
+
+        rt_stream = RtStream(traces=initialChannels())
+        processed = rt_stream.append([tr.copy() for tr in packets])
+        for tr, packet in zip(processed, packets):
+            np.testing.assert_array_equal(tr.data, packet.data * 2.0)
+        # reference channels processed one by one
+        expected = {}
+        for tr in packets:
+            if tr.id not in expected:
+                expected[tr.id] = RtTrace()
+                expected[tr.id].registerRtProcess('scale', factor=2.0)
+                expected[tr.id].registerRtProcess('boxcar', width=10)
+            expected[tr.id].append(tr.copy())
+        rt_stream = RtStream(traces=initialChannels())
+        rt_stream.registerRtProcess('boxcar', width=10)
+        for rt_stream in (rt_stream, rt_stream.copy()):
+            rt_stream.append([tr.copy() for tr in packets])
+            self.assertEqual(len(rt_stream), 4)
+            for tr in rt_stream:
+                np.testing.assert_array_almost_equal(tr.data,
+                                                     expected[tr.id].data)
+
+
+def suite():
+    return unittest.makeSuite(RtStreamTestCase, 'test')
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -196,6 +196,45 @@ class RtTraceTestCase(unittest.TestCase):
         rt_trace.registerRtProcess('tauc', width=20, notexistingoption=True)
         self.assertRaises(TypeError, rt_trace.append, trace)
 
+    def test_ringBuffer(self):
+        """
+        Appended data are kept in a preallocated buffer of constant size if
+        max_length is given.
+        """
+        tr = read()[0]
+        traces = tr / 30
+        for max_length in (None, 5.0, 0.5):
+            rtr = RtTrace(max_length=max_length)
+            sizes = set()
+            for trace in traces:
+                rtr.append(trace, gap_overlap_check=True)
+                sizes.add(len(rtr._buffer))
+            if max_length is None:
+                np.testing.assert_array_equal(rtr.data, tr.data)
+                self.assertEqual(rtr.stats.starttime, tr.stats.starttime)
+                continue
+            # memory stays flat
+            self.assertEqual(len(sizes), 1)
+            npts = int(max_length * tr.stats.sampling_rate + 0.5)
+            np.testing.assert_array_equal(rtr.data, tr.data[-npts:])
+            self.assertAlmostEqual(rtr.stats.starttime - tr.stats.starttime,
+                                   (len(tr) - npts) * tr.stats.delta)
+            self.assertEqual(rtr.stats.endtime, tr.stats.endtime)
+            # latest data without copy
+            latest = rtr.getLatest(0.2)
+            self.assertEqual(len(latest), 20)
+            self.assertEqual(latest.stats.endtime, tr.stats.endtime)
+            np.testing.assert_array_equal(latest.data, tr.data[-20:])
+            self.assertTrue(np.may_share_memory(latest.data, rtr._buffer))
+        # data replaced by the user are taken over
+        rtr = RtTrace()
+        rtr.append(traces[0])
+        rtr.data = rtr.data * 2
+        rtr.append(traces[1])
+        np.testing.assert_array_equal(rtr.data[:len(traces[0])],
+                                      traces[0].data * 2)
+        self.assertEqual(len(rtr), len(traces[0]) + len(traces[1]))
+
 
 def suite():
     return unittest.makeSuite(RtTraceTestCase, 'test')
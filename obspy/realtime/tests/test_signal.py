@@ -4,7 +4,7 @@ The obspy.realtime.signal test suite.
 """
 from obspy import read
 from obspy.core.stream import Stream
-from obspy.realtime import RtTrace, signal
+from obspy.realtime import RtMemory, RtTrace, signal
 import numpy as np
 import os
 import unittest
@@ -242,6 +242,40 @@ class RealTimeSignalTestCase(unittest.TestCase):
         np.testing.assert_almost_equal(trace.data[1:],
                                        self.filt_trace_data[1:])
 
+    def test_unevenPackets(self):
+        """
+        Processing packets of very different length, including single
+        samples, has to give the same result as processing the whole trace.
+        """
+        starttime = self.orig_trace.stats.starttime
+        processes = [
+            (signal.integrate, {}, 1),
+            (signal.differentiate, {}, 1),
+            (signal.boxcar, {'width': 500}, 1),
+            (signal.tauc, {'width': 60}, 2),
+            (signal.kurtosis, {'win': 5}, 3),
+            (signal.mwpIntegral, {'mem_time': 240,
+                                  'ref_time': starttime + 301.506,
+                                  'max_time': 120,
+                                  'gain': 1.610210e+09}, 1)]
+        npts = self.orig_trace.stats.npts
+        bounds = [0, 1, 2, 503, 504, 3000, npts // 2, npts - 1, npts]
+        for func, options, num_memory in processes:
+            expected = func(self.orig_trace.copy(), **options)
+            rtmemory_list = [RtMemory() for _i in xrange(num_memory)]
+            result = []
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                trace = self.orig_trace.slice(
+                    starttime + start * self.orig_trace.stats.delta,
+                    starttime + (end - 1) * self.orig_trace.stats.delta)
+                trace = trace.copy()
+                self.assertEqual(trace.stats.npts, end - start)
+                result.append(func(trace, rtmemory_list=rtmemory_list,
+                                   **options))
+            np.testing.assert_allclose(np.concatenate(result), expected,
+                                       rtol=1e-10, atol=1e-10 *
+                                       np.abs(expected).max())
+
     def _runRtProcess(self, process_list, max_length=None):
         """
         Helper function to create a RtTrace, register all given process
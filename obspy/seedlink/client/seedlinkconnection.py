@@ -17,10 +17,11 @@ from obspy.seedlink.client.slnetstation import SLNetStation
 from obspy.seedlink.client.slstate import SLState
 from obspy.seedlink.seedlinkexception import SeedLinkException
 from obspy.seedlink.slpacket import SLPacket
+import logging
+import os
 import select
 import socket
 import time
-import logging
 
 
 # default logger
@@ -49,6 +50,9 @@ class SeedLinkConnection(object):
     :var QUOTE_CHAR: Character used for delimiting timestamp strings in the
         statefile.
     :type QUOTE_CHAR: str
+    :var STATEFILE_COMPACTION: Number of state file lines per stream after
+        which the state file is compacted (default is 4).
+    :type STATEFILE_COMPACTION: int
 
     Publicly accessible (get/set) parameters:
 
@@ -98,6 +102,12 @@ class SeedLinkConnection(object):
     :type state: :class:`~obspy.seedlink.client.SLState`
     :var infoStrBuf: String to store INFO packet contents.
     :type infoStrBuf: str
+    :var saved_state: Sequence numbers and time stamps last written to the
+        state file, keyed by (net, station).
+    :type saved_state: dict
+    :var statelog_lines: Number of lines in the state file, ``None`` if no
+        snapshot has been written or recovered yet.
+    :type statelog_lines: int
     """
 
     SEEDLINK_PROTOCOL_PREFIX = "seedlink://"
@@ -105,6 +115,7 @@ class SeedLinkConnection(object):
     UNINETWORK = "UNINETWORK"
     DFT_READBUF_SIZE = 1024
     QUOTE_CHAR = '"'
+    STATEFILE_COMPACTION = 4
 
     def __init__(self):
         """
@@ -131,6 +142,8 @@ class SeedLinkConnection(object):
         self.state = None
         self.infoStrBuf = ""
         self.state = SLState()
+        self.saved_state = {}
+        self.statelog_lines = None
 
     def isConnected(self, timeout=1.0):
         """
@@ -562,6 +575,9 @@ class SeedLinkConnection(object):
         Recover the state file and put the sequence numbers and time stamps
         into the pre-existing stream chain entries.
 
+        The state file is an append-only log, the last line of a station
+        wins. Incomplete lines left by an interrupted write are ignored.
+
         :param statefile: path and name of statefile.
         :return: the number of stream chains recovered.
 
@@ -584,56 +600,29 @@ class SeedLinkConnection(object):
         logger.info(msg % (self.statefile))
         linecount = 0
         stacount = 0
+        recovered = {}
+        complete = True
         try:
             for line in statefile_file:
                 linecount += 1
                 if line.startswith('#') or line.startswith('*'):
                     # comment lines
                     continue
-                net = None
-                station = None
-                seqnum = -1
-                timeStr = ""
                 tokens = line.split()
-                net = tokens[0]
-                station = tokens[1]
-                seqnum = int(tokens[2])
-                timeStr = tokens[3]
-
+                complete = line.endswith('\n')
                 # check for completeness of read
-                if timeStr == "":
+                if not line.endswith('\n') or len(tokens) != 4:
                     msg = "error parsing line of state file: %s" % (line)
                     logger.error(msg)
                     continue
-                elif timeStr == "null":
+                net, station, seqnum, timeStr = tokens
+                try:
+                    seqnum = int(seqnum)
+                except ValueError:
+                    msg = "error parsing line of state file: %s" % (line)
+                    logger.error(msg)
                     continue
-
-                # Search for a matching net/station in the stream chain
-                stream = None
-                for i in range(len(self.streams)):
-                    stream = self.streams[i]
-                    if stream.net == net and stream.station == station:
-                        break
-                    stream = None
-
-                # update net/station entry in the stream chain
-                if stream is not None:
-                    stream.seqnum = seqnum
-                    if timeStr is not None:
-                        try:
-                            # AJL stream.btime = Btime(timeStr)
-                            stream.btime = UTCDateTime(timeStr)
-                            stacount += 1
-                        except Exception as e:
-                            msg = "parsing timestamp in line %s of state " + \
-                                "file: %s"
-                            logger.error(msg % (linecount, e.value))
-            if (stacount == 0):
-                msg = "no matching streams found in %s"
-                logger.error(msg % (self.statefile))
-            else:
-                msg = "recovered state for %s streams in %s"
-                logger.debug(msg % (stacount,  self.statefile))
+                recovered[(net, station)] = (linecount, seqnum, timeStr)
         except IOError as e:
             msg = "%s: reading state file: %s" % (e, self.statefile)
             logger.critical(msg)
@@ -643,22 +632,69 @@ class SeedLinkConnection(object):
                 statefile_file.close()
             except Exception as e:
                 pass
+
+        # update net/station entries in the stream chain
+        self.saved_state = {}
+        for stream in self.streams:
+            key = (stream.net, stream.station)
+            if key not in recovered:
+                continue
+            lineno, seqnum, timeStr = recovered[key]
+            if timeStr == "null":
+                continue
+            stream.seqnum = seqnum
+            try:
+                # AJL stream.btime = Btime(timeStr)
+                stream.btime = UTCDateTime(timeStr)
+                stacount += 1
+            except Exception as e:
+                msg = "parsing timestamp in line %s of state file: %s"
+                logger.error(msg % (lineno, e))
+                continue
+            self.saved_state[key] = (stream.seqnum, stream.btime)
+        # further calls of saveState() only append changes, a truncated last
+        # line has to be removed by a new snapshot first
+        self.statelog_lines = linecount if complete else None
+        if (stacount == 0):
+            msg = "no matching streams found in %s"
+            logger.error(msg % (self.statefile))
+        else:
+            msg = "recovered state for %s streams in %s"
+            logger.debug(msg % (stacount,  self.statefile))
         return stacount
 
     def saveState(self, statefile):
         """
-        Save all current sequence numbers and time stamps into the
+        Save all changed sequence numbers and time stamps into the
         given state file.
 
+        Only streams changed since the last call are appended to the state
+        file. The first call and every call after the file has grown beyond
+        STATEFILE_COMPACTION lines per stream write a complete snapshot to a
+        temporary file which atomically replaces the state file.
+
         :param statefile: path and name of statefile.
         :return: the number of stream chains saved.
 
         :raise: SeedLinkException on error.
         """
+        if self.statelog_lines is None or self.statelog_lines > \
+                self.STATEFILE_COMPACTION * max(len(self.streams), 1):
+            return self._writeStateSnapshot(statefile)
+        changed = []
+        for curstream in self.streams:
+            if curstream.btime is None:
+                continue
+            key = (curstream.net, curstream.station)
+            value = (curstream.seqnum, curstream.btime)
+            if self.saved_state.get(key) != value:
+                changed.append(curstream)
+        if not changed:
+            return 0
         # open the state file
         statefile_file = None
         try:
-            statefile_file = open(self.statefile, 'w')
+            statefile_file = open(self.statefile, 'a')
         except IOError as ioe:
             logger.error("cannot open state file: %s" % (ioe))
             return 0
@@ -666,17 +702,8 @@ class SeedLinkConnection(object):
             msg = "%s: opening state file: %s" % (e, statefile)
             logger.critical(msg)
             raise SeedLinkException(msg)
-        logger.debug("saving connection state to state file")
-        stacount = 0
         try:
-            # Loop through the stream chain
-            for curstream in self.streams:
-                #print "DEBUG: curstream:", curstream.net, curstream.station,
-                #print curstream.btime
-                if curstream.btime is not None:
-                    statefile_file.write(curstream.net + " " + \
-                        curstream.station + " " + str(curstream.seqnum) + \
-                        " " + curstream.btime.formatSeedLink() + "\n")
+            statefile_file.write(self._formatState(changed))
         except IOError as e:
             msg = "%s: writing state file: %s" % (e, self.statefile)
             logger.critical(msg)
@@ -686,7 +713,66 @@ class SeedLinkConnection(object):
                 statefile_file.close()
             except Exception as e:
                 pass
-        return stacount
+        self.statelog_lines += len(changed)
+        return len(changed)
+
+    def _writeStateSnapshot(self, statefile):
+        """
+        Atomically replace the state file by the current state of all
+        streams.
+
+        :param statefile: path and name of statefile.
+        :return: the number of stream chains saved.
+        """
+        streams = [curstream for curstream in self.streams
+                   if curstream.btime is not None]
+        tmpfile = self.statefile + '.tmp'
+        # open the state file
+        statefile_file = None
+        try:
+            statefile_file = open(tmpfile, 'w')
+        except IOError as ioe:
+            logger.error("cannot open state file: %s" % (ioe))
+            return 0
+        except Exception as e:
+            msg = "%s: opening state file: %s" % (e, statefile)
+            logger.critical(msg)
+            raise SeedLinkException(msg)
+        logger.debug("saving connection state to state file")
+        self.saved_state = {}
+        try:
+            try:
+                statefile_file.write(self._formatState(streams))
+                statefile_file.flush()
+                os.fsync(statefile_file.fileno())
+            finally:
+                statefile_file.close()
+            # rename does not replace existing files on Windows
+            if os.name == 'nt' and os.path.exists(self.statefile):
+                os.remove(self.statefile)
+            os.rename(tmpfile, self.statefile)
+        except (IOError, OSError) as e:
+            msg = "%s: writing state file: %s" % (e, self.statefile)
+            logger.critical(msg)
+            raise SeedLinkException(msg)
+        self.statelog_lines = len(streams)
+        return len(streams)
+
+    def _formatState(self, streams):
+        """
+        Returns the state file lines of the given streams and remembers
+        them as saved.
+        """
+        lines = []
+        for curstream in streams:
+            #print "DEBUG: curstream:", curstream.net, curstream.station,
+            #print curstream.btime
+            lines.append(curstream.net + " " + curstream.station + " " +
+                         str(curstream.seqnum) + " " +
+                         curstream.btime.formatSeedLink() + "\n")
+            self.saved_state[(curstream.net, curstream.station)] = \
+                (curstream.seqnum, curstream.btime)
+        return "".join(lines)
 
     def doTerminate(self):
         """
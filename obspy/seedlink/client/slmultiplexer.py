@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+"""
+Module to collect data from many SeedLink servers in a single thread.
+
+:copyright:
+    The ObsPy Development Team (devs@obspy.org)
+:license:
+    GNU Lesser General Public License, Version 3
+    (http://www.gnu.org/copyleft/lesser.html)
+"""
+
+from obspy.core.utcdatetime import UTCDateTime
+from obspy.seedlink.client.seedlinkconnection import SeedLinkConnection
+from obspy.seedlink.seedlinkexception import SeedLinkException
+from obspy.seedlink.slpacket import SLPacket
+import Queue
+import collections
+import errno
+import logging
+import select
+import socket
+import struct
+import time
+
+
+# default logger
+logger = logging.getLogger('obspy.seedlink')
+
+_PACKET_SIZE = SLPacket.SLHEADSIZE + SLPacket.SLRECSIZE
+
+
+def _recordStartTime(msrecord):
+    """
+    Returns the start time of a Mini-SEED record from its fixed header.
+    """
+    byteorder = '>'
+    year, julday = struct.unpack('>HH', str(msrecord[20:24]))
+    if not 1900 <= year <= 2100:
+        byteorder = '<'
+        year, julday = struct.unpack('<HH', str(msrecord[20:24]))
+    hour, minute, second, _unused, fract = \
+        struct.unpack(byteorder + 'BBBBH', str(msrecord[24:30]))
+    return UTCDateTime(year=year, julday=julday, hour=hour, minute=minute,
+                       second=second, microsecond=fract * 100)
+
+
+class _Link(object):
+    """
+    Run time state of a single server connection of a SLMultiplexer.
+    """
+    DOWN = 0
+    CONNECTING = 1
+    NEGOTIATING = 2
+    DATA = 3
+
+    def __init__(self, slconn):
+        self.slconn = slconn
+        self.state = _Link.DOWN
+        self.sock = None
+        self.rbuf = bytearray()
+        self.wbuf = ''
+        self.commands = collections.deque()
+        self.command = None
+        self.response = []
+        self.pending = collections.deque()
+        self.reconnect_time = 0.0
+        self.data_time = 0.0
+        self.finished = False
+        self.stations = dict(((stream.net, stream.station), stream)
+                             for stream in slconn.streams)
+        self.wildcarded = any('?' in key[0] + key[1] or '*' in key[0] + key[1]
+                              for key in self.stations)
+
+
+class SLMultiplexer(object):
+    """
+    Collects data from many SeedLink servers in a single event loop.
+
+    All server connections are non-blocking sockets multiplexed with
+    ``select()``, connections are negotiated in multi-station mode and
+    re-established with the last sequence number of each station after
+    network errors or time-outs. Received packets are delivered to a bounded
+    queue, connections are not read while packets of them are waiting for
+    space in the queue, so a slow consumer throttles the servers via TCP flow
+    control instead of filling up memory.
+
+    :type maxsize: int, optional
+    :param maxsize: Maximum number of packets in :attr:`queue`.
+    :var queue: Queue of received :class:`~obspy.seedlink.slpacket.SLPacket`
+        objects.
+    :type queue: :class:`Queue.Queue`
+
+    .. rubric:: Example
+
+    >>> from obspy.seedlink.client.slmultiplexer import SLMultiplexer
+    >>> mux = SLMultiplexer(maxsize=100)
+    >>> slconn = mux.addServer('geofon.gfz-potsdam.de:18000',
+    ...                        'GE_STU:BHZ,GE_WLF:BHZ')
+    >>> slconn = mux.addServer('rtserve.iris.washington.edu:18000',
+    ...                        'IU_ANMO:BHZ')
+    >>> import threading
+    >>> thread = threading.Thread(target=mux.run)
+    >>> thread.start()  # doctest: +SKIP
+    >>> packet = mux.queue.get()  # doctest: +SKIP
+    >>> trace = packet.getTrace()  # doctest: +SKIP
+    >>> mux.terminate()  # doctest: +SKIP
+    """
+    def __init__(self, maxsize=1000):
+        self.queue = Queue.Queue(maxsize)
+        self.links = []
+        self.terminate_flag = False
+
+    def addServer(self, sladdr, streams, selectors="", begin_time=None,
+                  end_time=None, dialup=False, statefile=None):
+        """
+        Adds a SeedLink server to collect data from.
+
+        :type sladdr: str
+        :param sladdr: Address of the server in ``host:port`` format.
+        :type streams: str
+        :param streams: Streams and selectors in the format
+            ``"stream1[:selectors1],stream2[:selectors2],..."``, e.g.
+            ``"IU_KONO:BHE BHN,GE_WLF,MN_AQU:HH?.D"``.
+        :type selectors: str, optional
+        :param selectors: Default selectors for streams without selectors.
+        :type begin_time: :class:`~obspy.core.utcdatetime.UTCDateTime`,
+            optional
+        :param begin_time: Begin of the time window to request.
+        :type end_time: :class:`~obspy.core.utcdatetime.UTCDateTime`,
+            optional
+        :param end_time: End of the time window to request.
+        :type dialup: bool, optional
+        :param dialup: Use dial-up mode, the server closes the connection
+            after sending all buffered data.
+        :type statefile: str, optional
+        :param statefile: Name of file for reading (if exists) and storing
+            the sequence numbers of all stations of this server.
+        :rtype: SeedLinkConnection
+        :return: Connection description of the server, which can be used for
+            further configuration, e.g. of ``netto`` and ``netdly``.
+        """
+        slconn = SeedLinkConnection()
+        slconn.sladdr = sladdr
+        slconn.parseStreamlist(streams, selectors)
+        slconn.begin_time = begin_time
+        slconn.end_time = end_time
+        slconn.dialup = dialup
+        if statefile is not None:
+            slconn.setStateFile(statefile)
+        self.addConnection(slconn)
+        return slconn
+
+    def addConnection(self, slconn):
+        """
+        Adds a configured multi-station SeedLinkConnection to collect data
+        from.
+
+        :type slconn: SeedLinkConnection
+        :param slconn: Connection description, the connection itself is
+            handled by this SLMultiplexer.
+        """
+        if not slconn.checkslcd() or not slconn.multistation:
+            msg = "invalid multi-station connection description for %s"
+            raise SeedLinkException(msg % (slconn.sladdr))
+        self.links.append(_Link(slconn))
+
+    def getSequenceNumbers(self):
+        """
+        Returns the sequence numbers of the last packets received.
+
+        :rtype: dict
+        :return: Sequence numbers with ``(sladdr, network, station)`` tuples
+            as keys, -1 if no packet has been received yet.
+        """
+        return dict(((link.slconn.sladdr, stream.net, stream.station),
+                     stream.seqnum)
+                    for link in self.links for stream in link.slconn.streams)
+
+    def terminate(self):
+        """
+        Stops the event loop of :meth:`run`.
+        """
+        self.terminate_flag = True
+
+    def run(self, timeout=None):
+        """
+        Runs the event loop until all connections are finished, the given
+        time has passed or :meth:`terminate` is called. All connections are
+        closed on return.
+
+        :type timeout: float, optional
+        :param timeout: Maximum run time in seconds.
+        """
+        self.terminate_flag = False
+        start = time.time()
+        try:
+            while not self.terminate_flag:
+                if all(link.finished and not link.pending
+                       for link in self.links):
+                    break
+                if timeout is not None and time.time() - start > timeout:
+                    break
+                self.poll(0.05)
+        finally:
+            self.close()
+
+    def poll(self, timeout=0.0):
+        """
+        Runs a single pass of the event loop.
+
+        :type timeout: float, optional
+        :param timeout: Time in seconds to wait for network events.
+        """
+        now = time.time()
+        rlist = []
+        wlist = []
+        for link in self.links:
+            self._deliver(link)
+            if link.pending:
+                # delivery is blocked, don't time out
+                link.data_time = now
+            if link.finished:
+                continue
+            if link.state == _Link.DOWN and now >= link.reconnect_time:
+                self._connect(link, now)
+            elif link.state != _Link.DOWN and link.slconn.netto > 0 and \
+                    now - link.data_time > link.slconn.netto:
+                # also covers servers that accept but never answer
+                msg = "[%s] network timeout (%s), reconnecting in %ss"
+                logger.warn(msg % (link.slconn.sladdr, link.slconn.netto,
+                                   link.slconn.netdly))
+                self._disconnect(link, now)
+            if link.sock is None:
+                continue
+            if link.state == _Link.CONNECTING or link.wbuf:
+                wlist.append(link.sock)
+            if link.state != _Link.CONNECTING and not link.pending:
+                rlist.append(link.sock)
+        if not rlist and not wlist:
+            time.sleep(timeout)
+            return
+        try:
+            readable, writable, _ = select.select(rlist, wlist, [], timeout)
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                return
+            raise
+        now = time.time()
+        links = dict((link.sock, link) for link in self.links
+                     if link.sock is not None)
+        for sock in writable:
+            self._write(links[sock], now)
+        for sock in readable:
+            link = links[sock]
+            if link.sock is sock:
+                self._read(link, now)
+
+    def close(self):
+        """
+        Closes all connections and saves the states of all connections with a
+        state file.
+        """
+        for link in self.links:
+            if link.sock is not None:
+                try:
+                    link.sock.sendall('BYE\r')
+                except socket.error:
+                    pass
+                self._disconnect(link)
+            if link.slconn.statefile is not None:
+                try:
+                    link.slconn.saveState(link.slconn.statefile)
+                except SeedLinkException as sle:
+                    logger.error(sle.value)
+
+    def _deliver(self, link):
+        """
+        Moves packets of a connection into the queue as long as there is
+        space.
+        """
+        pending = link.pending
+        while pending:
+            try:
+                self.queue.put_nowait(pending[0])
+            except Queue.Full:
+                return
+            pending.popleft()
+
+    def _connect(self, link, now):
+        """
+        Starts a non-blocking connect to the server of a connection.
+        """
+        sladdr = link.slconn.sladdr
+        host = sladdr[0:sladdr.find(':')] or 'localhost'
+        port = int(sladdr[sladdr.find(':') + 1:])
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setblocking(0)
+        try:
+            err = sock.connect_ex((host, port))
+        except socket.error as e:
+            err = e.args[0]
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            logger.error("[%s] cannot connect to SeedLink server: %s" %
+                         (sladdr, errno.errorcode.get(err, err)))
+            sock.close()
+            self._disconnect(link, now)
+            return
+        link.sock = sock
+        link.state = _Link.CONNECTING
+        link.data_time = now
+
+    def _disconnect(self, link, now=None):
+        """
+        Closes the socket of a connection and schedules a reconnect.
+        """
+        if link.sock is not None:
+            try:
+                link.sock.close()
+            except socket.error:
+                pass
+            link.sock = None
+            logger.info("[%s] network socket closed" % (link.slconn.sladdr))
+        link.state = _Link.DOWN
+        link.rbuf = bytearray()
+        link.wbuf = ''
+        link.commands.clear()
+        link.command = None
+        link.response = []
+        if now is not None:
+            link.reconnect_time = now + link.slconn.netdly
+
+    def _write(self, link, now):
+        """
+        Completes a connect or sends buffered commands.
+        """
+        if link.state == _Link.CONNECTING:
+            err = link.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err != 0:
+                logger.error("[%s] cannot connect to SeedLink server: %s" %
+                             (link.slconn.sladdr,
+                              errno.errorcode.get(err, err)))
+                self._disconnect(link, now)
+                return
+            logger.info("[%s] network socket opened" % (link.slconn.sladdr))
+            link.state = _Link.NEGOTIATING
+            self._prepareCommands(link)
+            self._sendNext(link)
+        if not link.wbuf:
+            return
+        try:
+            sent = link.sock.send(link.wbuf)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            logger.error("[%s] socket write error: %s, reconnecting in %ss" %
+                         (link.slconn.sladdr, e, link.slconn.netdly))
+            self._disconnect(link, now)
+            return
+        link.wbuf = link.wbuf[sent:]
+
+    def _read(self, link, now):
+        """
+        Reads available bytes of a connection and processes them.
+        """
+        try:
+            data = link.sock.recv(65536)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            logger.error("[%s] socket read error: %s, reconnecting in %ss" %
+                         (link.slconn.sladdr, e, link.slconn.netdly))
+            self._disconnect(link, now)
+            return
+        if not data:
+            logger.warn("[%s] connection closed by server, reconnecting in "
+                        "%ss" % (link.slconn.sladdr, link.slconn.netdly))
+            self._disconnect(link, now)
+            return
+        link.data_time = now
+        link.rbuf.extend(data)
+        if link.state == _Link.NEGOTIATING:
+            self._readResponses(link)
+        if link.state == _Link.DATA:
+            self._readPackets(link, now)
+
+    def _prepareCommands(self, link):
+        """
+        Prepares the handshake commands of a multi-station connection like
+        SeedLinkConnection.negotiateMultiStation() does.
+        """
+        slconn = link.slconn
+        commands = link.commands
+        commands.append(("HELLO", None))
+        for stream in slconn.streams:
+            key = (stream.net, stream.station)
+            commands.append(("STATION %s %s" % (stream.station, stream.net),
+                             key))
+            for selector in stream.getSelectors():
+                commands.append(("SELECT " + selector, key))
+            action = slconn.dialup and "FETCH" or "DATA"
+            if stream.seqnum != -1 and slconn.resume:
+                action += " %06X" % ((stream.seqnum + 1) & 0xFFFFFF)
+                if slconn.lastpkttime and stream.btime is not None:
+                    action += " " + stream.getSLTimeStamp()
+            elif slconn.begin_time is not None:
+                action = "TIME " + slconn.begin_time.formatSeedLink()
+                if slconn.end_time is not None:
+                    action += " " + slconn.end_time.formatSeedLink()
+            commands.append((action, key))
+        commands.append(("END", None))
+
+    def _sendNext(self, link):
+        """
+        Queues the next handshake command of a connection for sending.
+        """
+        if not link.commands:
+            link.state = _Link.DATA
+            link.command = None
+            return
+        command, key = link.commands.popleft()
+        logger.debug("[%s] sending: %s" % (link.slconn.sladdr, command))
+        link.wbuf += command + "\r"
+        if command == "END":
+            # no response, data will follow
+            link.state = _Link.DATA
+            link.command = None
+            return
+        link.command = (command, key)
+        link.response = []
+
+    def _readResponses(self, link):
+        """
+        Processes handshake responses of a connection.
+        """
+        slconn = link.slconn
+        while link.state == _Link.NEGOTIATING:
+            index = link.rbuf.find("\r\n")
+            if index < 0:
+                return
+            link.response.append(str(link.rbuf[:index]))
+            del link.rbuf[:index + 2]
+            command, key = link.command
+            if command == "HELLO":
+                if len(link.response) < 2:
+                    continue
+                servstr = link.response[0]
+                if not servstr.lower().startswith("seedlink"):
+                    logger.error("[%s] incorrect response to HELLO: '%s'" %
+                                 (slconn.sladdr, servstr))
+                    link.finished = True
+                    self._disconnect(link)
+                    return
+                slconn.server_id = servstr
+                logger.info("[%s] connected to: '%s'" %
+                            (slconn.sladdr, servstr))
+            elif link.response[0] != "OK":
+                msg = "[%s] response: %s not accepted"
+                logger.error(msg % (slconn.sladdr, command))
+                if command.startswith("STATION"):
+                    # skip remaining commands of this station
+                    while link.commands and link.commands[0][1] == key:
+                        link.commands.popleft()
+            self._sendNext(link)
+
+    def _readPackets(self, link, now):
+        """
+        Splits received bytes of a connection into packets and updates the
+        sequence numbers of the stations.
+        """
+        rbuf = link.rbuf
+        offset = 0
+        received = False
+        while True:
+            if rbuf[offset:offset + 3] == SLPacket.ENDSIGNATURE:
+                logger.info("[%s] end of buffer or selected time window" %
+                            (link.slconn.sladdr))
+                link.finished = True
+                self._disconnect(link)
+                break
+            if rbuf[offset:offset + 7] == SLPacket.ERRORSIGNATURE:
+                logger.error("[%s] SeedLink reported an error" %
+                             (link.slconn.sladdr))
+                self._disconnect(link, now)
+                break
+            if len(rbuf) - offset < _PACKET_SIZE:
+                break
+            if rbuf[offset:offset + 6] == SLPacket.INFOSIGNATURE:
+                # keep-alive and INFO packets are not handled here
+                offset += _PACKET_SIZE
+                continue
+            slpacket = SLPacket(rbuf, offset)
+            offset += _PACKET_SIZE
+            seqnum = slpacket.getSequenceNumber()
+            if seqnum == -1:
+                logger.error("[%s] bad packet: could not determine sequence "
+                             "number" % (link.slconn.sladdr))
+                continue
+            msrecord = slpacket.msrecord
+            key = (str(msrecord[18:20]).strip(), str(msrecord[8:13]).strip())
+            stream = link.stations.get(key)
+            if stream is not None:
+                stream.seqnum = seqnum
+                stream.btime = _recordStartTime(msrecord)
+                received = True
+            elif not link.wildcarded:
+                logger.error("[%s] unexpected data received: %s %s" %
+                             ((link.slconn.sladdr,) + key))
+            link.pending.append(slpacket)
+        if link.rbuf is rbuf:
+            del rbuf[:offset]
+        if received and link.slconn.statefile is not None:
+            link.slconn.saveState(link.slconn.statefile)
+        self._deliver(link)
@@ -13,8 +13,10 @@ JSeedLink of Anthony Lomax
 """
 
 
+from obspy.core.stream import Stream
 from obspy.core.trace import Trace
-from obspy.mseed.headers import clibmseed, HPTMODULUS, MSRecord
+from obspy.core.utcdatetime import UTCDateTime
+from obspy.mseed.headers import clibmseed, DATATYPES, HPTMODULUS, MSRecord
 from obspy.mseed.util import _convertMSRToDict, _ctypesArray2NumpyArray
 from obspy.seedlink.seedlinkexception import SeedLinkException
 import ctypes as C
@@ -174,3 +176,146 @@ class SLPacket(object):
             except:
                 blockette = None
         return msrecord_py.blkts.contents.blkt_type
+
+
+# header of the contiguous sample blocks returned by decodePackets()
+BLOCK_HEADER = np.dtype([('network', 'S10'), ('station', 'S10'),
+                         ('location', 'S10'), ('channel', 'S10'),
+                         ('starttime', 'i8'), ('sampling_rate', 'f8'),
+                         ('npts', 'i8')])
+
+
+def decodePackets(packets):
+    """
+    Decodes the Mini-SEED records of many SeedLink packets at once.
+
+    All records are sorted by id and time and handed to libmseed in a
+    single buffer, records of the same channel are merged into contiguous
+    blocks of samples. Packets
+    without data samples (e.g. INFO packets or log records) are ignored.
+
+    :type packets: list of :class:`~obspy.seedlink.slpacket.SLPacket`
+    :param packets: Received SeedLink data packets in any order.
+    :rtype: tuple of :class:`numpy.ndarray` and list
+    :return: Headers of all blocks as structured array of type
+        :data:`BLOCK_HEADER` (start times in microseconds since 1970) and
+        the list of corresponding data arrays.
+
+    .. rubric:: Example
+
+    >>> from obspy import read
+    >>> from obspy.seedlink.tests.mockserver import splitRecords
+    >>> records = splitRecords(read())
+    >>> packets = [SLPacket('SL%06X' % i + rec, 0)
+    ...            for i, rec in enumerate(records[('BW', 'RJOB')])]
+    >>> headers, data = decodePackets(packets)
+    >>> print(headers['channel'])
+    ['EHE' 'EHN' 'EHZ']
+    >>> print(headers['npts'])
+    [3000 3000 3000]
+    >>> print(UTCDateTime(headers['starttime'][0] / 1e6))
+    2009-08-24T00:20:03.000000Z
+    """
+    reclen = SLPacket.SLRECSIZE
+    buf = ''.join([packet.msrecord for packet in packets
+                   if packet.msrecord is not None and
+                   len(packet.msrecord) == reclen])
+    records = np.frombuffer(buf, dtype='b').reshape(-1, reclen)
+    # only data records with samples and a sampling rate, number of samples
+    # and sample rate factor are zero in any byte order
+    keep = np.in1d(records[:, 6], np.frombuffer('DRQM', dtype='b'))
+    keep &= records[:, 30:32].any(axis=1)
+    keep &= records[:, 32:34].any(axis=1)
+    headers = np.empty(0, dtype=BLOCK_HEADER)
+    if not keep.any():
+        return headers, []
+    records = records[keep]
+    # libmseed only merges records of a channel given in time order, sort by
+    # id and record start time (BTIME in 1/10000 s)
+    ids = np.ascontiguousarray(records[:, 8:20]).view('S12').ravel()
+    btime = records[:, 20:30].view('u1').astype('i8')
+    year = btime[:, 0] * 256 + btime[:, 1]
+    swap = (year < 1900) | (year > 2100)
+    hi = np.where(swap, 1, 0)
+    lo = 1 - hi
+    rows = np.arange(len(btime))
+    year = np.where(swap, btime[:, 1] * 256 + btime[:, 0], year)
+    doy = btime[rows, 2 + hi] * 256 + btime[rows, 2 + lo]
+    fract = btime[rows, 8 + hi] * 256 + btime[rows, 8 + lo]
+    ticks = (((year * 1000 + doy) * 24 + btime[:, 4]) * 60 +
+             btime[:, 5]) * 60 + btime[:, 6]
+    ticks = ticks * 10000 + fract
+    order = np.lexsort((ticks, ids))
+    buffer = np.ascontiguousarray(records[order]).ravel()
+
+    all_data = []
+
+    def allocate_data(samplecount, sampletype):
+        if sampletype == "\x00":
+            data = np.empty(0)
+        else:
+            data = np.empty(samplecount, dtype=DATATYPES[sampletype])
+        all_data.append(data)
+        return data.ctypes.data
+    allocData = C.CFUNCTYPE(C.c_long, C.c_int, C.c_char)(allocate_data)
+
+    lil = clibmseed.readMSEEDBuffer(buffer, len(buffer), None, 1,
+                                    reclen, C.c_int(-1),
+                                    C.c_int(0), -1, allocData)
+    blocks = []
+    try:
+        current_id = lil.contents
+    except ValueError:
+        current_id = None
+    while current_id is not None:
+        try:
+            segment = current_id.firstSegment.contents
+        except ValueError:
+            segment = None
+        while segment is not None:
+            blocks.append((current_id.network, current_id.station,
+                           current_id.location, current_id.channel,
+                           segment.starttime, segment.samprate,
+                           segment.samplecnt))
+            try:
+                segment = segment.next.contents
+            except ValueError:
+                segment = None
+        try:
+            current_id = current_id.next.contents
+        except ValueError:
+            current_id = None
+    clibmseed.lil_free(lil)
+    del lil
+    headers = np.array(blocks, dtype=BLOCK_HEADER)
+    headers['npts'] = [len(data) for data in all_data]
+    return headers, all_data
+
+
+def packetsToStream(packets):
+    """
+    Decodes many SeedLink packets into one Trace per contiguous block.
+
+    The returned Stream can directly be appended to an
+    :class:`~obspy.realtime.rtstream.RtStream`, see :func:`decodePackets`
+    for details.
+
+    :type packets: list of :class:`~obspy.seedlink.slpacket.SLPacket`
+    :param packets: Received SeedLink data packets.
+    :rtype: :class:`~obspy.core.stream.Stream`
+    """
+    headers, all_data = decodePackets(packets)
+    traces = []
+    for header, data in zip(headers, all_data):
+        stats = {'network': header['network'], 'station': header['station'],
+                 'location': header['location'],
+                 'channel': header['channel'],
+                 'sampling_rate': header['sampling_rate'],
+                 'starttime': UTCDateTime(header['starttime'] / HPTMODULUS)}
+        traces.append(Trace(data=data, header=stats))
+    return Stream(traces=traces)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(exclude_empty=True)
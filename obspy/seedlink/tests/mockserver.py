@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+A minimal local SeedLink server for testing.
+
+It implements the multi-station handshake (HELLO, STATION, SELECT, DATA,
+FETCH, END, BYE) and serves given Mini-SEED records of 512 bytes, numbered
+per station starting with sequence number 0.
+
+:copyright:
+    The ObsPy Development Team (devs@obspy.org)
+:license:
+    GNU Lesser General Public License, Version 3
+    (http://www.gnu.org/copyleft/lesser.html)
+"""
+
+from StringIO import StringIO
+import SocketServer
+import threading
+import time
+
+
+def splitRecords(stream, reclen=512):
+    """
+    Writes a Stream to Mini-SEED and returns the records of each station.
+
+    :rtype: dict
+    :return: Lists of records with ``(network, station)`` as keys.
+    """
+    records = {}
+    for tr in stream:
+        buf = StringIO()
+        tr.write(buf, format='MSEED', reclen=reclen)
+        data = buf.getvalue()
+        key = (tr.stats.network, tr.stats.station)
+        records.setdefault(key, []).extend(
+            data[i:i + reclen] for i in xrange(0, len(data), reclen))
+    return records
+
+
+class _MockSeedLinkHandler(SocketServer.BaseRequestHandler):
+    """
+    Handles a single client connection of a MockSeedLinkServer.
+    """
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        drop_after = server.drop_after if server.connections == 1 else None
+        requests = []
+        station = None
+        dialup = False
+        buf = ''
+        while True:
+            while '\r' not in buf:
+                data = self.request.recv(1024)
+                if not data:
+                    return
+                buf += data
+            line, buf = buf.split('\r', 1)
+            buf = buf.lstrip('\n')
+            server.commands.append(line)
+            tokens = line.split()
+            command = tokens[0].upper() if tokens else ''
+            if command == 'HELLO':
+                self.request.sendall('SeedLink v3.1 (mock) :: SLPROTO:3.1\r\n'
+                                     'ObsPy mock SeedLink server\r\n')
+            elif command == 'STATION':
+                station = (tokens[2], tokens[1])
+                if station in server.records:
+                    self.request.sendall('OK\r\n')
+                else:
+                    station = None
+                    self.request.sendall('ERROR\r\n')
+            elif command == 'SELECT':
+                self.request.sendall('OK\r\n')
+            elif command in ('DATA', 'FETCH'):
+                dialup = command == 'FETCH'
+                seqnum = int(tokens[1], 16) if len(tokens) > 1 else 0
+                requests.append((station, seqnum))
+                self.request.sendall('OK\r\n')
+            elif command == 'END':
+                break
+            elif command == 'BYE':
+                return
+            else:
+                self.request.sendall('ERROR\r\n')
+        # send packets of all stations interleaved
+        queues = [(key, range(first, len(server.records[key])))
+                  for key, first in requests]
+        count = 0
+        while any(seqnums for _key, seqnums in queues):
+            for key, seqnums in queues:
+                if not seqnums:
+                    continue
+                if drop_after is not None and count >= drop_after:
+                    return
+                seqnum = seqnums.pop(0)
+                self.request.sendall('SL%06X' % seqnum +
+                                     server.records[key][seqnum])
+                count += 1
+        if dialup:
+            self.request.sendall('END')
+            return
+        # real time connection, stay connected until closed by client
+        while not server.stopped:
+            time.sleep(0.05)
+
+
+class MockSeedLinkServer(SocketServer.ThreadingTCPServer):
+    """
+    SeedLink server on localhost serving the given records.
+
+    :type records: dict
+    :param records: Lists of 512 byte Mini-SEED records with
+        ``(network, station)`` tuples as keys, see :func:`splitRecords`.
+    :type drop_after: int, optional
+    :param drop_after: Close the first connection after sending this number
+        of data packets.
+
+    The server runs in a background thread, its address is available as
+    :attr:`sladdr` in ``host:port`` format.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, records, drop_after=None):
+        SocketServer.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0),
+                                                 _MockSeedLinkHandler)
+        self.records = records
+        self.drop_after = drop_after
+        self.connections = 0
+        self.commands = []
+        self.stopped = False
+        self.sladdr = '%s:%d' % self.server_address
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Shuts the server down.
+        """
+        self.stopped = True
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+The obspy.seedlink.client.seedlinkconnection test suite.
+"""
+from obspy import UTCDateTime
+from obspy.core.util import NamedTemporaryFile
+from obspy.seedlink.client.seedlinkconnection import SeedLinkConnection
+import os
+import unittest
+
+
+class SeedLinkConnectionTestCase(unittest.TestCase):
+
+    def _connection(self, statefile):
+        slconn = SeedLinkConnection()
+        slconn.parseStreamlist('XX_A,XX_B,XX_C', 'BHZ')
+        slconn.setStateFile(statefile)
+        return slconn
+
+    def _update(self, slconn, station, seqnum):
+        for stream in slconn.streams:
+            if stream.station == station:
+                stream.seqnum = seqnum
+                stream.btime = UTCDateTime(2012, 1, 1) + seqnum
+
+    def _lines(self, statefile):
+        with open(statefile) as fh:
+            return fh.readlines()
+
+    def test_stateFile(self):
+        """
+        Only changed streams are appended, the state file is compacted
+        and recovered with the latest state of each stream.
+        """
+        with NamedTemporaryFile() as tf:
+            statefile = tf.name
+            tf.close()
+            os.remove(statefile)
+            slconn = self._connection(statefile)
+            self._update(slconn, 'A', 1)
+            self._update(slconn, 'B', 1)
+            # first call writes a snapshot
+            self.assertEqual(slconn.saveState(statefile), 2)
+            self.assertEqual(len(self._lines(statefile)), 2)
+            self.assertFalse(os.path.exists(statefile + '.tmp'))
+            # only changes are appended
+            self.assertEqual(slconn.saveState(statefile), 0)
+            self._update(slconn, 'A', 2)
+            self.assertEqual(slconn.saveState(statefile), 1)
+            self.assertEqual(self._lines(statefile)[-1],
+                             'XX A 2 2012,1,1,0,0,2\n')
+            # log is compacted after 4 lines per stream
+            for seqnum in xrange(3, 20):
+                self._update(slconn, 'A', seqnum)
+                slconn.saveState(statefile)
+                self.assertTrue(len(self._lines(statefile)) <= 4 * 3 + 1)
+            # recover into a new connection, the last line wins
+            slconn2 = self._connection(statefile)
+            states = [(s.station, s.seqnum, s.btime) for s in slconn2.streams]
+            self.assertEqual(states, [
+                ('A', 19, UTCDateTime(2012, 1, 1, 0, 0, 19)),
+                ('B', 1, UTCDateTime(2012, 1, 1, 0, 0, 1)),
+                ('C', -1, None)])
+            self.assertEqual(slconn2.saveState(statefile), 0)
+            # a torn write at the end is ignored and replaced by a snapshot
+            with open(statefile, 'a') as fh:
+                fh.write('XX B 20 2012,1,1,0')
+            slconn3 = self._connection(statefile)
+            self.assertEqual(slconn3.streams[1].seqnum, 1)
+            self._update(slconn3, 'C', 5)
+            self.assertEqual(slconn3.saveState(statefile), 3)
+            self.assertEqual(self._lines(statefile), [
+                'XX A 19 2012,1,1,0,0,19\n',
+                'XX B 1 2012,1,1,0,0,1\n',
+                'XX C 5 2012,1,1,0,0,5\n'])
+
+
+def suite():
+    return unittest.makeSuite(SeedLinkConnectionTestCase, 'test')
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
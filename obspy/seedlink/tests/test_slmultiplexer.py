@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+The obspy.seedlink.client.slmultiplexer test suite.
+"""
+from obspy import Stream, Trace, UTCDateTime
+from obspy.seedlink.client.slmultiplexer import SLMultiplexer
+from obspy.seedlink.tests.mockserver import MockSeedLinkServer, splitRecords
+import numpy as np
+import socket
+import threading
+import unittest
+
+
+class SLMultiplexerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # two servers with two stations each
+        np.random.seed(815)
+        self.stream = Stream()
+        for net, sta in (('XX', 'A'), ('XX', 'B'), ('YY', 'C'), ('YY', 'D')):
+            header = {'network': net, 'station': sta, 'channel': 'BHZ',
+                      'sampling_rate': 20.0,
+                      'starttime': UTCDateTime(2012, 1, 1)}
+            data = np.random.randint(-1000, 1000, 4000).astype('int32')
+            self.stream.append(Trace(data=data, header=header))
+        records = splitRecords(self.stream)
+        self.records = records
+        self.servers = [
+            MockSeedLinkServer(dict((k, v) for k, v in records.items()
+                                    if k[0] == 'XX')),
+            MockSeedLinkServer(dict((k, v) for k, v in records.items()
+                                    if k[0] == 'YY'), drop_after=7)]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def _checkPackets(self, packets):
+        """
+        Every record has to be received exactly once and in order.
+        """
+        seqnums = {}
+        for packet in packets:
+            tr = packet.getTrace()
+            seqnums.setdefault((tr.stats.network, tr.stats.station),
+                               []).append(packet.getSequenceNumber())
+        for key, records in self.records.items():
+            self.assertEqual(seqnums[key], range(len(records)))
+        st = Stream([packet.getTrace() for packet in packets])
+        st.merge()
+        st.sort()
+        self.assertEqual(len(st), 4)
+        for tr, expected in zip(st, self.stream):
+            np.testing.assert_array_equal(tr.data, expected.data)
+
+    def test_dialup(self):
+        """
+        Packets of all stations of all servers are collected in one event
+        loop, the second server drops the first connection.
+        """
+        mux = SLMultiplexer(maxsize=1000)
+        for server, streams in zip(self.servers, ('XX_A,XX_B', 'YY_C,YY_D')):
+            slconn = mux.addServer(server.sladdr, streams, 'BHZ',
+                                   dialup=True)
+            slconn.netdly = 0
+        mux.run(timeout=20)
+        packets = []
+        while not mux.queue.empty():
+            packets.append(mux.queue.get())
+        self._checkPackets(packets)
+        # resumed with next sequence number after connection was dropped
+        self.assertEqual(self.servers[1].connections, 2)
+        resume = [c for c in self.servers[1].commands
+                  if c.startswith('FETCH ')]
+        self.assertEqual(len(resume), 2)
+        self.assertEqual(self.servers[0].connections, 1)
+        numbers = mux.getSequenceNumbers()
+        self.assertEqual(numbers[(self.servers[0].sladdr, 'XX', 'A')],
+                         len(self.records[('XX', 'A')]) - 1)
+
+    def test_backpressure(self):
+        """
+        Nothing more is read from the servers while the queue is full.
+        """
+        mux = SLMultiplexer(maxsize=5)
+        for server, streams in zip(self.servers, ('XX_A,XX_B', 'YY_C,YY_D')):
+            slconn = mux.addServer(server.sladdr, streams)
+            slconn.netdly = 0
+        thread = threading.Thread(target=mux.run, kwargs={'timeout': 30})
+        thread.start()
+        try:
+            # wait until the queue is full and stays full
+            packets = [mux.queue.get(timeout=10)]
+            for _i in xrange(20):
+                thread.join(0.05)
+            self.assertTrue(mux.queue.full())
+            buffered = sum(len(link.pending) for link in mux.links)
+            total = sum(len(records) for records in self.records.values())
+            self.assertTrue(buffered + mux.queue.qsize() < total - 1)
+            # consuming releases the servers
+            while len(packets) < total:
+                packets.append(mux.queue.get(timeout=10))
+        finally:
+            mux.terminate()
+            thread.join()
+        self._checkPackets(packets)
+
+    def test_silentServer(self):
+        """
+        Connections to a server that accepts but never answers time out
+        during negotiation and are reconnected.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(5)
+        sock.settimeout(0.05)
+        accepted = []
+        stopped = threading.Event()
+
+        def accept():
+            while not stopped.is_set():
+                try:
+                    accepted.append(sock.accept()[0])
+                except socket.timeout:
+                    pass
+
+        thread = threading.Thread(target=accept)
+        thread.start()
+        try:
+            mux = SLMultiplexer()
+            slconn = mux.addServer('127.0.0.1:%d' % sock.getsockname()[1],
+                                   'XX_A')
+            slconn.netto = 1
+            slconn.netdly = 0
+            mux.run(timeout=3.5)
+        finally:
+            stopped.set()
+            thread.join()
+            for conn in accepted:
+                conn.close()
+            sock.close()
+        self.assertTrue(mux.queue.empty())
+        self.assertTrue(len(accepted) > 1)
+
+
+def suite():
+    return unittest.makeSuite(SLMultiplexerTestCase, 'test')
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+The obspy.seedlink.slpacket test suite.
+"""
+from obspy import read, Stream
+from obspy.realtime import RtStream
+from obspy.seedlink.slpacket import SLPacket, decodePackets, \
+    packetsToStream
+from obspy.seedlink.tests.mockserver import splitRecords
+import numpy as np
+import unittest
+
+
+class SLPacketTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # packets of three channels and a second station, interleaved
+        st = read()
+        for tr in st:
+            tr.data = tr.data.astype('int32')
+        st2 = st.select(channel='EHZ').copy()
+        st2[0].stats.station = 'XYZ'
+        st += st2
+        self.stream = st
+        records = splitRecords(st)
+        self.packets = []
+        for key in sorted(records):
+            for seqnum, record in enumerate(records[key]):
+                packet = SLPacket('SL%06X' % seqnum + record, 0)
+                self.packets.append(packet)
+        np.random.seed(42)
+        np.random.shuffle(self.packets)
+
+    def test_decodePackets(self):
+        """
+        Batch decoding has to give the same data as decoding every single
+        packet.
+        """
+        headers, data = decodePackets(self.packets)
+        self.assertEqual(len(headers), 4)
+        self.assertEqual(len(data), 4)
+        self.assertEqual(sorted(headers['station']),
+                         ['RJOB', 'RJOB', 'RJOB', 'XYZ'])
+        np.testing.assert_array_equal(headers['npts'], 3000)
+        np.testing.assert_array_equal(headers['sampling_rate'], 100.0)
+        expected = Stream([packet.getTrace() for packet in self.packets])
+        expected.merge()
+        for header, samples in zip(headers, data):
+            tr = expected.select(station=header['station'],
+                                 channel=header['channel'])[0]
+            self.assertEqual(header['starttime'],
+                             tr.stats.starttime.timestamp * 1e6)
+            np.testing.assert_array_equal(samples, tr.data)
+        # a missing packet splits the channel into two blocks
+        headers, data = decodePackets(self.packets[1:])
+        self.assertEqual(len(headers), 5)
+        self.assertEqual(headers['npts'].sum(),
+                         12000 - self.packets[0].getTrace().stats.npts)
+        # packets without data are skipped
+        info = SLPacket('SLINFO  ' + '\x00' * 512, 0)
+        headers, data = decodePackets([info, SLPacket()])
+        self.assertEqual(len(headers), 0)
+        self.assertEqual(data, [])
+
+    def test_packetsToStream(self):
+        """
+        Decoded blocks can be appended to real time buffers.
+        """
+        st = packetsToStream(self.packets)
+        self.assertEqual(len(st), 4)
+        rt_stream = RtStream()
+        rt_stream.append(st)
+        rt_stream.sort()
+        self.stream.sort()
+        for channel, tr in zip(rt_stream, self.stream):
+            self.assertEqual(channel.id, tr.id)
+            self.assertEqual(channel.stats.starttime, tr.stats.starttime)
+            np.testing.assert_array_equal(channel.data, tr.data)
+
+
+def suite():
+    return unittest.makeSuite(SLPacketTestCase, 'test')
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -184,7 +184,7 @@ and the same page in the `Tutorial`_. For automated use see the following
 """
 
 from filter import bandpass, bandstop, lowpass, highpass, remezFIR, \
-    lowpassFIR, envelope, integerDecimation
+    lowpassFIR, envelope, integerDecimation, ContinuousFilter
 from rotate import rotate_NE_RT, rotate_RT_NE, rotate_ZNE_LQT, rotate_LQT_ZNE
 from invsim import cosTaper, cornFreq2Paz, pazToFreqResp, seisSim, specInv, \
     estimateMagnitude
@@ -193,12 +193,12 @@ from util import utlGeoKm, utlLonLat
 from cross_correlation import xcorr, xcorr_3C, xcorrPickCorrection
 from freqattributes import cfrequency, bwith, domperiod, logcep
 from hoctavbands import sonogram
-from polarization import eigval
+from polarization import eigval, polarizationAnalysis
 from spectral_estimation import psd, PPSD
 from konnoohmachismoothing import konnoOhmachiSmoothing
 from trigger import recSTALTA, recSTALTAPy, carlSTATrig, classicSTALTA, \
     delayedSTALTA, zDetect, triggerOnset, pkBaer, arPick, \
-    coincidenceTrigger, classicSTALTAPy
+    coincidenceTrigger, coincidenceTriggerChunked, classicSTALTAPy
 
 
 if __name__ == '__main__':
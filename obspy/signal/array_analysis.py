@@ -24,7 +24,6 @@ from obspy.signal.util import utlGeoKm, nextpow2
 from obspy.signal.headers import clibsignal
 from obspy.core import Stream
 from obspy.core.util.decorator import deprecated
-from scipy.integrate import cumtrapz
 from obspy.signal.invsim import cosTaper
 
 
@@ -768,25 +767,16 @@ def array_transff_wavenumber(coords, klim, kstep, coordsys='lonlat'):
     else:
         raise TypeError('klim must either be a float or a tuple of length 4')
 
-    nkx = np.ceil((kxmax + kstep / 10. - kxmin) / kstep)
-    nky = np.ceil((kymax + kstep / 10. - kymin) / kstep)
-
-    transff = np.empty((nkx, nky))
-
-    for i, kx in enumerate(np.arange(kxmin, kxmax + kstep / 10., kstep)):
-        for j, ky in enumerate(np.arange(kymin, kymax + kstep / 10., kstep)):
-            _sum = 0j
-            for k in xrange(len(coords)):
-                _sum += np.exp(complex(0.,
-                        coords[k, 0] * kx + coords[k, 1] * ky))
-            transff[i, j] = abs(_sum) ** 2
+    kxs = np.arange(kxmin, kxmax + kstep / 10., kstep)
+    kys = np.arange(kymin, kymax + kstep / 10., kstep)
+    transff = _arrayResponse(coords, kxs, kys)
 
     transff /= transff.max()
     return transff
 
 
 def array_transff_freqslowness(coords, slim, sstep, fmin, fmax, fstep,
-                               coordsys='lonlat'):
+                               coordsys='lonlat', processes=1):
     """
     Returns array transfer function as a function of slowness difference and
     frequency.
@@ -805,6 +795,9 @@ def array_transff_freqslowness(coords, slim, sstep, fmin, fmax, fstep,
     :param fmin: maximum frequency in signal
     :type fstep: double
     :param fmin: frequency sample distance
+    :type processes: int
+    :param processes: Number of worker processes the frequencies are
+        distributed over.
     """
     coords = get_geometry(coords, coordsys)
     if isinstance(slim, float):
@@ -821,27 +814,78 @@ def array_transff_freqslowness(coords, slim, sstep, fmin, fmax, fstep,
     else:
         raise TypeError('slim must either be a float or a tuple of length 4')
 
-    nsx = np.ceil((sxmax + sstep / 10. - sxmin) / sstep)
-    nsy = np.ceil((symax + sstep / 10. - symin) / sstep)
-    nf = np.ceil((fmax + fstep / 10. - fmin) / fstep)
+    sx = np.arange(sxmin, sxmax + sstep / 10., sstep)
+    sy = np.arange(symin, symax + sstep / 10., sstep)
+    freqs = np.arange(fmin, fmax + fstep / 10., fstep)
+    # trapezoidal rule over frequency as weighted sum of the responses
+    weights = np.empty(len(freqs))
+    weights.fill(fstep)
+    weights[0] = weights[-1] = fstep / 2.
+
+    if processes > 1 and len(freqs) > 1:
+        from multiprocessing import Pool
+        parts = np.array_split(np.arange(len(freqs)),
+                               min(processes, len(freqs)))
+        tasks = [(coords, sx, sy, freqs[part], weights[part])
+                 for part in parts]
+        pool = Pool(processes)
+        try:
+            transff = sum(pool.map(_transffPower, tasks))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        transff = _transffPower((coords, sx, sy, freqs, weights))
 
-    transff = np.empty((nsx, nsy))
-    buff = np.zeros(nf)
+    transff /= transff.max()
+    return transff
 
-    for i, sx in enumerate(np.arange(sxmin, sxmax + sstep / 10., sstep)):
-        for j, sy in enumerate(np.arange(symin, symax + sstep / 10., sstep)):
-            for k, f in enumerate(np.arange(fmin, fmax + fstep / 10., fstep)):
-                _sum = 0j
-                for l in np.arange(len(coords)):
-                    _sum += np.exp(complex(0., (coords[l, 0] * sx
-                        + coords[l, 1] * sy) * 2 * np.pi * f))
-                buff[k] = abs(_sum) ** 2
-            transff[i, j] = cumtrapz(buff, dx=fstep)[-1]
 
-    transff /= transff.max()
+# maximum number of array elements of intermediate results, see
+# _arrayResponse()
+_TRANSFF_CHUNK_SIZE = 2 ** 22
+
+
+def _arrayResponse(coords, kxs, kys, factor=1.0):
+    """
+    Squared array response ``abs(sum(exp(1j * (x * kx + y * ky) * factor)))
+    ** 2`` over all stations for the grid spanned by ``kxs`` and ``kys``.
+
+    The grid is processed in chunks of rows to limit memory usage.
+    """
+    x = coords[:, 0]
+    y = coords[:, 1]
+    transff = np.empty((len(kxs), len(kys)))
+    rows = max(1, _TRANSFF_CHUNK_SIZE // max(1, len(kys) * len(coords)))
+    for i in xrange(0, len(kxs), rows):
+        phase = x * kxs[i:i + rows, np.newaxis, np.newaxis] + \
+            y * kys[np.newaxis, :, np.newaxis]
+        phase *= factor
+        transff[i:i + rows] = np.cos(phase).sum(axis=-1) ** 2 + \
+            np.sin(phase).sum(axis=-1) ** 2
     return transff
 
 
+def _transffPower(args):
+    """
+    Weighted sum over the given frequencies of the squared array response of
+    the slowness grid.
+
+    Only one grid is kept in memory, the partial sums of several calls can
+    simply be added.
+
+    :type args: tuple
+    :param args: Station coordinates, slowness grid, frequencies and
+        weights of the frequencies.
+    :return: numpy.ndarray of shape (len(sx), len(sy)).
+    """
+    coords, sx, sy, freqs, weights = args
+    power = np.zeros((len(sx), len(sy)))
+    for f, weight in zip(freqs, weights):
+        power += weight * _arrayResponse(coords, sx, sy, 2 * np.pi * f)
+    return power
+
+
 def dump(pow_map, apow_map, i):
     """
     Example function to use with `store` kwarg in
@@ -854,7 +898,7 @@ def dump(pow_map, apow_map, i):
 def array_processing(stream, win_len, win_frac, sll_x, slm_x, sll_y, slm_y,
     sl_s, semb_thres, vel_thres, frqlow, frqhigh, stime, etime, prewhiten,
     verbose=False, coordsys='lonlat', timestamp='mlabday', method=0,
-    store=None):
+    store=None, processes=1):
     """
     Method for Seismic-Array-Beamforming/FK-Analysis/Capon
 
@@ -906,12 +950,15 @@ def array_processing(stream, win_len, win_frac, sll_x, slm_x, sll_y, slm_y,
         second arguments and the iteration number as third argument. Useful for
         storing or plotting the map for each iteration. For this purpose the
         dump function of this module can be used.
+    :type processes: int
+    :param processes: Number of worker processes the sliding windows are
+        distributed over. Results are merged in the order of the windows, so
+        the output does not depend on the number of processes. ``store`` is
+        always called in the calling process.
     :return: numpy.ndarray of timestamp, relative relpow, absolute relpow,
         backazimut, slowness
     """
-    BF, CAPON = 0, 1
     res = []
-    eotr = True
 
     # check that sampling rates do not vary
     fs = stream[0].stats.sampling_rate
@@ -955,52 +1002,47 @@ def array_processing(stream, win_len, win_frac, sll_x, slm_x, sll_y, slm_y,
     steer = np.empty((nf, grdpts_x, grdpts_y, nstat), dtype='c16')
     clibsignal.calcSteer(nstat, grdpts_x, grdpts_y, nf, nlow,
         deltaf, time_shift_table, steer)
-    R = np.empty((nf, nstat, nstat), dtype='c16')
-    ft = np.empty((nstat, nf), dtype='c16')
+    # data of all stations starting at the common start point
+    traces = [tr.data[spoint[i]:] for i, tr in enumerate(stream)]
+    npts = min([len(data) for data in traces])
+
+    # offsets and start times of all sliding windows
+    windows = []
     newstart = stime
-    tap = cosTaper(nsamp, p=0.22)  # 0.22 matches 0.2 of historical C bbfk.c
     offset = 0
-    relpow_map = np.empty((grdpts_x, grdpts_y), dtype='f8')
-    abspow_map = np.empty((grdpts_x, grdpts_y), dtype='f8')
-    while eotr:
-        try:
-            for i, tr in enumerate(stream):
-                dat = tr.data[spoint[i] + offset:
-                    spoint[i] + offset + nsamp]
-                dat = (dat - dat.mean()) * tap
-                ft[i, :] = np.fft.rfft(dat, nfft)[nlow:nlow + nf]
-        except IndexError:
+    while offset + nsamp <= npts:
+        windows.append((offset, newstart))
+        if (newstart + (nsamp + nstep) / fs) > etime:
             break
-        ft = np.require(ft, 'c16', ['C_CONTIGUOUS'])
-        relpow_map.fill(0.)
-        abspow_map.fill(0.)
-        # computing the covariances of the signal at different receivers
-        dpow = 0.
-        for i in xrange(nstat):
-            for j in xrange(i, nstat):
-                R[:, i, j] = ft[i, :] * ft[j, :].conj()
-                if method == CAPON:
-                    R[:, i, j] /= np.abs(R[:, i, j].sum())
-                if i != j:
-                    R[:, j, i] = R[:, i, j].conjugate()
-                else:
-                    dpow += np.abs(R[:, i, j].sum())
-        dpow *= nstat
-        if method == CAPON:
-            # P(f) = 1/(e.H R(f)^-1 e)
-            for n in xrange(nf):
-                R[n, :, :] = np.linalg.pinv(R[n, :, :], rcond=1e-6)
+        offset += nstep
+        newstart += nstep / fs
 
-        errcode = clibsignal.generalizedBeamformer(relpow_map, abspow_map,
-            steer, R, nsamp, nstat, prewhiten, grdpts_x, grdpts_y, nfft, nf,
-            dpow, method)
-        if errcode != 0:
-            msg = 'generalizedBeamforming exited with error %d'
-            raise Exception(msg % errcode)
-        ix, iy = np.unravel_index(relpow_map.argmax(), relpow_map.shape)
-        relpow, abspow = relpow_map[ix, iy], abspow_map[ix, iy]
+    data = {'traces': traces, 'steer': steer, 'nsamp': nsamp, 'nfft': nfft,
+            'nlow': nlow, 'nf': nf, 'prewhiten': prewhiten, 'method': method,
+            'maps': store is not None}
+    offsets = [window[0] for window in windows]
+    if processes > 1 and len(windows) > 1:
+        from multiprocessing import Pool
+        # interleaved blocks of windows, pool.map keeps their order
+        nblocks = min(len(offsets), 4 * processes)
+        blocks = [offsets[k::nblocks] for k in xrange(nblocks)]
+        pool = Pool(processes, initializer=_initArrayWorker, initargs=(data,))
+        try:
+            results = pool.map(_beamformWindows, blocks)
+        finally:
+            pool.close()
+            pool.join()
+        # restore chronological order of interleaved blocks
+        beams = [None] * len(offsets)
+        for k, result in enumerate(results):
+            beams[k::nblocks] = result
+    else:
+        beams = _beamformWindows(offsets, data)
+
+    for (offset, newstart), beam in zip(windows, beams):
+        ix, iy, relpow, abspow, maps = beam
         if store is not None:
-            store(relpow_map, abspow_map, offset)
+            store(maps[0], maps[1], offset)
         # here we compute baz, slow
         slow_x = sll_x + ix * sl_s
         slow_y = sll_y + iy * sl_s
@@ -1015,11 +1057,6 @@ def array_processing(stream, win_len, win_frac, sll_x, slm_x, sll_y, slm_y,
                                  slow]))
             if verbose:
                 print(newstart, (newstart + (nsamp / fs)), res[-1][1:])
-        if (newstart + (nsamp + nstep) / fs) > etime:
-            eotr = False
-        offset += nstep
-
-        newstart += nstep / fs
     res = np.array(res)
     if timestamp == 'julsec':
         pass
@@ -1031,6 +1068,88 @@ def array_processing(stream, win_len, win_frac, sll_x, slm_x, sll_y, slm_y,
         raise ValueError(msg)
     return np.array(res)
 
+
+# data shared with the worker processes of array_processing
+_WORKER_DATA = {}
+
+
+def _initArrayWorker(data):
+    """
+    Initializer of worker processes for array_processing.
+    """
+    _WORKER_DATA.clear()
+    _WORKER_DATA.update(data)
+
+
+def _beamformWindows(offsets, data=None):
+    """
+    Beamforming of the sliding windows starting at the given sample offsets.
+
+    :return: List of tuples (ix, iy, relpow, abspow, maps) with the slowness
+        grid indices of the maximum relative power, relative and absolute
+        power at this grid point and the relative and absolute power maps
+        (``None`` unless requested).
+    """
+    CAPON = 1
+    if data is None:
+        data = _WORKER_DATA
+    traces = data['traces']
+    steer = data['steer']
+    nsamp, nfft, nlow, nf = data['nsamp'], data['nfft'], data['nlow'], \
+        data['nf']
+    method = data['method']
+    nstat = len(traces)
+    grdpts_x, grdpts_y = steer.shape[1:3]
+    tap = cosTaper(nsamp, p=0.22)  # 0.22 matches 0.2 of historical C bbfk.c
+    dat = np.empty((nstat, nsamp))
+    beams = []
+    for offset in offsets:
+        for i, trace in enumerate(traces):
+            dat[i] = trace[offset:offset + nsamp]
+        dat -= dat.mean(axis=1)[:, np.newaxis]
+        dat *= tap
+        ft = np.fft.rfft(dat, nfft, axis=1)[:, nlow:nlow + nf]
+        # computing the covariances of the signal at different receivers
+        # for all frequencies at once, R[f, i, j] = ft[i, f] * ft[j, f].conj()
+        R = np.einsum('if,jf->fij', ft, ft.conj())
+        if method == CAPON:
+            R /= np.abs(R.sum(axis=0))
+        dpow = np.abs(np.einsum('fii->i', R)).sum() * nstat
+        if method == CAPON:
+            # P(f) = 1/(e.H R(f)^-1 e)
+            R = _pinvStack(R, rcond=1e-6)
+        R = np.require(R, 'c16', ['C_CONTIGUOUS'])
+        relpow_map = np.zeros((grdpts_x, grdpts_y), dtype='f8')
+        abspow_map = np.zeros((grdpts_x, grdpts_y), dtype='f8')
+        errcode = clibsignal.generalizedBeamformer(relpow_map, abspow_map,
+            steer, R, nsamp, nstat, data['prewhiten'], grdpts_x, grdpts_y,
+            nfft, nf, dpow, method)
+        if errcode != 0:
+            msg = 'generalizedBeamforming exited with error %d'
+            raise Exception(msg % errcode)
+        ix, iy = np.unravel_index(relpow_map.argmax(), relpow_map.shape)
+        maps = None
+        if data['maps']:
+            maps = (relpow_map, abspow_map)
+        beams.append((ix, iy, relpow_map[ix, iy], abspow_map[ix, iy], maps))
+    return beams
+
+
+def _pinvStack(a, rcond=1e-15):
+    """
+    Pseudo-inverse of a stack of matrices, computed like
+    :func:`numpy.linalg.pinv` for each matrix ``a[k]`` but with a single
+    call of the singular value decomposition.
+    """
+    a = a.conjugate()
+    u, s, vt = np.linalg.svd(a, full_matrices=False)
+    cutoff = rcond * s.max(axis=-1)[:, np.newaxis]
+    large = s > cutoff
+    s[large] = 1. / s[large]
+    s[~large] = 0
+    return np.einsum('kji,kj,klj->kil', vt, s, u)
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod(exclude_empty=True)
@@ -23,6 +23,51 @@ import numpy as np
 import util
 
 
+def _rowDerivative(x, fk):
+    """
+    Time derivative of every row of windowed data.
+
+    The rows are padded with their first and last values and filtered at
+    once, which is the same as computing the derivative row by row.
+
+    :type x: :class:`~numpy.ndarray`
+    :param x: Windowed data, one window per row.
+    :param fk: Coefficients for calculating time derivatives
+        (calculated via central difference).
+    :return: Time derivative of each window.
+    """
+    nadd = size(fk) // 2
+    x_add = np.hstack((np.repeat(x[:, :1], nadd, axis=1), x,
+                       np.repeat(x[:, -1:], nadd, axis=1)))
+    t = signal.lfilter(fk, 1, x_add, axis=1)
+    # correct start and end values of time derivative
+    return t[:, size(fk) - 1:]
+
+
+def _rowSmooth(x, smoothie):
+    """
+    Central moving average of every row of windowed data.
+
+    Same as :func:`~obspy.signal.util.smooth` applied to each row, including
+    the correction of the start and end values.
+
+    :type x: :class:`~numpy.ndarray`
+    :param x: Windowed data, one window per row.
+    :param smoothie: Number of past/future values to calculate moving average.
+    :return: Smoothed windows.
+    """
+    if smoothie <= 0:
+        return x
+    x_add = np.hstack((np.repeat(x[:, :1], smoothie, axis=1), x,
+                       np.repeat(x[:, -1:], smoothie, axis=1)))
+    b = np.hstack((np.ones(smoothie) / (2 * smoothie), 0,
+                   np.ones(smoothie) / (2 * smoothie)))
+    out = signal.lfilter(b, 1, x_add, axis=1)[:, 2 * smoothie:]
+    out[:, :smoothie] = out[:, smoothie:smoothie + 1]
+    out[:, -smoothie:] = out[:, -smoothie - 1:-smoothie]
+    return out
+
+
 def envelope(data):
     """
     Envelope of a signal.
@@ -40,14 +85,11 @@ def envelope(data):
         input data.
     """
     nfft = util.nextpow2(data.shape[size(data.shape) - 1])
-    A_cpx = np.zeros((data.shape), dtype='complex64')
-    A_abs = np.zeros((data.shape), dtype='float64')
     if (np.size(data.shape) > 1):
-        i = 0
-        for row in data:
-            A_cpx[i, :] = signal.hilbert(row, nfft)
-            A_abs[i, :] = abs(signal.hilbert(row, nfft))
-            i = i + 1
+        # analytic signal of all windows at once
+        A = signal.hilbert(data, nfft, axis=-1)[:, :data.shape[1]]
+        A_cpx = A.astype('complex64')
+        A_abs = abs(A)
     else:
         A_cpx = signal.hilbert(data, nfft)
         A_abs = abs(signal.hilbert(data, nfft))
@@ -78,30 +120,16 @@ def normEnvelope(data, fs, smoothie, fk):
     x = envelope(data)
     fs = float(fs)
     if (size(x[1].shape) > 1):
-        i = 0
-        Anorm = np.zeros(x[1].shape[0], dtype='float64')
-        for row in x[1]:
-            A_win_smooth = util.smooth(row, int(np.floor(len(row) / 3)))
-            # Differentiation of original signal, dA/dt
-            #A_win_add = append(append([row[0]]*(size(fk)/2),row),
-            #                      [row[size(row)-1]]*(size(fk)/2))
-            # Better, because faster, calculation of A_win_add
-            A_win_add = np.hstack(([A_win_smooth[0]] * (size(fk) // 2),
-                                   A_win_smooth,
-                                   [A_win_smooth[size(A_win_smooth) - 1]] * \
-                                   (size(fk) // 2)))
-            t = signal.lfilter(fk, 1, A_win_add)
-            #t = t[size(fk) // 2:(size(t) - size(fk) // 2)]
-            # correct start and end values of time derivative
-            t = t[size(fk) - 1:size(t)]
-            A_win_smooth[A_win_smooth < 1] = 1
-            # (dA/dt) / 2*PI*smooth(A)*fs/2
-            t_ = t / (2. * pi * (A_win_smooth) * (fs / 2.0))
-            # Integral within window
-            t_ = cumtrapz(t_, dx=(1. / fs))
-            t_ = np.concatenate((t_[0:1], t_))
-            Anorm[i] = ((np.exp(np.mean(t_))) - 1) * 100
-            i = i + 1
+        A_win_smooth = _rowSmooth(x[1], int(np.floor(x[1].shape[1] / 3)))
+        # Differentiation of original signal, dA/dt
+        t = _rowDerivative(A_win_smooth, fk)
+        A_win_smooth[A_win_smooth < 1] = 1
+        # (dA/dt) / 2*PI*smooth(A)*fs/2
+        t_ = t / (2. * pi * (A_win_smooth) * (fs / 2.0))
+        # Integral within window
+        t_ = cumtrapz(t_, dx=(1. / fs), axis=1)
+        t_ = np.hstack((t_[:, 0:1], t_))
+        Anorm = ((np.exp(np.mean(t_, axis=1))) - 1) * 100
         #Anorm = util.smooth(Anorm,smoothie)
         #Anorm_add = np.append(np.append([Anorm[0]] * (size(fk) // 2), Anorm),
         #                      [Anorm[size(Anorm) - 1]] * (size(fk) // 2))
@@ -158,20 +186,19 @@ def centroid(data, fk):
     x = envelope(data)
     if (size(x[1].shape) > 1):
         centroid = np.zeros(x[1].shape[0], dtype='float64')
-        i = 0
-        for row in x[1]:
-            # Integral within window
-            half = 0.5 * sum(row)
-            # Estimate energy centroid
-            for k in xrange(2, size(row)):
-                t = sum(row[0:k])
-                if (t >= half):
-                    frac = (half - (t - sum(row[0:k - 1]))) / \
-                        (t - (t - sum(row[0:k - 1])))
-                    centroid[i] = \
-                        (float(k - 1) + float(frac)) / float(size(row))
-                    break
-            i = i + 1
+        n = x[1].shape[1]
+        # Integral within window
+        csum = np.cumsum(x[1], axis=1)
+        half = 0.5 * csum[:, -1]
+        # Estimate energy centroid, first sample where half of the area is
+        # reached
+        reached = csum[:, 1:n - 1] >= half[:, np.newaxis]
+        found = reached.any(axis=1)
+        k = np.argmax(reached, axis=1)[found] + 1
+        t = csum[found, k]
+        prev = csum[found, k - 1]
+        frac = (half[found] - (t - prev)) / (t - (t - prev))
+        centroid[found] = (k + frac) / float(n)
         #centroid_add = np.append(np.append([centroid[0]] * (size(fk) // 2), \
         #    centroid), [centroid[size(centroid) - 1]] * (size(fk) // 2))
         centroid_add = np.hstack(([centroid[0]] * (np.size(fk) // 2), \
@@ -215,33 +242,12 @@ def instFreq(data, fs, fk):
     """
     x = envelope(data)
     if (size(x[0].shape) > 1):
-        omega = np.zeros(x[0].shape[0], dtype='float64')
-        i = 0
-        for row in x[0]:
-            f = np.real(row)
-            h = np.imag(row)
-            #f_add = np.append(np.append([f[0]] * (size(fk) // 2), f),
-            #                      [f[size(f) - 1]] * (size(fk) // 2))
-            # faster alternative to calculate f_add
-            f_add = np.hstack(([f[0]] * (np.size(fk) // 2), f, \
-                  [f[np.size(f) - 1]] * (np.size(fk) // 2)))
-            fd = signal.lfilter(fk, 1, f_add)
-            #fd = fd[size(fk) // 2:(size(fd) - size(fk) // 2)]
-            # correct start and end values of time derivative
-            fd = fd[size(fk) - 1:size(fd)]
-            #h_add = np.append(np.append([h[0]] * (size(fk) // 2), h),
-            #                      [h[size(h) - 1]] * (size(fk) // 2))
-            # faster alternative to calculate h_add
-            h_add = np.hstack(([h[0]] * (np.size(fk) // 2), h, \
-                  [h[np.size(h) - 1]] * (np.size(fk) // 2)))
-            hd = signal.lfilter(fk, 1, h_add)
-            #hd = hd[size(fk) // 2:(size(hd) - size(fk) // 2)]
-            # correct start and end values of time derivative
-            hd = hd[size(fk) - 1:size(hd)]
-            omega_win = abs(((f * hd - fd * h) / (f * f + h * h)) * \
-                             fs / 2 / pi)
-            omega[i] = np.median(omega_win)
-            i = i + 1
+        f = np.real(x[0])
+        h = np.imag(x[0])
+        fd = _rowDerivative(f, fk)
+        hd = _rowDerivative(h, fk)
+        omega_win = abs(((f * hd - fd * h) / (f * f + h * h)) * fs / 2 / pi)
+        omega = np.median(omega_win, axis=1)
         #omega_add = np.append(np.append([omega[0]] * (size(fk) // 2), omega),
         #                      [omega[size(omega) - 1]] * (size(fk) // 2))
         # faster alternative to calculate omega_add
@@ -295,21 +301,9 @@ def instBwith(data, fs, fk):
     """
     x = envelope(data)
     if (size(x[1].shape) > 1):
-        sigma = np.zeros(x[1].shape[0], dtype='float64')
-        i = 0
-        for row in x[1]:
-            #A_win_add = np.append(np.append([row[0]] * (size(fk) // 2), row),
-            #                      [row[size(row) - 1]] * (size(fk) // 2))
-            # faster alternative to calculate A_win_add
-            A_win_add = np.hstack(([row[0]] * (np.size(fk) // 2), row, \
-                  [row[np.size(row) - 1]] * (np.size(fk) // 2)))
-            t = signal.lfilter(fk, 1, A_win_add)
-            #t = t[size(fk) // 2:(size(t) - size(fk) // 2)]
-            # correct start and end values
-            t = t[size(fk) - 1:size(t)]
-            sigma_win = abs((t * fs) / (row * 2 * pi))
-            sigma[i] = np.median(sigma_win)
-            i = i + 1
+        t = _rowDerivative(x[1], fk)
+        sigma_win = abs((t * fs) / (x[1] * 2 * pi))
+        sigma = np.median(sigma_win, axis=1)
         #sigma_add = np.append(np.append([sigma[0]] * (size(fk) // 2), sigma),
         #                  [sigma[size(sigma) - 1]] * (size(fk) // 2))
         # faster alternative to calculate sigma_add
@@ -325,8 +319,8 @@ def instBwith(data, fs, fk):
         #A_win_add = np.append(np.append([x[1][0]] * (size(fk) // 2), x[1]),
         #                      [x[1][size(x[1]) - 1]] * (size(fk) // 2))
         # faster alternative to calculate A_win_add
-        A_win_add = np.hstack(([row[0]] * (np.size(fk) // 2), row, \
-                  [row[np.size(row) - 1]] * (np.size(fk) // 2)))
+        A_win_add = np.hstack(([x[1][0]] * (np.size(fk) // 2), x[1], \
+                  [x[1][np.size(x[1]) - 1]] * (np.size(fk) // 2)))
         t = signal.lfilter(fk, 1, A_win_add)
         #t = t[size(fk) // 2:(size(t) - size(fk) // 2)]
         # correct start and end values
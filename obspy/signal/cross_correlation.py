@@ -17,15 +17,17 @@ Signal processing routines based on cross correlation techniques.
 """
 
 import warnings
+import math as M
 import numpy as np
 import ctypes as C
 import scipy
 from obspy import Trace, Stream
 from obspy.signal.headers import clibsignal
 from obspy.signal import cosTaper
+from obspy.signal.util import nextpow2
 
 
-def xcorr(tr1, tr2, shift_len, full_xcorr=False):
+def xcorr(tr1, tr2, shift_len, full_xcorr=False, method="time"):
     """
     Cross correlation of tr1 and tr2 in the time domain using window_len.
 
@@ -47,6 +49,11 @@ def xcorr(tr1, tr2, shift_len, full_xcorr=False):
     :type full_xcorr: bool
     :param full_xcorr: If ``True``, the complete xcorr function will be
         returned as :class:`~numpy.ndarray`
+    :type method: str
+    :param method: ``"time"`` uses the time domain C routine (single
+        precision), ``"freq"`` uses :func:`xcorr_fft` (double precision)
+        and ``"auto"`` selects the cheaper of both based on the number of
+        samples and ``shift_len``. Defaults to ``"time"``.
     :return: **index, value[, fct]** - Index of maximum xcorr value and the
         value itself. The complete xcorr function is returned only if
         ``full_xcorr=True``.
@@ -78,9 +85,18 @@ def xcorr(tr1, tr2, shift_len, full_xcorr=False):
     1.0
     """
     # if we get Trace objects, use their data arrays
-    for tr in [tr1, tr2]:
-        if isinstance(tr, Trace):
-            tr = tr.data
+    if isinstance(tr1, Trace):
+        tr1 = tr1.data
+    if isinstance(tr2, Trace):
+        tr2 = tr2.data
+
+    if method == "auto":
+        method = _xcorr_select_method(len(tr1), len(tr2), shift_len)
+    if method == "freq":
+        return xcorr_fft(tr1, tr2, shift_len, full_xcorr=full_xcorr)
+    elif method != "time":
+        msg = "Unknown xcorr method '%s'. Use 'time', 'freq' or 'auto'."
+        raise ValueError(msg % method)
 
     # check if shift_len parameter is in an acceptable range.
     # if not the underlying c code tampers with shift_len and uses shift_len/2
@@ -108,6 +124,161 @@ def xcorr(tr1, tr2, shift_len, full_xcorr=False):
         return shift.value, coe_p.value
 
 
+def xcorr_fft(tr1, tr2, shift_len, full_xcorr=False):
+    """
+    Cross correlation of tr1 and tr2 in the frequency domain.
+
+    Computes the same normalized cross correlation function as
+    :func:`~obspy.signal.cross_correlation.xcorr` (demeaned traces, zero
+    padded, normalized by the energy of both complete traces) but via FFT in
+    double precision. The cost is O(N log N) independent of ``shift_len``,
+    which makes it a lot faster than the time domain routine for long traces
+    and large shifts.
+
+    :type tr1: :class:`~numpy.ndarray`, :class:`~obspy.core.trace.Trace`
+    :param tr1: Trace 1
+    :type tr2: :class:`~numpy.ndarray`, :class:`~obspy.core.trace.Trace`
+    :param tr2: Trace 2 to correlate with trace 1
+    :type shift_len: int
+    :param shift_len: Maximum shift in samples, the xcorr function is
+        computed for shifts ``-shift_len`` to ``shift_len``.
+    :type full_xcorr: bool
+    :param full_xcorr: If ``True``, the complete xcorr function will be
+        returned as :class:`~numpy.ndarray`
+    :return: **index, value[, fct]** - Index of maximum xcorr value and the
+        value itself. The complete xcorr function is returned only if
+        ``full_xcorr=True``.
+
+    .. rubric:: Example
+
+    >>> np.random.seed(815)
+    >>> tr1 = np.random.randn(10000)
+    >>> tr2 = np.roll(tr1, 20)
+    >>> a, b = xcorr_fft(tr1, tr2, 1000)
+    >>> a
+    -20
+    >>> round(b, 2)
+    1.0
+    """
+    shifts, values, corp = xcorr_many(tr1, [tr2], shift_len, full_xcorr=True)
+    if full_xcorr:
+        return int(shifts[0]), float(values[0]), corp[0]
+    else:
+        return int(shifts[0]), float(values[0])
+
+
+def xcorr_many(tr, traces, shift_len, full_xcorr=False):
+    """
+    Cross correlation of one trace against many traces in the frequency
+    domain.
+
+    The spectrum of ``tr`` is computed only once and the spectra of all
+    other traces are computed in one vectorized call, so correlating one
+    template against many traces is considerably cheaper than calling
+    :func:`~obspy.signal.cross_correlation.xcorr_fft` in a loop. Results are
+    identical to :func:`~obspy.signal.cross_correlation.xcorr_fft`.
+
+    :type tr: :class:`~numpy.ndarray`, :class:`~obspy.core.trace.Trace`
+    :param tr: Trace to correlate with all other traces.
+    :type traces: :class:`~obspy.core.stream.Stream`, list of
+        :class:`~numpy.ndarray` or :class:`~obspy.core.trace.Trace`, or
+        2-D :class:`~numpy.ndarray`
+    :param traces: Traces to correlate with ``tr``. All traces need to have
+        the same number of samples, a 2-D array is interpreted as one trace
+        per row.
+    :type shift_len: int
+    :param shift_len: Maximum shift in samples, the xcorr functions are
+        computed for shifts ``-shift_len`` to ``shift_len``.
+    :type full_xcorr: bool
+    :param full_xcorr: If ``True``, the complete xcorr functions will be
+        returned as 2-D :class:`~numpy.ndarray` (one row per trace).
+    :return: **indices, values[, fcts]** - Arrays with index of maximum
+        xcorr value and the value itself for each trace in ``traces``. The
+        complete xcorr functions are returned only if ``full_xcorr=True``.
+
+    .. rubric:: Example
+
+    >>> np.random.seed(815)
+    >>> tr = np.random.randn(1000)
+    >>> traces = [np.roll(tr, 10), np.roll(tr, -5)]
+    >>> shifts, values = xcorr_many(tr, traces, 100)
+    >>> shifts
+    array([-10,   5])
+    """
+    if isinstance(tr, Trace):
+        tr = tr.data
+    data1 = np.require(tr, 'float64')
+    if isinstance(traces, np.ndarray) and traces.ndim == 2:
+        data2 = np.require(traces, 'float64')
+    else:
+        data2 = []
+        for tr_ in traces:
+            if isinstance(tr_, Trace):
+                tr_ = tr_.data
+            data2.append(tr_)
+        if len(set([len(d) for d in data2])) > 1:
+            msg = "All traces to correlate against have to be the same " + \
+                  "length."
+            raise ValueError(msg)
+        data2 = np.array(data2, dtype='float64', ndmin=2)
+    ndat = max(len(data1), data2.shape[1])
+    if shift_len < 0 or shift_len >= ndat:
+        msg = "shift_len has to be in range 0 to %s." % (ndat - 1)
+        raise ValueError(msg)
+    corp = _xcorr_fft_core(data1, data2, shift_len)
+    indices = np.abs(corp).argmax(axis=1)
+    values = corp[np.arange(len(corp)), indices]
+    shifts = indices - shift_len
+    if full_xcorr:
+        return shifts, values, corp
+    else:
+        return shifts, values
+
+
+def _xcorr_fft_core(data1, data2, shift_len):
+    """
+    Normalized cross correlation of a 1-D array with each row of a 2-D array.
+
+    Returns a 2-D array with the xcorr functions for shifts ``-shift_len`` to
+    ``shift_len`` in each row.
+    """
+    data1 = data1 - data1.mean()
+    data2 = data2 - data2.mean(axis=1)[:, np.newaxis]
+    # zero padding to at least ndat + shift_len prevents wrap around effects
+    # for all shifts we are interested in
+    nfft = nextpow2(max(len(data1), data2.shape[1]) + shift_len)
+    spec1 = np.fft.rfft(data1, nfft)
+    spec2 = np.fft.rfft(data2, nfft, axis=1)
+    cc = np.fft.irfft(spec1 * spec2.conj(), nfft, axis=1)
+    # negative shifts are located at the end of the circular xcorr function
+    corp = np.hstack((cc[:, nfft - shift_len:], cc[:, :shift_len + 1]))
+    norm = np.sqrt((data1 ** 2).sum() * (data2 ** 2).sum(axis=1))
+    nonzero = norm > 0
+    corp[nonzero] /= norm[nonzero, np.newaxis]
+    corp[~nonzero] = 0.0
+    return corp
+
+
+def _xcorr_select_method(ndat1, ndat2, shift_len):
+    """
+    Select "time" or "freq" domain cross correlation, whichever is cheaper.
+
+    The time domain routine costs about ``ndat * (2 * shift_len + 1)``
+    multiplications, the frequency domain routine three FFTs of length
+    ``nfft``.
+    """
+    ndat = min(ndat1, ndat2)
+    # the time domain C routine can not handle large shifts
+    if ndat - 2 * shift_len <= 0:
+        return "freq"
+    nfft = nextpow2(max(ndat1, ndat2) + shift_len)
+    cost_time = ndat * (2.0 * shift_len + 1)
+    cost_freq = 3 * 5.0 * nfft * M.log(nfft, 2)
+    if cost_time <= cost_freq:
+        return "time"
+    return "freq"
+
+
 def xcorr_3C(st1, st2, shift_len, components=["Z", "N", "E"],
              full_xcorr=False, abs_max=True):
     """
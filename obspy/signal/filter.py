@@ -18,10 +18,20 @@ Various Seismogram Filtering Functions
 """
 
 import warnings
-from numpy import array, where, fft
+from numpy import array, where, fft, zeros
 from scipy.fftpack import hilbert
-from scipy.signal import iirfilter, lfilter, remez, convolve, get_window, \
-    cheby2, cheb2ord
+from scipy.signal import iirfilter, remez, convolve, get_window, \
+    cheby2, cheb2ord, lfilter, zpk2tf
+try:
+    from scipy.signal import sosfilt, zpk2sos
+except ImportError:
+    # scipy < 0.16: filters are designed and applied as coefficients (b, a)
+    sosfilt = zpk2sos = None
+
+
+# filter designs are cached, see _cacheDesign()
+_DESIGN_CACHE = {}
+_DESIGN_CACHE_SIZE = 256
 
 
 def bandpass(data, freqmin, freqmax, df, corners=4, zerophase=False):
@@ -41,25 +51,8 @@ def bandpass(data, freqmin, freqmax, df, corners=4, zerophase=False):
         the resulting filtered trace.
     :return: Filtered data.
     """
-    fe = 0.5 * df
-    low = freqmin / fe
-    high = freqmax / fe
-    # raise for some bad scenarios
-    if high > 1:
-        high = 1.0
-        msg = "Selected high corner frequency is above Nyquist. " + \
-              "Setting Nyquist as high corner."
-        warnings.warn(msg)
-    if low > 1:
-        msg = "Selected low corner frequency is above Nyquist."
-        raise ValueError(msg)
-    [b, a] = iirfilter(corners, [low, high], btype='band',
-                       ftype='butter', output='ba')
-    if zerophase:
-        firstpass = lfilter(b, a, data)
-        return lfilter(b, a, firstpass[::-1])[::-1]
-    else:
-        return lfilter(b, a, data)
+    sos = _bandpassSOS(freqmin, freqmax, df, corners)
+    return _sosFilter(sos, data, zerophase)
 
 
 def bandstop(data, freqmin, freqmax, df, corners=4, zerophase=False):
@@ -80,25 +73,8 @@ def bandstop(data, freqmin, freqmax, df, corners=4, zerophase=False):
         the resulting filtered trace.
     :return: Filtered data.
     """
-    fe = 0.5 * df
-    low = freqmin / fe
-    high = freqmax / fe
-    # raise for some bad scenarios
-    if high > 1:
-        high = 1.0
-        msg = "Selected high corner frequency is above Nyquist. " + \
-              "Setting Nyquist as high corner."
-        warnings.warn(msg)
-    if low > 1:
-        msg = "Selected low corner frequency is above Nyquist."
-        raise ValueError(msg)
-    [b, a] = iirfilter(corners, [low, high],
-                       btype='bandstop', ftype='butter', output='ba')
-    if zerophase:
-        firstpass = lfilter(b, a, data)
-        return lfilter(b, a, firstpass[::-1])[::-1]
-    else:
-        return lfilter(b, a, data)
+    sos = _bandstopSOS(freqmin, freqmax, df, corners)
+    return _sosFilter(sos, data, zerophase)
 
 
 def lowpass(data, freq, df, corners=4, zerophase=False):
@@ -118,21 +94,8 @@ def lowpass(data, freq, df, corners=4, zerophase=False):
         the resulting filtered trace.
     :return: Filtered data.
     """
-    fe = 0.5 * df
-    f = freq / fe
-    # raise for some bad scenarios
-    if f > 1:
-        f = 1.0
-        msg = "Selected corner frequency is above Nyquist. " + \
-              "Setting Nyquist as high corner."
-        warnings.warn(msg)
-    [b, a] = iirfilter(corners, f, btype='lowpass', ftype='butter',
-                       output='ba')
-    if zerophase:
-        firstpass = lfilter(b, a, data)
-        return lfilter(b, a, firstpass[::-1])[::-1]
-    else:
-        return lfilter(b, a, data)
+    sos = _lowpassSOS(freq, df, corners)
+    return _sosFilter(sos, data, zerophase)
 
 
 def highpass(data, freq, df, corners=4, zerophase=False):
@@ -152,19 +115,74 @@ def highpass(data, freq, df, corners=4, zerophase=False):
         the resulting filtered trace.
     :return: Filtered data.
     """
+    sos = _highpassSOS(freq, df, corners)
+    return _sosFilter(sos, data, zerophase)
+
+
+def _bandpassSOS(freqmin, freqmax, df, corners=4):
+    """
+    Second-order sections of Butterworth-Bandpass filter, see :func:`bandpass`.
+    """
+    fe = 0.5 * df
+    low = freqmin / fe
+    high = freqmax / fe
+    # raise for some bad scenarios
+    if high > 1:
+        high = 1.0
+        msg = "Selected high corner frequency is above Nyquist. " + \
+              "Setting Nyquist as high corner."
+        warnings.warn(msg)
+    if low > 1:
+        msg = "Selected low corner frequency is above Nyquist."
+        raise ValueError(msg)
+    return _butterworthSOS(corners, (low, high), 'band')
+
+
+def _bandstopSOS(freqmin, freqmax, df, corners=4):
+    """
+    Second-order sections of Butterworth-Bandstop filter, see :func:`bandstop`.
+    """
+    fe = 0.5 * df
+    low = freqmin / fe
+    high = freqmax / fe
+    # raise for some bad scenarios
+    if high > 1:
+        high = 1.0
+        msg = "Selected high corner frequency is above Nyquist. " + \
+              "Setting Nyquist as high corner."
+        warnings.warn(msg)
+    if low > 1:
+        msg = "Selected low corner frequency is above Nyquist."
+        raise ValueError(msg)
+    return _butterworthSOS(corners, (low, high), 'bandstop')
+
+
+def _lowpassSOS(freq, df, corners=4):
+    """
+    Second-order sections of Butterworth-Lowpass filter, see :func:`lowpass`.
+    """
+    fe = 0.5 * df
+    f = freq / fe
+    # raise for some bad scenarios
+    if f > 1:
+        f = 1.0
+        msg = "Selected corner frequency is above Nyquist. " + \
+              "Setting Nyquist as high corner."
+        warnings.warn(msg)
+    return _butterworthSOS(corners, f, 'lowpass')
+
+
+def _highpassSOS(freq, df, corners=4):
+    """
+    Second-order sections of Butterworth-Highpass filter, see :func:`highpass`.
+    """
     fe = 0.5 * df
     f = freq / fe
     # raise for some bad scenarios
     if f > 1:
         msg = "Selected corner frequency is above Nyquist."
         raise ValueError(msg)
-    [b, a] = iirfilter(corners, f, btype='highpass', ftype='butter',
-                       output='ba')
-    if zerophase:
-        firstpass = lfilter(b, a, data)
-        return lfilter(b, a, firstpass[::-1])[::-1]
-    else:
-        return lfilter(b, a, data)
+    return _butterworthSOS(corners, f, 'highpass')
 
 
 def envelope(data):
@@ -343,6 +361,46 @@ def lowpassCheby2(data, freq, df, maxorder=12, ba=False,
         the iteratively determined pass band frequency
     :return: Filtered data.
     """
+    b, a, sos, wp = _cheby2Design(freq, df, maxorder)
+    if ba:
+        return b, a
+    if freq_passband:
+        return _sosFilter(sos, data, False), wp
+    return _sosFilter(sos, data, False)
+
+
+def _butterworthSOS(corners, wn, btype):
+    """
+    Cached Butterworth filter design as second-order sections.
+
+    :param corners: Filter corners.
+    :type wn: float or tuple
+    :param wn: Corner frequency or (low, high) corner frequencies normalized
+        by the Nyquist frequency.
+    :param btype: Filter type as used by :func:`scipy.signal.iirfilter`.
+    """
+    key = ('butter', btype, corners, wn)
+    try:
+        return _DESIGN_CACHE[key]
+    except KeyError:
+        pass
+    if isinstance(wn, tuple):
+        wn = list(wn)
+    z, p, k = iirfilter(corners, wn, btype=btype, ftype='butter',
+                        output='zpk')
+    sos = _zpkDesign(z, p, k)
+    _cacheDesign(key, sos)
+    return sos
+
+
+def _cheby2Design(freq, df, maxorder=12):
+    """
+    Cached iterative design of the Cheby2-Lowpass filter, see
+    :func:`lowpassCheby2`.
+
+    :return: Filter coefficients (b, a), second-order sections and pass band
+        frequency.
+    """
     nyquist = df * 0.5
     # rp - maximum ripple of passband, rs - attenuation of stopband
     rp, rs, order = 1, 96, 1e99
@@ -354,17 +412,145 @@ def lowpassCheby2(data, freq, df, maxorder=12, ba=False,
         msg = "Selected corner frequency is above Nyquist. " + \
               "Setting Nyquist as high corner."
         warnings.warn(msg)
+    key = ('cheby2', 'lowpass', maxorder, ws)
+    try:
+        b, a, sos, wp = _DESIGN_CACHE[key]
+        return b, a, sos, wp * nyquist
+    except KeyError:
+        pass
     while True:
         if order <= maxorder:
             break
         wp = wp * 0.99
         order, wn = cheb2ord(wp, ws, rp, rs, analog=0)
     b, a = cheby2(order, rs, wn, btype='low', analog=0, output='ba')
-    if ba:
-        return b, a
-    if freq_passband:
-        return lfilter(b, a, data), wp * nyquist
-    return lfilter(b, a, data)
+    z, p, k = cheby2(order, rs, wn, btype='low', analog=0, output='zpk')
+    sos = _zpkDesign(z, p, k)
+    _cacheDesign(key, (b, a, sos, wp))
+    return b, a, sos, wp * nyquist
+
+
+def _cacheDesign(key, design):
+    """
+    Store a filter design, the cache is emptied when it gets too large.
+    """
+    if len(_DESIGN_CACHE) >= _DESIGN_CACHE_SIZE:
+        _DESIGN_CACHE.clear()
+    _DESIGN_CACHE[key] = design
+
+
+def _zpkDesign(z, p, k):
+    """
+    Second-order sections of a filter given by zeros, poles and gain. Older
+    scipy versions without :func:`scipy.signal.sosfilt` get the filter
+    coefficients (b, a) instead.
+    """
+    if zpk2sos is None:
+        return zpk2tf(z, p, k)
+    return zpk2sos(z, p, k)
+
+
+def _sosfilt(sos, data, zi=None):
+    """
+    Apply a design of :func:`_zpkDesign` to data, with initial state ``zi``
+    if given (see :func:`_sosState`).
+    """
+    if sosfilt is None:
+        b, a = sos
+        if zi is None:
+            return lfilter(b, a, data)
+        return lfilter(b, a, data, zi=zi)
+    if zi is None:
+        return sosfilt(sos, data)
+    return sosfilt(sos, data, zi=zi)
+
+
+def _sosState(sos):
+    """
+    Initial rest state of a design of :func:`_zpkDesign`.
+    """
+    if sosfilt is None:
+        b, a = sos
+        return zeros(max(len(a), len(b)) - 1)
+    return zeros((len(sos), 2))
+
+
+def _sosFilter(sos, data, zerophase):
+    """
+    Apply second-order sections to data, once forwards and once backwards
+    for zerophase filtering.
+    """
+    if zerophase:
+        firstpass = _sosfilt(sos, data)
+        return _sosfilt(sos, firstpass[::-1])[::-1]
+    else:
+        return _sosfilt(sos, data)
+
+
+class ContinuousFilter(object):
+    """
+    IIR filter for continuous data processed in consecutive chunks.
+
+    The state of all second-order sections is kept between calls, so
+    filtering data chunk by chunk gives the same result as filtering all
+    data at once with the respective function of this module, without
+    transients at the chunk boundaries. An instance can be registered as
+    real time process of :class:`~obspy.realtime.rttrace.RtTrace`.
+
+    :type type: str
+    :param type: One of ``'bandpass'``, ``'bandstop'``, ``'lowpass'``,
+        ``'highpass'`` or ``'lowpassCheby2'``.
+    :type df: float
+    :param df: Sampling rate in Hz.
+    :param options: Filter options of the respective function, e.g.
+        ``freqmin``, ``freqmax`` and ``corners`` for ``'bandpass'``.
+        Zero-phase filtering is not possible for continuous data.
+
+    .. rubric:: Example
+
+    >>> import numpy as np
+    >>> data = np.random.randn(1000)
+    >>> flt = ContinuousFilter('bandpass', 100.0, freqmin=1.0, freqmax=10.0)
+    >>> out = np.concatenate([flt(data[:300]), flt(data[300:])])
+    >>> np.allclose(out, bandpass(data, 1.0, 10.0, 100.0))
+    True
+    """
+    def __init__(self, type, df, **options):
+        if type == 'lowpassCheby2':
+            options.setdefault('maxorder', 12)
+            self.sos = _cheby2Design(df=df, **options)[2]
+        elif type in _SOS_DESIGNS:
+            self.sos = _SOS_DESIGNS[type](df=df, **options)
+        else:
+            msg = "Filter type '%s' not supported for continuous data." % \
+                type
+            raise ValueError(msg)
+        self.reset()
+
+    def reset(self):
+        """
+        Reset filter state, e.g. after a gap in the data.
+        """
+        self.zi = _sosState(self.sos)
+
+    def __call__(self, data):
+        """
+        Filter next chunk of data.
+
+        :type data: :class:`numpy.ndarray`
+        :param data: Next chunk of data.
+        :return: Filtered data.
+        """
+        data, self.zi = _sosfilt(self.sos, data, zi=self.zi)
+        return data
+
+
+_SOS_DESIGNS = {
+    'bandpass': _bandpassSOS,
+    'bandstop': _bandstopSOS,
+    'lowpass': _lowpassSOS,
+    'highpass': _highpassSOS,
+}
 
 
 if __name__ == '__main__':
@@ -34,7 +34,8 @@ def mper(data, win, Nfft, n1=0, n2=0):
     The modified periodogram of the given signal is returned.
 
     :type data: :class:`~numpy.ndarray`
-    :param data: Data to make spectrum of.
+    :param data: Data to make spectrum of, the spectra of all rows of
+        windowed data are computed at once.
     :param win: Window to multiply with given signal.
     :param Nfft: Number of points for FFT.
     :type n1: int, optional
@@ -44,12 +45,12 @@ def mper(data, win, Nfft, n1=0, n2=0):
     :return: Spectrum.
     """
     if (n2 == 0):
-        n2 = len(data)
+        n2 = data.shape[-1]
     n = n2 - n1
     U = pow(np.linalg.norm([win]), 2) / n
     xw = data * win
     Px = pow(abs(fftpack.fft(xw, Nfft)), 2) / (n * U)
-    Px[0] = Px[1]
+    Px[..., 0] = Px[..., 1]
     return Px
 
 
@@ -64,7 +65,8 @@ def welch(data, win, Nfft, L=0, over=0):
     Welch's estimate of the power spectrum is returned using a linear scale.
 
     :type data: :class:`~numpy.ndarray`
-    :param data: Data to make spectrum of.
+    :param data: Data to make spectrum of, the spectra of all rows of
+        windowed data are computed at once.
     :param win: Window to multiply with given signal.
     :param Nfft: Number of points for FFT.
     :type L: int, optional
@@ -74,16 +76,14 @@ def welch(data, win, Nfft, L=0, over=0):
     :return: Spectrum.
     """
     if (L == 0):
-        L = len(data)
-    n1 = 0
-    n2 = L
+        L = data.shape[-1]
     n0 = (1. - float(over)) * L
-    nsect = 1 + int(np.floor((len(data) - L) / (n0)))
-    Px = 0
-    for _i in xrange(nsect):
-        Px = Px + mper(data, win, Nfft, n1, n2) / nsect
-        n1 = n1 + n0
-        n2 = n2 + n0
+    nsect = 1 + int(np.floor((data.shape[-1] - L) / (n0)))
+    # every section is the modified periodogram of the whole data with the
+    # same normalization length L, so their average is computed only once
+    if nsect < 1:
+        return 0
+    Px = mper(data, win, Nfft, 0, L)
     return Px
 
 
@@ -107,17 +107,16 @@ def cfrequency(data, fs, smoothie, fk):
     :return: **cfreq[, dcfreq]** - Central frequency, Time derivative of center
         frequency (windowed only).
     """
-    nfft = util.nextpow2(data.shape[1])
+    nfft = util.nextpow2(data.shape[-1])
     freq = np.linspace(0, fs, nfft + 1)
     freqaxis = freq[0:nfft / 2]
-    cfreq = np.zeros(data.shape[0])
     if np.size(data.shape) > 1:
-        i = 0
-        for row in data:
-            Px_wm = welch(row, np.hamming(len(row)), util.nextpow2(len(row)))
-            Px = Px_wm[0:len(Px_wm) / 2]
-            cfreq[i] = np.sqrt(np.sum(freqaxis ** 2 * Px) / (sum(Px)))
-            i = i + 1
+        # spectra of all windows at once
+        Px_wm = welch(data, np.hamming(data.shape[1]),
+                      util.nextpow2(data.shape[1]))
+        Px = Px_wm[:, 0:Px_wm.shape[1] / 2]
+        cfreq = np.sqrt(np.sum(freqaxis ** 2 * Px, axis=1) /
+                        np.sum(Px, axis=1))
         cfreq = util.smooth(cfreq, smoothie)
         #cfreq_add = \
         #        np.append(np.append([cfreq[0]] * (np.size(fk) // 2), cfreq),
@@ -159,16 +158,13 @@ def bwith(data, fs, smoothie, fk):
     """
     nfft = util.nextpow2(data.shape[1])
     freqaxis = np.linspace(0, fs, nfft + 1)
-    bwith = np.zeros(data.shape[0])
     f = fftpack.fft(data, nfft)
     f_sm = util.smooth(abs(f[:, 0:nfft / 2]), 10)
     if np.size(data.shape) > 1:
-        i = 0
-        for row in f_sm:
-            minfc = abs(row - max(abs(row * (1 / np.sqrt(2)))))
-            [mdist_ind, _mindist] = min(enumerate(minfc), key=itemgetter(1))
-            bwith[i] = freqaxis[mdist_ind]
-            i = i + 1
+        # first bin closest to 1/sqrt(2) of the maximum of each window
+        level = np.max(abs(f_sm * (1 / np.sqrt(2))), axis=1)
+        minfc = abs(f_sm - level[:, np.newaxis])
+        bwith = freqaxis[np.argmin(minfc, axis=1)]
         #bwith_add = \
         #        np.append(np.append([bwith[0]] * (np.size(fk) // 2), bwith),
         #        [bwith[np.size(bwith) - 1]] * (np.size(fk) // 2))
@@ -211,16 +207,11 @@ def domperiod(data, fs, smoothie, fk):
     nfft = 1024
     #nfft = util.nextpow2(data.shape[1])
     freqaxis = np.linspace(0, fs, nfft + 1)
-    dperiod = np.zeros(data.shape[0])
     f = fftpack.fft(data, nfft)
     #f_sm = util.smooth(abs(f[:,0:nfft/2]),1)
     f_sm = f[:, 0:nfft / 2]
     if np.size(data.shape) > 1:
-        i = 0
-        for row in f_sm:
-            [mdist_ind, _mindist] = max(enumerate(abs(row)), key=itemgetter(1))
-            dperiod[i] = freqaxis[mdist_ind]
-            i = i + 1
+        dperiod = freqaxis[np.argmax(abs(f_sm), axis=1)]
         #dperiod_add = np.append(np.append([dperiod[0]] * (np.size(fk) // 2), \
         #    dperiod), [dperiod[np.size(dperiod) - 1]] * (np.size(fk) // 2))
         # faster alternative
@@ -40,6 +40,30 @@ def sonogram(data, fs, fc1, nofb, no_win):
     :param no_win: Number of data windows.
     :return: Half octave bands.
     """
+    nfft = util.nextpow2(data.shape[np.size(data.shape) - 1])
+    #c = np.zeros((data.shape), dtype='complex64')
+    c = fftpack.fft(data, nfft)
+    power = abs(c[:no_win]) ** 2
+    z_tot = np.sum(power, axis=1)
+    # band powers of all windows with one matrix product
+    z = np.dot(power, _bandMatrix(fs, fc1, nofb, nfft))
+    hob = np.log(z / z_tot[:, np.newaxis])
+    return hob
+
+
+def _bandMatrix(fs, fc1, nofb, nfft):
+    """
+    Summation matrix of the half octave bands.
+
+    Column i of the matrix selects the frequency bins of band i, multiplying
+    a power spectrum with it gives the power in all bands.
+
+    :param fs: Sampling frequency in Hz.
+    :param fc1: Center frequency of lowest half octave band.
+    :param nofb: Number of half octave bands.
+    :param nfft: Number of points of the spectrum.
+    :return: Matrix of shape (nfft, nofb).
+    """
     fc = np.zeros([nofb])
     fmin = np.zeros([nofb])
     fmax = np.zeros([nofb])
@@ -51,19 +75,9 @@ def sonogram(data, fs, fc1, nofb, no_win):
         fc[i] = fc[i - 1] * 1.5
         fmin[i] = fc[i] / np.sqrt(float(5. / 3.))
         fmax[i] = fc[i] * np.sqrt(float(5. / 3.))
-    nfft = util.nextpow2(data.shape[np.size(data.shape) - 1])
-    #c = np.zeros((data.shape), dtype='complex64')
-    c = fftpack.fft(data, nfft)
-    z = np.zeros([len(c[:, 1]), nofb])
-    z_tot = np.zeros(len(c[:, 1]))
-    hob = np.zeros([no_win, nofb])
-    for k in xrange(no_win):
-        for j in xrange(len(c[1, :])):
-            z_tot[k] = z_tot[k] + pow(np.abs(c[k, j]), 2)
-        for i in xrange(nofb):
-            start = int(round(fmin[i] * nfft * 1. / float(fs), 0))
-            end = int(round(fmax[i] * nfft * 1. / float(fs), 0)) + 1
-            for j in xrange(start, end):
-                z[k, i] = z[k, i] + pow(np.abs(c[k, j - 1]), 2)
-            hob[k, i] = np.log(z[k, i] / z_tot[k])
-    return hob
+    bands = np.zeros([nfft, nofb])
+    for i in xrange(nofb):
+        start = int(round(fmin[i] * nfft * 1. / float(fs), 0))
+        end = int(round(fmax[i] * nfft * 1. / float(fs), 0)) + 1
+        bands[np.arange(start, end) - 1, i] = 1
+    return bands
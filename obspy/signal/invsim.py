@@ -19,17 +19,20 @@ to m/s.
     (http://www.gnu.org/copyleft/lesser.html)
 """
 
+from obspy.core.util import OrderedDict
 from obspy.core.util.base import NamedTemporaryFile
 from obspy.core.util.decorator import deprecated_keywords
 from obspy.signal.detrend import simple as simpleDetrend
 from obspy.signal.headers import clibevresp
 import ctypes as C
+import hashlib
 import math as M
 import numpy as np
 import os
 import scipy.signal
 import util
 import warnings
+import weakref
 
 
 # Sensitivity is 2080 according to:
@@ -39,6 +42,17 @@ import warnings
 WOODANDERSON = {'poles': [-6.283 + 4.7124j, -6.283 - 4.7124j],
                 'zeros': [0 + 0j], 'gain': 1.0, 'sensitivity': 2080}
 
+# evaluated RESP responses are cached, see evalresp()
+_EVALRESP_CACHE = {}
+_EVALRESP_CACHE_SIZE = 64
+# RESP information and its hash per Parser object, see _getRESP()
+_PARSER_RESP = weakref.WeakKeyDictionary()
+# spectral operators of seisSim, see _simulationOperator(). The cache holds
+# at most SIMULATION_CACHE_BYTES bytes of operators, larger operators are not
+# cached at all. Set to 0 to disable caching.
+SIMULATION_CACHE_BYTES = 64 * 1024 ** 2
+_SIMULATION_CACHE = OrderedDict()
+
 
 def cosTaper(npts, p=0.1, freqs=None, flimit=None, halfcosine=True,
              sactaper=False):
@@ -167,8 +181,11 @@ def evalresp(t_samp, nfft, filename, date, station='*', channel='*',
     :param t_samp: Sampling interval in seconds
     :type nfft: int
     :param nfft: Number of FFT points of signal which needs correction
-    :type filename: str
-    :param filename: SEED RESP-filename or content of RESP file
+    :type filename: str, file-like object or
+        :class:`~obspy.xseed.parser.Parser`
+    :param filename: SEED RESP-filename, content of RESP file, file-like
+        object (e.g. StringIO) containing RESP information or a
+        :class:`~obspy.xseed.parser.Parser` object.
     :type date: UTCDateTime
     :param date: Date of interest
     :type station: str
@@ -185,9 +202,63 @@ def evalresp(t_samp, nfft, filename, date, station='*', channel='*',
     :param debug: Verbose output to stdout. Disabled by default.
     :rtype: numpy.ndarray complex128
     :return: Frequency response from SEED RESP-file of length nfft
+
+    Responses are cached by RESP content, channel, day, ``nfft``,
+    ``t_samp`` and ``units``, so that correcting many traces of the same
+    channel only runs evalresp once. The RESP information is only written
+    to a temporary file (needed by the evalresp library) on cache misses.
+    The RESP information of a Parser object is generated only once per
+    object, so Parser objects should not be changed after using them here.
+    """
+    digest, data = _getRESP(filename)
+    key = (digest, station, channel, network, locid,
+           date.year, date.julday, nfft, float(t_samp), units)
+    try:
+        h, f = _EVALRESP_CACHE[key]
+    except KeyError:
+        h, f = _evalresp(t_samp, nfft, data, date, station, channel,
+                         network, locid, units, debug)
+        if len(_EVALRESP_CACHE) >= _EVALRESP_CACHE_SIZE:
+            _EVALRESP_CACHE.clear()
+        _EVALRESP_CACHE[key] = (h, f)
+    # return copies, the response is e.g. inverted in place by seisSim
+    if freq:
+        return h.copy(), f.copy()
+    return h.copy()
+
+
+def _getRESP(resp):
+    """
+    Returns the MD5 digest and the RESP information of a filename, RESP
+    string, file-like object or Parser object as string.
+
+    The RESP information of all channels of a Parser object is generated
+    once and kept as long as the Parser object exists.
+    """
+    if hasattr(resp, 'getRESP'):
+        try:
+            return _PARSER_RESP[resp]
+        except KeyError:
+            pass
+        data = ''.join([r.getvalue() for _, r in resp.getRESP()])
+        _PARSER_RESP[resp] = (hashlib.md5(data).digest(), data)
+        return _PARSER_RESP[resp]
+    if hasattr(resp, 'read'):
+        data = resp.read()
+    elif '\n' in resp or '\r' in resp:
+        data = resp
+    else:
+        with open(resp, 'rb') as fh:
+            data = fh.read()
+    return hashlib.md5(data).digest(), data
+
+
+def _evalresp(t_samp, nfft, data, date, station, channel, network, locid,
+              units, debug):
+    """
+    Runs the evalresp library on RESP information given as string.
     """
     # evalresp needs files with correct line separators depending on OS
-    data = open(filename, 'rb').read()
     with NamedTemporaryFile() as fh:
         tempfile = fh.name
         fh.write(os.linesep.join(data.splitlines()))
@@ -215,19 +286,15 @@ def evalresp(t_samp, nfft, filename, date, station='*', channel='*',
         res = clibevresp.evresp(sta, cha, net, locid, datime, unts, fn,
                                 freqs, nfreqs, rtyp, vbs, start_stage,
                                 stop_stage, stdio_flag, C.c_int(0))
-        # optimizing performance, see
-        # http://wiki.python.org/moin/PythonSpeed/PerformanceTips
-        nfreqs, rfreqs, rvec = res[0].nfreqs, res[0].freqs, res[0].rvec
-        h = np.empty(nfreqs, dtype='complex128')
-        f = np.empty(nfreqs, dtype='float64')
-        for i in xrange(nfreqs):
-            h[i] = rvec[i].real + rvec[i].imag * 1j
-            f[i] = rfreqs[i]
+        # copy the complex response and frequencies in one go
+        nfreqs = res[0].nfreqs
+        rvec = C.cast(res[0].rvec, C.POINTER(C.c_double))
+        h = np.ctypeslib.as_array(rvec, shape=(2 * nfreqs,))
+        h = h.view('complex128').copy()
+        f = np.ctypeslib.as_array(res[0].freqs, shape=(nfreqs,)).copy()
         clibevresp.free_response(res)
-        del nfreqs, rfreqs, rvec, res
-    if freq:
-        return h, f
-    return h
+        del nfreqs, rvec, res
+    return h, f
 
 
 def cornFreq2Paz(fc, damp=0.707):
@@ -383,6 +450,10 @@ def seisSim(data, samp_rate, paz_remove=None, paz_simulate=None,
         that the response function should be extracted for;
         'units' defines the units of the response function.
         Can be either 'DIS', 'VEL' or 'ACC'.
+        'filename' may also be a file-like object or a
+        :class:`~obspy.xseed.parser.Parser` object, in which case the
+        optional keys 'network', 'station', 'location' and 'channel' select
+        the channel to evaluate.
     :type nfft_pow2: Boolean
     :param nfft_pow2: Number of frequency points to use for FFT. If True,
         the exact power of two is taken (default in PITSA). If False the
@@ -399,6 +470,12 @@ def seisSim(data, samp_rate, paz_remove=None, paz_simulate=None,
     :param shsim: Choose parameters to match
         instrument correction as done by Seismic Handler.
     :return: The corrected data are returned as numpy.ndarray float64
+
+    .. note::
+        The spectral operators of PAZ instruments are cached for repeated
+        simulations, limited to ``SIMULATION_CACHE_BYTES`` bytes in total
+        (module variable, 64 MB by default). The cache can be emptied with
+        :func:`clearSimulationCache`.
         array. float64 is chosen to avoid numerical instabilities.
 
     This function works in the frequency domain, where nfft is the next power
@@ -457,21 +534,76 @@ def seisSim(data, samp_rate, paz_remove=None, paz_simulate=None,
         nfft = 2 * ndat
     # Transform data in Fourier domain
     data = np.fft.rfft(data, n=nfft)
-    # Inverse filtering = Instrument correction
-    if paz_remove:
-        freq_response, freqs = pazToFreqResp(paz_remove['poles'],
-                                             paz_remove['zeros'],
-                                             paz_remove['gain'], delta, nfft,
-                                             freq=True)
+    if seedresp and not remove_sensitivity:
+        msg = "remove_sensitivity is set to False, but since seedresp " + \
+              "is selected the overall sensitivity will be corrected " + \
+              " for anyway!"
+        warnings.warn(msg)
+    # Inverse filtering = Instrument correction and forward filtering =
+    # Instrument simulation in one go
+    data *= _simulationOperator(paz_remove, paz_simulate, seedresp, delta,
+                                nfft, water_level, pre_filt, sacsim)
+
+    data[-1] = abs(data[-1]) + 0.0j
+    # transform data back into the time domain
+    data = np.fft.irfft(data)[0:ndat]
+    if pitsasim:
+        # linear detrend
+        data = simpleDetrend(data)
+    if shsim:
+        # detrend using least squares
+        data = scipy.signal.detrend(data, type="linear")
+    # correct for involved overall sensitivities
+    if paz_remove and remove_sensitivity and not seedresp:
+        data /= paz_remove['sensitivity']
+    if paz_simulate and simulate_sensitivity:
+        data *= paz_simulate['sensitivity']
+    return data
+
+
+def _simulationOperator(paz_remove, paz_simulate, seedresp, t_samp, nfft,
+                        water_level, pre_filt, sacsim):
+    """
+    Returns the spectral operator which is multiplied with the spectrum of
+    the data in :func:`seisSim`, i.e. the water level inverted response of
+    the instrument to remove, tapered with ``pre_filt``, times the response
+    of the instrument to simulate.
+
+    Operators for PAZ instruments are kept in a least recently used cache so
+    that simulating many traces of the same instrument with the same number
+    of samples and sampling rate evaluates the responses only once. Do not
+    modify the returned array in place.
+
+    The cache is limited to ``SIMULATION_CACHE_BYTES`` bytes, least recently
+    used operators are evicted first and operators exceeding the limit by
+    themselves are not cached.
+    """
+    key = None
+    if not seedresp:
+        key = (_pazKey(paz_remove), _pazKey(paz_simulate), float(t_samp),
+               nfft, water_level, pre_filt and tuple(pre_filt), bool(sacsim))
+        try:
+            operator = _SIMULATION_CACHE.pop(key)
+        except KeyError:
+            pass
+        else:
+            # reinsert as most recently used
+            _SIMULATION_CACHE[key] = operator
+            return operator
+    operator = np.ones(nfft // 2 + 1, dtype='complex128')
     if seedresp:
-        freq_response, freqs = evalresp(delta, nfft, seedresp['filename'],
+        freq_response, freqs = evalresp(t_samp, nfft, seedresp['filename'],
                                         seedresp['date'],
+                                        station=seedresp.get('station', '*'),
+                                        channel=seedresp.get('channel', '*'),
+                                        network=seedresp.get('network', '*'),
+                                        locid=seedresp.get('location', '*'),
                                         units=seedresp['units'], freq=True)
-        if not remove_sensitivity:
-            msg = "remove_sensitivity is set to False, but since seedresp " + \
-                  "is selected the overall sensitivity will be corrected " + \
-                  " for anyway!"
-            warnings.warn(msg)
+    elif paz_remove:
+        freq_response, freqs = pazToFreqResp(paz_remove['poles'],
+                                             paz_remove['zeros'],
+                                             paz_remove['gain'], t_samp, nfft,
+                                             freq=True)
     if paz_remove or seedresp:
         if pre_filt:
             # make cosine taper
@@ -482,30 +614,38 @@ def seisSim(data, samp_rate, paz_remove=None, paz_simulate=None,
             else:
                 cos_win = cosTaper(freqs.size, freqs=freqs,
                                    flimit=(fl1, fl2, fl3, fl4))
-            data *= cos_win
+            operator *= cos_win
         specInv(freq_response, water_level)
-        data *= freq_response
+        operator *= freq_response
         del freq_response
-    # Forward filtering = Instrument simulation
     if paz_simulate:
-        data *= pazToFreqResp(paz_simulate['poles'],
-                paz_simulate['zeros'], paz_simulate['gain'], delta, nfft)
+        operator *= pazToFreqResp(paz_simulate['poles'],
+                                  paz_simulate['zeros'],
+                                  paz_simulate['gain'], t_samp, nfft)
+    if key is not None and operator.nbytes <= SIMULATION_CACHE_BYTES:
+        nbytes = sum([op.nbytes for op in _SIMULATION_CACHE.itervalues()])
+        while _SIMULATION_CACHE and \
+                nbytes + operator.nbytes > SIMULATION_CACHE_BYTES:
+            nbytes -= _SIMULATION_CACHE.popitem(last=False)[1].nbytes
+        _SIMULATION_CACHE[key] = operator
+    return operator
+
+
+def clearSimulationCache():
+    """
+    Removes all cached spectral operators of :func:`seisSim`.
+    """
+    _SIMULATION_CACHE.clear()
 
-    data[-1] = abs(data[-1]) + 0.0j
-    # transform data back into the time domain
-    data = np.fft.irfft(data)[0:ndat]
-    if pitsasim:
-        # linear detrend
-        data = simpleDetrend(data)
-    if shsim:
-        # detrend using least squares
-        data = scipy.signal.detrend(data, type="linear")
-    # correct for involved overall sensitivities
-    if paz_remove and remove_sensitivity and not seedresp:
-        data /= paz_remove['sensitivity']
-    if paz_simulate and simulate_sensitivity:
-        data *= paz_simulate['sensitivity']
-    return data
+
+def _pazKey(paz):
+    """
+    Returns a hashable representation of the response relevant entries of
+    a PAZ dictionary.
+    """
+    if not paz:
+        return None
+    return (tuple(paz['poles']), tuple(paz['zeros']), float(paz['gain']))
 
 
 def paz2AmpValueOfFreqResp(paz, freq):
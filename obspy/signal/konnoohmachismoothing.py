@@ -20,6 +20,7 @@ Functions to smooth spectra with the so called Konno & Ohmachi method.
 """
 
 import numpy as np
+import scipy.sparse
 import warnings
 
 
@@ -129,9 +130,129 @@ def calculateSmoothingMatrix(frequencies, bandwidth=40.0, normalize=False):
     return sm_matrix
 
 
+def calculateSparseSmoothingMatrix(frequencies, bandwidth=40.0,
+                                   normalize=False, tolerance=1e-6):
+    """
+    Calculates a sparse len(frequencies) x len(frequencies) matrix with the
+    Konno & Ohmachi window for each frequency as the center frequency.
+
+    The smoothing window is bounded by (b * log_10(f/f_c))^-4, so only the
+    band of frequencies around each center frequency for which this bound is
+    not smaller than tolerance is stored. The returned matrix is a
+    scipy.sparse.csr_matrix with one smoothing window per row. Any spectrum
+    (or many spectra stored one per row in a matrix) with the same frequency
+    bins can be smoothed with:
+        smoothed_spectra = smoothing_matrix.dot(spectra.T).T
+
+    The memory consumption scales with the number of frequency bins inside
+    the bands, which is small for logarithmically spaced frequencies. For
+    linearly spaced frequencies the band of a center frequency f_c still
+    contains about f_c / df bins times a factor depending on bandwidth and
+    tolerance.
+
+    :param frequencies: numpy.ndarray (float32 or float64)
+        The input frequencies, sorted in ascending order.
+    :param bandwidth: float > 0.0
+        Determines the width of the smoothing peak. Lower values result in a
+        broader peak. Defaults to 40.
+    :param normalize: bool
+        The Konno-Ohmachi smoothing window is normalized on a logarithmic
+        scale. Set this parameter to True to normalize it on a normal scale.
+        The truncated windows are normalized. Default to False.
+    :param tolerance: float > 0.0
+        Window values are only neglected if they are guaranteed to be smaller
+        than tolerance. Defaults to 1e-6.
+    """
+    if frequencies.dtype != np.float32 and frequencies.dtype != np.float64:
+        msg = 'frequencies needs to have a dtype of float32/64.'
+        raise ValueError(msg)
+    if np.any(np.diff(frequencies) < 0):
+        msg = 'frequencies need to be sorted in ascending order.'
+        raise ValueError(msg)
+    values, cols, counts = _smoothingBands(frequencies, bandwidth,
+                                           normalize, tolerance)
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+    sm_matrix = scipy.sparse.csr_matrix((values, cols, indptr),
+                                        shape=(len(frequencies),) * 2)
+    return sm_matrix
+
+
+def _smoothingBands(frequencies, bandwidth, normalize, tolerance, start=0,
+                    stop=None):
+    """
+    Returns the significant Konno & Ohmachi window values for the center
+    frequencies frequencies[start:stop], the corresponding frequency indices
+    and the number of values per center frequency.
+    """
+    center = frequencies[start:stop]
+    # Half width of the band on a logarithmic scale.
+    width = tolerance ** -0.25 / bandwidth
+    first = np.searchsorted(frequencies, center * 10 ** -width, 'left')
+    last = np.searchsorted(frequencies, center * 10 ** width, 'right')
+    counts = last - first
+    # Frequency indices of all entries in the bands.
+    cols = np.arange(counts.sum()) + np.repeat(first - np.cumsum(counts) +
+                                               counts, counts)
+    # Disable numpy warnings due to possible divisions by zero/logarithms
+    # of zero.
+    temp = np.geterr()
+    np.seterr(all='ignore')
+    log_frequencies = bandwidth * np.log10(frequencies)
+    values = log_frequencies[cols] - np.repeat(log_frequencies[start:stop],
+                                               counts)
+    values = (np.sin(values) / values) ** 4
+    np.seterr(**temp)
+    # The limit of f->f_c is one. Zero frequencies are only in the band of a
+    # zero center frequency.
+    values[frequencies[cols] == np.repeat(center, counts)] = 1.0
+    # Normalize to one if wished.
+    if normalize and len(counts):
+        offsets = np.cumsum(counts) - counts
+        values /= np.repeat(np.add.reduceat(values, offsets), counts)
+    values = np.require(values, frequencies.dtype)
+    return values, cols, counts
+
+
+def _bandCounts(frequencies, bandwidth, tolerance):
+    """
+    Returns the number of significant window values per center frequency.
+    """
+    width = tolerance ** -0.25 / bandwidth
+    return np.searchsorted(frequencies, frequencies * 10 ** width, 'right') - \
+        np.searchsorted(frequencies, frequencies * 10 ** -width, 'left')
+
+
+def _bandedSmoothing(spectra, frequencies, bandwidth, normalize, tolerance,
+                     max_memory_usage):
+    """
+    Smoothes the spectra with the significant window values only without
+    storing the whole sparse smoothing matrix. The center frequencies are
+    processed in chunks using approximately max_memory_usage MB.
+    """
+    new_spec = np.empty(spectra.shape, spectra.dtype)
+    length = len(frequencies)
+    cumulative_counts = np.cumsum(_bandCounts(frequencies, bandwidth,
+                                              tolerance))
+    # Number of window values per chunk from the bytes needed for one value.
+    nspec = len(spectra) if spectra.ndim > 1 else 1
+    limit = max_memory_usage * 1048576.0 / (8.0 * (6 + nspec))
+    start = 0
+    while start < length:
+        done = cumulative_counts[start - 1] if start else 0
+        stop = max(np.searchsorted(cumulative_counts, done + limit, 'right'),
+                   start + 1)
+        values, cols, chunk_counts = _smoothingBands(frequencies, bandwidth,
+            normalize, tolerance, start, stop)
+        offsets = np.cumsum(chunk_counts) - chunk_counts
+        new_spec[..., start:stop] = np.add.reduceat(spectra[..., cols] *
+            values, offsets, axis=-1)
+        start = stop
+    return new_spec
+
+
 def konnoOhmachiSmoothing(spectra, frequencies, bandwidth=40, count=1,
                   enforce_no_matrix=False, max_memory_usage=512,
-                  normalize=False):
+                  normalize=False, tolerance=None):
     """
     Smoothes a matrix containing one spectra per row with the Konno-Ohmachi
     smoothing window.
@@ -166,6 +287,15 @@ def konnoOhmachiSmoothing(spectra, frequencies, bandwidth=40, count=1,
         The Konno-Ohmachi smoothing window is normalized on a logarithmic
         scale. Set this parameter to True to normalize it on a normal scale.
         Default to False.
+    :param tolerance: float, optional
+        If given, a sparse smoothing matrix only containing the window values
+        that might be larger than tolerance is used, see
+        :func:`calculateSparseSmoothingMatrix`. If the sparse matrix would
+        need more than max_memory_usage or enforce_no_matrix is True, the
+        windows are calculated in chunks of center frequencies without
+        storing the matrix. The cost scales with the number of significant
+        window values, which is smallest for logarithmically spaced
+        frequencies. Defaults to None.
     """
     if (frequencies.dtype != np.float32 and frequencies.dtype != np.float64) \
        or (spectra.dtype != np.float32 and spectra.dtype != np.float64):
@@ -183,6 +313,31 @@ def konnoOhmachiSmoothing(spectra, frequencies, bandwidth=40, count=1,
         size = 4.0
     elif frequencies.dtype == np.float64:
         size = 8.0
+    # Only use the significant window values if a truncation tolerance is
+    # given.
+    if tolerance is not None:
+        if np.any(np.diff(frequencies) < 0):
+            msg = 'frequencies need to be sorted in ascending order.'
+            raise ValueError(msg)
+        # Approximate memory usage of the sparse smoothing matrix.
+        approx_mem_usage = _bandCounts(frequencies, bandwidth,
+                                       tolerance).sum() * (size + 8) / \
+            1048576.0
+        if enforce_no_matrix is False and \
+           approx_mem_usage < max_memory_usage:
+            smoothing_matrix = calculateSparseSmoothingMatrix(frequencies,
+                bandwidth, normalize=normalize, tolerance=tolerance)
+            new_spec = smoothing_matrix.dot(spectra.T).T
+            # Eventually apply more than once.
+            for _i in xrange(count - 1):
+                new_spec = smoothing_matrix.dot(new_spec.T).T
+        # Otherwise calculate the windows in chunks of center frequencies.
+        else:
+            new_spec = spectra
+            for _i in xrange(count):
+                new_spec = _bandedSmoothing(new_spec, frequencies, bandwidth,
+                    normalize, tolerance, max_memory_usage)
+        return new_spec
     # Calculate the approximate usage needs for the smoothing matrix algorithm.
     length = len(frequencies)
     approx_mem_usage = (length * length + 2 * len(spectra) + length) * \
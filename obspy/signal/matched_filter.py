@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+"""
+Matched filter detection of events similar to a set of template events in
+continuous waveform data.
+
+Templates are correlated against the continuous data with a normalized cross
+correlation computed block-wise in the frequency domain (with a sliding
+normalization of the data windows), the single channel correlation functions
+are stacked taking into account the moveouts between the channels of a
+template and detections are declared where the stack exceeds a threshold
+given in multiples of its median absolute deviation (MAD).
+
+:copyright:
+    The ObsPy Development Team (devs@obspy.org)
+:license:
+    GNU Lesser General Public License, Version 3
+    (http://www.gnu.org/copyleft/lesser.html)
+"""
+
+import warnings
+import multiprocessing
+import numpy as np
+from obspy.signal.util import nextpow2
+
+
+def normxcorrFFT(template, data, nfft=None):
+    """
+    Normalized cross correlation of one or more templates with a longer data
+    array.
+
+    The correlation is computed in blocks of length ``nfft`` in the frequency
+    domain (overlap-save) and every correlation value is normalized by the
+    standard deviation of the data window it was computed on (sliding
+    normalization). The result therefore is the correlation coefficient of
+    the template with the data window starting at each sample.
+
+    :type template: :class:`~numpy.ndarray`
+    :param template: Template data. Either a 1-D array or a 2-D array with
+        one template per row. Templates in a 2-D array have to be of the same
+        length.
+    :type data: :class:`~numpy.ndarray`
+    :param data: Continuous data to correlate the template(s) with.
+    :type nfft: int
+    :param nfft: FFT block length to use (will be rounded up to the next
+        power of two). Defaults to a reasonable length depending on template
+        length and data length.
+    :rtype: :class:`~numpy.ndarray`
+    :return: Correlation coefficient for all lags ``0`` to
+        ``len(data) - len(template)``. 2-D with one row per template if a
+        2-D array of templates was specified.
+
+    .. rubric:: Example
+
+    >>> data = np.random.randn(10000)
+    >>> template = data[5000:5200]
+    >>> cc = normxcorrFFT(template, data)
+    >>> len(cc)
+    9801
+    >>> cc.argmax()
+    5000
+    >>> round(cc.max(), 6)
+    1.0
+    """
+    template = np.require(template, 'float64')
+    ndim = template.ndim
+    template = np.atleast_2d(template)
+    template = template - template.mean(axis=1)[:, np.newaxis]
+    norm = np.sqrt((template ** 2).sum(axis=1))
+    norm[norm == 0] = 1.0
+    template = template / norm[:, np.newaxis]
+    data = np.require(data, 'float64')
+    length = template.shape[1]
+    if length > len(data):
+        msg = "Template longer than data."
+        raise ValueError(msg)
+    nfft = _getNFFT(length, len(data), nfft)
+    spec = _templateSpectra(template, nfft)
+    lengths = np.array([length] * len(template))
+    cc = _slidingNormXcorr(data, spec, lengths, nfft)
+    cc = cc[:, :len(data) - length + 1]
+    if ndim == 1:
+        return cc[0]
+    return cc
+
+
+def matchedFilter(stream, templates, threshold=8.0, threshold_type="MAD",
+                  trig_int=None, template_names=None, nfft=None,
+                  templates_per_task=50, processes=1):
+    """
+    Scan continuous (multi-station) data for events similar to template
+    events.
+
+    The routine works in the following steps:
+      * normalize all template channels (zero mean, unit energy) and
+        precompute their spectra
+      * for every channel of the continuous data compute the normalized cross
+        correlation with all templates containing that channel (block-wise in
+        frequency domain, spectra of data blocks are shared by all templates)
+      * stack the single channel correlation functions of each template,
+        aligned by the relative start times (moveouts) of the template
+        channels
+      * declare a detection at the maximum of every interval where the stack
+        exceeds the threshold
+
+    Templates are processed in groups of ``templates_per_task`` templates
+    which bounds memory usage. Groups can be distributed over several worker
+    processes.
+
+    .. note::
+        The continuous data should be gap free (e.g. merged with
+        ``method=1, fill_value=0``), one trace per trace ID, preprocessed
+        (e.g. filtered) the same way as the template events and all at the
+        same sampling rate. Channels of the template events are cut from the
+        waveforms of the event, i.e. different start times of the channels of
+        one template (e.g. to cut around P arrival at each station) are used
+        as moveouts in the stack.
+
+    :type stream: :class:`~obspy.core.stream.Stream`
+    :param stream: Continuous data to scan.
+    :type templates: list of :class:`~obspy.core.stream.Stream`
+    :param templates: Template events. Every trace ID in a template should
+        also be present in ``stream`` with at least as many samples as the
+        template trace, otherwise the channel is skipped for that template.
+    :type threshold: float
+    :param threshold: Detection threshold for the stacked correlation
+        function. Either in multiples of the median absolute deviation of the
+        stack or absolute value of the stacked (mean) correlation coefficient,
+        depending on ``threshold_type``.
+    :type threshold_type: str
+    :param threshold_type: ``"MAD"`` or ``"absolute"``.
+    :type trig_int: float
+    :param trig_int: Minimum time in seconds between two detections of the
+        same template. Defaults to the length of the template.
+    :type template_names: list of str
+    :param template_names: Names for the templates, used in the detection
+        dictionaries. Defaults to the index of the template in ``templates``.
+    :type nfft: int
+    :param nfft: FFT block length, see
+        :func:`~obspy.signal.matched_filter.normxcorrFFT`.
+    :type templates_per_task: int
+    :param templates_per_task: Number of templates processed at once (in one
+        worker process).
+    :type processes: int
+    :param processes: Number of worker processes. ``None`` uses all
+        available CPUs, ``1`` (default) processes all templates in the
+        current process.
+    :rtype: list of dict
+    :returns: List of detections sorted chronologically. Each detection is a
+        dictionary with keys ``'time'`` (start time of the detected event
+        corresponding to the earliest start time in the template),
+        ``'template'``, ``'cross_correlation'`` (stacked correlation value),
+        ``'threshold'`` (absolute threshold used) and ``'trace_ids'`` (IDs
+        of the channels stacked for this template).
+
+    .. rubric:: Example
+
+    >>> from obspy import read, UTCDateTime
+    >>> st = read()
+    >>> st.filter("bandpass", freqmin=1, freqmax=10)
+    >>> t = UTCDateTime(2009, 8, 24, 0, 20, 7, 700000)
+    >>> templ = st.copy()
+    >>> templ.trim(t, t + 3)
+    >>> detections = matchedFilter(st, [templ], threshold=0.9,
+    ...                            threshold_type="absolute")
+    >>> len(detections)
+    1
+    >>> print detections[0]['time']
+    2009-08-24T00:20:07.700000Z
+    >>> round(detections[0]['cross_correlation'], 6)
+    1.0
+    """
+    if threshold_type not in ("MAD", "absolute"):
+        msg = "threshold_type has to be 'MAD' or 'absolute'."
+        raise ValueError(msg)
+    if template_names is None:
+        template_names = range(len(templates))
+    if len(template_names) != len(templates):
+        msg = "Number of template names does not match number of templates."
+        raise ValueError(msg)
+    # continuous data as dictionary of trace id -> trace
+    channels = {}
+    for tr in stream:
+        if tr.id in channels:
+            msg = "Found more than one trace for trace ID %s. " + \
+                  "Merge the stream before matched filter detection."
+            raise ValueError(msg % tr.id)
+        channels[tr.id] = tr
+    if not channels:
+        return []
+    sampling_rates = set([tr.stats.sampling_rate for tr in stream])
+    if len(sampling_rates) > 1:
+        msg = "All traces have to have the same sampling rate."
+        raise ValueError(msg)
+    df = sampling_rates.pop()
+    # all channels are referenced to the earliest start time in the stream
+    reference = min([tr.stats.starttime for tr in stream])
+    data = {}
+    for id_, tr in channels.iteritems():
+        offset = int(round((tr.stats.starttime - reference) * df))
+        data[id_] = (offset, np.require(tr.data, 'float64'))
+    npts = max([off + len(d) for off, d in data.itervalues()])
+
+    # prepare all templates: normalized channel data and moveouts
+    prepared = []
+    for name, st_tmpl in zip(template_names, templates):
+        template = _prepareTemplate(st_tmpl, channels, df)
+        if template is None:
+            msg = "Skipping template %s (no channels usable)." % name
+            warnings.warn(msg)
+            continue
+        prepared.append((name, template))
+    if not prepared:
+        return []
+    tasks = [(prepared[i:i + templates_per_task], threshold, threshold_type,
+              trig_int, nfft) for i in xrange(0, len(prepared),
+                                              templates_per_task)]
+    _initWorker(data, npts, df)
+    if processes == 1 or len(tasks) == 1:
+        results = map(_detectTask, tasks)
+    else:
+        # data is handed to the worker processes once on initialization, not
+        # with every task
+        pool = multiprocessing.Pool(processes, initializer=_initWorker,
+                                    initargs=(data, npts, df))
+        try:
+            results = pool.map(_detectTask, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    _initWorker(None, None, None)
+    detections = []
+    for result in results:
+        for det in result:
+            det['time'] = reference + det['time']
+            detections.append(det)
+    detections.sort(key=lambda det: (det['time'], str(det['template'])))
+    return detections
+
+
+def _prepareTemplate(st_tmpl, channels, df):
+    """
+    Normalize all usable channels of a template and determine their moveouts
+    (in samples, relative to the earliest channel of the template).
+    """
+    usable = []
+    for tr in st_tmpl:
+        if tr.id not in channels:
+            msg = "Skipping trace %s in template correlation " + \
+                  "(not present in stream to check)."
+            warnings.warn(msg % tr.id)
+            continue
+        if tr.stats.sampling_rate != df:
+            msg = "Sampling rate of template trace %s does not match."
+            raise ValueError(msg % tr.id)
+        if len(tr.data) > len(channels[tr.id].data):
+            msg = "Skipping trace %s in template correlation " + \
+                  "(longer than the data to check)."
+            warnings.warn(msg % tr.id)
+            continue
+        data = np.require(tr.data, 'float64')
+        data = data - data.mean()
+        norm = np.sqrt((data ** 2).sum())
+        if norm == 0:
+            msg = "Skipping trace %s in template correlation (no signal)."
+            warnings.warn(msg % tr.id)
+            continue
+        usable.append((tr.id, tr.stats.starttime, data / norm))
+    if not usable:
+        return None
+    start = min([starttime for _, starttime, _ in usable])
+    template = []
+    for id_, starttime, data in usable:
+        moveout = int(round((starttime - start) * df))
+        template.append((id_, moveout, data))
+    return template
+
+
+# data shared by all tasks of one matchedFilter() call (in worker processes
+# set once by the pool initializer)
+_WORKER_DATA = {}
+
+
+def _initWorker(data, npts, df):
+    _WORKER_DATA['data'] = data
+    _WORKER_DATA['npts'] = npts
+    _WORKER_DATA['df'] = df
+
+
+def _detectTask(args):
+    """
+    Compute stacked correlation functions and detections for a group of
+    templates. Detection times are returned in seconds relative to the
+    reference time of the continuous data.
+    """
+    templates, threshold, threshold_type, trig_int, nfft = args
+    data = _WORKER_DATA['data']
+    npts = _WORKER_DATA['npts']
+    df = _WORKER_DATA['df']
+    ntempl = len(templates)
+    stack = np.zeros((ntempl, npts), dtype='float64')
+    lengths = np.zeros(ntempl, dtype='int')
+    # trace ids of the channels actually stacked for each template
+    used = [set() for _i in xrange(ntempl)]
+    # collect template channels per data channel so that the spectra of the
+    # data blocks are shared by all templates
+    per_channel = {}
+    for i, (_, template) in enumerate(templates):
+        for id_, moveout, tmpl_data in template:
+            per_channel.setdefault(id_, []).append((i, moveout, tmpl_data))
+            lengths[i] = max(lengths[i], moveout + len(tmpl_data))
+    for id_, entries in per_channel.iteritems():
+        offset, chan_data = data[id_]
+        entries = [entry for entry in entries
+                   if len(entry[2]) <= len(chan_data)]
+        if not entries:
+            continue
+        tmpl_lengths = np.array([len(d) for _, _, d in entries])
+        padded = np.zeros((len(entries), tmpl_lengths.max()), dtype='float64')
+        for j, (_, _, tmpl_data) in enumerate(entries):
+            padded[j, :len(tmpl_data)] = tmpl_data
+        nfft_ = _getNFFT(tmpl_lengths.max(), len(chan_data), nfft)
+        spec = _templateSpectra(padded, nfft_)
+        cc = _slidingNormXcorr(chan_data, spec, tmpl_lengths, nfft_)
+        for j, (i, moveout, _) in enumerate(entries):
+            # correlation at lag k of this channel corresponds to a template
+            # start (reference) time of offset + k - moveout in the stack
+            shift = offset - moveout
+            start = max(shift, 0)
+            end = min(shift + len(chan_data), npts)
+            if end <= start:
+                continue
+            stack[i, start:end] += cc[j, start - shift:end - shift]
+            used[i].add(id_)
+    detections = []
+    for i, (name, template) in enumerate(templates):
+        if not used[i]:
+            continue
+        stack[i] /= len(used[i])
+        stack_ = stack[i]
+        if threshold_type == "MAD":
+            thr = threshold * np.median(np.abs(stack_ - np.median(stack_)))
+        else:
+            thr = threshold
+        if trig_int is None:
+            min_dist = lengths[i]
+        else:
+            min_dist = int(round(trig_int * df))
+        ind = np.where(stack_ > thr)[0]
+        if not len(ind):
+            continue
+        # split indices above threshold at gaps larger than minimum distance
+        # between detections, take maximum of each interval
+        splits = np.where(np.diff(ind) > min_dist)[0] + 1
+        trace_ids = [id_ for id_, _, _ in template if id_ in used[i]]
+        for ind_ in np.split(ind, splits):
+            peak = ind_[stack_[ind_].argmax()]
+            det = {}
+            det['time'] = peak / df
+            det['template'] = name
+            det['cross_correlation'] = float(stack_[peak])
+            det['threshold'] = float(thr)
+            det['trace_ids'] = trace_ids
+            detections.append(det)
+    return detections
+
+
+def _getNFFT(length, npts, nfft=None):
+    """
+    FFT block length for correlating templates of given length with data
+    of given number of samples.
+    """
+    if nfft is None:
+        nfft = max(8 * length, 2 ** 15)
+    nfft = nextpow2(max(nfft, length + 1))
+    # no need to use blocks longer than the data itself
+    return min(nfft, nextpow2(max(npts, length + 1)))
+
+
+def _templateSpectra(templates, nfft):
+    """
+    Complex conjugate spectra of (normalized) templates, one per row.
+    """
+    return np.fft.rfft(templates, nfft, axis=1).conj()
+
+
+def _slidingNormXcorr(data, spec, lengths, nfft):
+    """
+    Block-wise normalized cross correlation of data with templates given by
+    their conjugate spectra and lengths.
+
+    Returns a 2-D array with one row per template. Values for lags where the
+    template would exceed the data are zero.
+    """
+    npts = len(data)
+    ntempl = len(spec)
+    cc = np.zeros((ntempl, npts), dtype='float64')
+    # number of valid lags per block (overlap-save)
+    step = nfft - lengths.max() + 1
+    unique_lengths = np.unique(lengths)
+    for start in xrange(0, npts - lengths.min() + 1, step):
+        block = data[start:start + nfft]
+        # demeaning does not change the correlation with zero mean templates
+        # but improves numerical precision of the sliding normalization
+        block = block - block.mean()
+        corr = np.fft.irfft(np.fft.rfft(block, nfft) * spec, nfft, axis=1)
+        cumsum1 = np.concatenate(([0.0], np.cumsum(block)))
+        cumsum2 = np.concatenate(([0.0], np.cumsum(block ** 2)))
+        # variances below the precision of the cumulative sums are treated
+        # as windows without signal (e.g. zero-filled gaps)
+        tolerance = 100 * np.finfo('float64').eps * cumsum2[-1]
+        for length in unique_lengths:
+            nvalid = min(step, len(block) - length + 1)
+            if nvalid <= 0:
+                continue
+            sum1 = cumsum1[length:length + nvalid] - cumsum1[:nvalid]
+            sum2 = cumsum2[length:length + nvalid] - cumsum2[:nvalid]
+            var = sum2 - sum1 ** 2 / length
+            valid = var > tolerance
+            norm = np.zeros(nvalid, dtype='float64')
+            norm[valid] = 1.0 / np.sqrt(var[valid])
+            rows = np.where(lengths == length)[0]
+            cc[rows, start:start + nvalid] = corr[rows, :nvalid] * norm
+    return cc
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(exclude_empty=True)
@@ -18,6 +18,7 @@ Polarization Analysis
 
 from scipy import signal
 import numpy as np
+import util
 
 
 def eigval(datax, datay, dataz, fk, normf=1):
@@ -51,66 +52,116 @@ def eigval(datax, datay, dataz, fk, normf=1):
         eigenvalue, Rectilinearity, Planarity, Time derivative of eigenvalues,
         time derivative of rectilinearity, Time derivative of planarity.
     """
-    covmat = np.zeros([3, 3])
-    leigenv1 = np.zeros(datax.shape[0], dtype='float64')
-    leigenv2 = np.zeros(datax.shape[0], dtype='float64')
-    leigenv3 = np.zeros(datax.shape[0], dtype='float64')
-    dleigenv = np.zeros([datax.shape[0], 3], dtype='float64')
-    rect = np.zeros(datax.shape[0], dtype='float64')
-    plan = np.zeros(datax.shape[0], dtype='float64')
-    i = 0
-    for i in xrange(datax.shape[0]):
-        covmat[0][0] = np.cov(datax[i, :], rowvar=False)
-        covmat[0][1] = covmat[1][0] = np.cov(datax[i, :], datay[i, :],
-                                             rowvar=False)[0, 1]
-        covmat[0][2] = covmat[2][0] = np.cov(datax[i, :], dataz[i, :],
-                                             rowvar=False)[0, 1]
-        covmat[1][1] = np.cov(datay[i, :], rowvar=False)
-        covmat[1][2] = covmat[2][1] = np.cov(dataz[i, :], datay[i, :],
-                                             rowvar=False)[0, 1]
-        covmat[2][2] = np.cov(dataz[i, :], rowvar=False)
-        _eigvec, eigenval, _v = (np.linalg.svd(covmat))
-        eigenv = np.sort(eigenval)
-        leigenv1[i] = eigenv[0]
-        leigenv2[i] = eigenv[1]
-        leigenv3[i] = eigenv[2]
-        rect[i] = 1 - ((eigenv[1] + eigenv[0]) / (2 * eigenv[2]))
-        plan[i] = 1 - ((2 * eigenv[0]) / (eigenv[1] + eigenv[2]))
-    leigenv1 = leigenv1 / normf
-    leigenv2 = leigenv2 / normf
-    leigenv3 = leigenv3 / normf
-
-    leigenv1_add = np.append(np.append([leigenv1[0]] * (np.size(fk) // 2),
-           leigenv1), [leigenv1[np.size(leigenv1) - 1]] * (np.size(fk) // 2))
-    dleigenv1 = signal.lfilter(fk, 1, leigenv1_add)
-    dleigenv[:, 0] = dleigenv1[len(fk) - 1:]
-    #dleigenv1 = dleigenv1[np.size(fk) // 2:(np.size(dleigenv1) - np.size(fk) /
-    #        2)]
-
-    leigenv2_add = np.append(np.append([leigenv2[0]] * (np.size(fk) // 2),
-           leigenv2), [leigenv2[np.size(leigenv2) - 1]] * (np.size(fk) // 2))
-    dleigenv2 = signal.lfilter(fk, 1, leigenv2_add)
-    dleigenv[:, 1] = dleigenv2[len(fk) - 1:]
-    #dleigenv2 = dleigenv2[np.size(fk) // 2:(np.size(dleigenv2) - np.size(fk) /
-    #        2)]
-
-    leigenv3_add = np.append(np.append([leigenv3[0]] * (np.size(fk) // 2),
-           leigenv3), [leigenv3[np.size(leigenv3) - 1]] * (np.size(fk) // 2))
-    dleigenv3 = signal.lfilter(fk, 1, leigenv3_add)
-    dleigenv[:, 2] = dleigenv3[len(fk) - 1:]
-    #dleigenv3 = dleigenv3[np.size(fk) // 2:(np.size(dleigenv3) - np.size(fk) /
-    #        2)]
-
-    rect_add = np.append(np.append([rect[0]] * (np.size(fk) // 2),
-           rect), [rect[np.size(rect) - 1]] * (np.size(fk) // 2))
-    drect = signal.lfilter(fk, 1, rect_add)
-    drect = drect[len(fk) - 1:]
-    #drect = drect[np.size(fk) // 2:(np.size(drect3) - np.size(fk) // 2)]
-
-    plan_add = np.append(np.append([plan[0]] * (np.size(fk) // 2),
-           plan), [plan[np.size(plan) - 1]] * (np.size(fk) // 2))
-    dplan = signal.lfilter(fk, 1, plan_add)
-    dplan = dplan[len(fk) - 1:]
-    #dplan = dplan[np.size(fk) // 2:(np.size(dplan) - np.size(fk) // 2)]
+    # covariance matrices of all windows at once, shape (windows, 3, 3)
+    data = np.array([datax, datay, dataz], dtype='float64')
+    data = data.transpose(1, 0, 2)
+    data -= data.mean(axis=2)[:, :, np.newaxis]
+    covmat = np.einsum('wij,wkj->wik', data, data) / (data.shape[2] - 1)
+    # eigenvalues of the symmetric matrices in ascending order
+    eigenv = np.linalg.eigvalsh(covmat)
+    leigenv1 = eigenv[:, 0] / normf
+    leigenv2 = eigenv[:, 1] / normf
+    leigenv3 = eigenv[:, 2] / normf
+    rect = 1 - ((eigenv[:, 1] + eigenv[:, 0]) / (2 * eigenv[:, 2]))
+    plan = 1 - ((2 * eigenv[:, 0]) / (eigenv[:, 1] + eigenv[:, 2]))
+
+    dleigenv = _derivative(np.column_stack((leigenv1, leigenv2, leigenv3)),
+                           fk)
+    drect = _derivative(rect, fk)
+    dplan = _derivative(plan, fk)
 
     return leigenv1, leigenv2, leigenv3, rect, plan, dleigenv, drect, dplan
+
+
+def _derivative(x, fk):
+    """
+    Time derivative along the first axis by central differences.
+
+    The data are padded with the first and last values before filtering.
+
+    :type x: :class:`~numpy.ndarray`
+    :param x: Attribute values, one row per window.
+    :type fk: list
+    :param fk: Coefficients of polynomial used for calculating the time
+        derivatives.
+    :return: Time derivative of the same shape as ``x``.
+    """
+    nadd = np.size(fk) // 2
+    x_add = np.concatenate((np.repeat(x[:1], nadd, axis=0), x,
+                            np.repeat(x[-1:], nadd, axis=0)))
+    dx = signal.lfilter(fk, 1, x_add, axis=0)
+    return dx[len(fk) - 1:]
+
+
+def polarizationAnalysis(stream, win_len, win_frac, normf=1,
+                         components=('E', 'N', 'Z')):
+    """
+    Sliding window polarization analysis of three component data.
+
+    The traces are split into overlapping windows which are Hamming tapered
+    and demeaned (see :func:`~obspy.signal.util.enframe`), the polarization
+    attributes of all windows are computed at once by :func:`eigval`.
+
+    :type stream: :class:`~obspy.core.stream.Stream`
+    :param stream: Three component data, all traces need the same start
+        time, sampling rate and number of samples.
+    :type win_len: float
+    :param win_len: Window length in seconds.
+    :type win_frac: float
+    :param win_frac: Step between windows as fraction of the window length.
+    :param normf: Factor for normalization of the eigenvalues.
+    :type components: tuple of str, optional
+    :param components: Last letters of the channel codes of the x, y and z
+        component.
+    :rtype: :class:`~numpy.ndarray`
+    :return: One row per window with the columns start time of the window
+        (timestamp), smallest, intermediate and largest eigenvalue,
+        rectilinearity and planarity.
+
+    .. rubric:: Example
+
+    >>> from obspy import read
+    >>> st = read()
+    >>> res = polarizationAnalysis(st, 1.0, 0.5)
+    >>> res.shape
+    (59, 6)
+    """
+    if len(stream) != 3:
+        msg = 'Stream needs exactly three traces, got %d' % len(stream)
+        raise ValueError(msg)
+    traces = []
+    for component in components:
+        trs = [tr for tr in stream if tr.stats.channel[-1:] == component]
+        if len(trs) != 1:
+            msg = 'Need exactly one trace of component %s' % component
+            raise ValueError(msg)
+        traces.append(trs[0])
+    stats = traces[0].stats
+    for tr in traces[1:]:
+        if tr.stats.sampling_rate != stats.sampling_rate or \
+                tr.stats.npts != stats.npts or \
+                tr.stats.starttime != stats.starttime:
+            msg = 'Traces need the same start time, sampling rate and ' + \
+                  'number of samples'
+            raise ValueError(msg)
+    nsamp = int(win_len * stats.sampling_rate)
+    nstep = max(int(nsamp * win_frac), 1)
+    if nsamp < 2 or nsamp > stats.npts:
+        msg = 'Window length has to be between two samples and the trace ' + \
+              'length'
+        raise ValueError(msg)
+    win = np.hamming(nsamp)
+    frames = [util.enframe(tr.data, win, nstep)[0] for tr in traces]
+    # time derivatives are not needed
+    pol = eigval(frames[0], frames[1], frames[2], [1], normf)
+    res = np.empty((frames[0].shape[0], 6), dtype='float64')
+    res[:, 0] = stats.starttime.timestamp + \
+        np.arange(frames[0].shape[0]) * nstep * stats.delta
+    for i in xrange(5):
+        res[:, i + 1] = pol[i]
+    return res
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(exclude_empty=True)
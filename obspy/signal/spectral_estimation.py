@@ -22,10 +22,12 @@ import warnings
 import pickle
 import math
 import bisect
+import copy
 import numpy as np
-from obspy import Trace, Stream
+from obspy import Trace, Stream, UTCDateTime
+from obspy.core import Stats
 from obspy.core.util import getMatplotlibVersion
-from obspy.signal import cosTaper
+from obspy.signal import cosTaper, pazToFreqResp
 from obspy.signal.util import prevpow2
 
 
@@ -270,6 +272,14 @@ class PPSD():
     >>> import pickle
     >>> ppsd = pickle.load("myfile.pkl")  # doctest: +SKIP
 
+    Alternatively only the binned spectra of all segments can be saved in a
+    compact numpy file. PPSDs of the same channel stored this way, e.g. for
+    different months, can be merged.
+
+    >>> ppsd.save_npz("myfile.npz")  # doctest: +SKIP
+    >>> ppsd = PPSD.load_npz("myfile.npz", paz=paz)  # doctest: +SKIP
+    >>> ppsd = ppsd + PPSD.load_npz("otherfile.npz")  # doctest: +SKIP
+
     For a real world example see the `ObsPy Tutorial`_.
 
     .. note::
@@ -281,7 +291,8 @@ class PPSD():
     .. _`ObsPy Tutorial`: http://docs.obspy.org/tutorial/
     """
     def __init__(self, stats, paz=None, parser=None, skip_on_gaps=False,
-                 is_rotational_data=False, db_bins=[-200, -50, 0.5]):
+                 is_rotational_data=False, db_bins=[-200, -50, 0.5],
+                 response_in_frequency_domain=False):
         """
         Initialize the PPSD object setting all fixed information on the station
         that should not change afterwards to guarantee consistent spectral
@@ -329,6 +340,16 @@ class PPSD():
         :param db_bins: Specify the lower and upper boundary and the width of
                 the db bins. The bin width might get adjusted to fit  a number
                 of equally spaced bins in between the given boundaries.
+        :type response_in_frequency_domain: Boolean (optional)
+        :param response_in_frequency_domain: If set to True the instrument
+                response is removed from the power spectra (like done by
+                [McNamara2004]_) instead of being deconvolved from the time
+                series, and differentiation to acceleration is done in the
+                frequency domain. The response at the PSD frequencies is
+                computed only once per response epoch, which makes processing
+                considerably faster. As the spectra are corrected after
+                windowing, results differ where spectral leakage dominates,
+                usually at the shortest and longest periods.
         """
         # check if matplotlib is available, no official dependency for
         # obspy.signal
@@ -348,6 +369,9 @@ class PPSD():
         self.sampling_rate = stats.sampling_rate
         self.delta = 1.0 / self.sampling_rate
         self.is_rotational_data = is_rotational_data
+        self.response_in_frequency_domain = response_in_frequency_domain
+        # power responses at the PSD frequencies for all response epochs
+        self.__response_cache = {}
         # trace length for one hour piece
         self.len = int(self.sampling_rate * PPSD_LENGTH)
         # set paz either from kwarg or try to get it from stats
@@ -373,6 +397,8 @@ class PPSD():
         self.times = self.times_used
         self.times_data = []
         self.times_gaps = []
+        # binned spectra of all segments in the order of self.times_used
+        self.binned_psds = []
         self.hist_stack = None
         self.__setup_bins()
         # set up the binning for the db scale
@@ -381,6 +407,33 @@ class PPSD():
                                      endpoint=True)
         self.colormap = LinearSegmentedColormap('mcnamara', CDICT, 1024)
 
+    def __setstate__(self, state):
+        """
+        Restores a pickled PPSD, filling in attributes missing in PPSDs that
+        were pickled by older versions.
+        """
+        self.__dict__.update(state)
+        if not hasattr(self, 'binned_psds'):
+            # spectra of the single segments were not kept, placeholders keep
+            # the list aligned with self.times_used
+            self.binned_psds = [None] * len(self.times_used)
+        if not hasattr(self, 'response_in_frequency_domain'):
+            self.response_in_frequency_domain = False
+        if not hasattr(self, '_PPSD__response_cache'):
+            self.__response_cache = {}
+        if not hasattr(self, '_PPSD__octave_matrix'):
+            self.__setup_octave_matrix()
+
+    def __check_binned_psds(self):
+        """
+        Raises if the spectra of some segments are not available (PPSD
+        pickled by an older version).
+        """
+        if any([spec is None for spec in self.binned_psds]):
+            msg = "PPSD %s does not contain the binned spectra of all " + \
+                  "segments (pickled by an older version)."
+            raise ValueError(msg % self.id)
+
     def __setup_bins(self):
         """
         Makes an initial dummy psd and thus sets up the bins and all the rest.
@@ -419,12 +472,25 @@ class PPSD():
         self.per_octaves_left = np.array(per_octaves_left)
         self.per_octaves_right = np.array(per_octaves_right)
         self.per_octaves = np.array(per_octaves)
+        self.__setup_octave_matrix()
 
         self.period_bins = per_octaves
         # mid-points of all the period bins
         self.period_bin_centers = np.mean((self.period_bins[:-1],
                                            self.period_bins[1:]), axis=0)
 
+    def __setup_octave_matrix(self):
+        """
+        Sets up the matrix selecting the periods of every octave band,
+        averaging the spectrum over all bands is a matrix product then.
+        """
+        per = self.per
+        self.__octave_matrix = \
+            (self.per_octaves_left[:, np.newaxis] <= per) & \
+            (per <= self.per_octaves_right[:, np.newaxis])
+        self.__octave_matrix = self.__octave_matrix.astype(np.float64)
+        self.__octave_counts = self.__octave_matrix.sum(axis=1)
+
     def __sanity_check(self, trace):
         """
         Checks if trace is compatible for use in the current PPSD instance.
@@ -438,14 +504,18 @@ class PPSD():
             return False
         return True
 
-    def __insert_used_time(self, utcdatetime):
+    def __insert_used_time(self, utcdatetime, spec_octaves):
         """
-        Inserts the given UTCDateTime at the right position in the list keeping
-        the order intact.
+        Inserts the given UTCDateTime and the binned spectrum of the segment
+        starting at that time at the right position in the lists keeping the
+        order intact.
 
         :type utcdatetime: :class:`~obspy.core.utcdatetime.UTCDateTime`
+        :type spec_octaves: :class:`numpy.ndarray`
         """
-        bisect.insort(self.times_used, utcdatetime)
+        index = bisect.bisect_right(self.times_used, utcdatetime)
+        self.times_used.insert(index, utcdatetime)
+        self.binned_psds.insert(index, spec_octaves)
 
     def __insert_gap_times(self, stream):
         """
@@ -466,7 +536,7 @@ class PPSD():
         self.times_data += \
                 [[tr.stats.starttime, tr.stats.endtime] for tr in stream]
 
-    def __check_time_present(self, utcdatetime):
+    def __check_time_present(self, utcdatetime, times=None):
         """
         Checks if the given UTCDateTime is already part of the current PPSD
         instance. That is, checks if from utcdatetime to utcdatetime plus 1
@@ -474,16 +544,19 @@ class PPSD():
         Returns True if adding an one hour piece starting at the given time
         would result in an overlap of the ppsd data base, False if it is OK to
         insert this piece of data.
+        Other sorted segment start times, e.g. of segments not yet inserted,
+        can be checked by passing them as ``times``.
         """
-        index1 = bisect.bisect_left(self.times_used, utcdatetime)
-        index2 = bisect.bisect_right(self.times_used,
-                                     utcdatetime + PPSD_LENGTH)
+        if times is None:
+            times = self.times_used
+        index1 = bisect.bisect_left(times, utcdatetime)
+        index2 = bisect.bisect_right(times, utcdatetime + PPSD_LENGTH)
         if index1 != index2:
             return True
         else:
             return False
 
-    def add(self, stream, verbose=False):
+    def add(self, stream, verbose=False, processes=1):
         """
         Process all traces with compatible information and add their spectral
         estimates to the histogram containg the probabilistic psd.
@@ -493,6 +566,11 @@ class PPSD():
                 :class:`~obspy.core.trace.Trace`
         :param stream: Stream or trace with data that should be added to the
                 probabilistic psd histogram.
+        :type processes: int (optional)
+        :param processes: Number of worker processes the one hour segments
+                are distributed over. The binned spectra of all segments are
+                added to the histogram in the calling process, results are
+                identical to serial processing.
         :returns: True if appropriate data were found and the ppsd statistics
                 were changed, False otherwise.
         """
@@ -510,6 +588,10 @@ class PPSD():
         # merge depending on skip_on_gaps set during __init__
         stream.merge(self.merge_method, fill_value=0)
 
+        # collect all one hour segments that are not yet covered, neither by
+        # the PPSD nor by segments collected before
+        segments = []
+        pending = []
         for tr in stream:
             # the following check should not be necessary due to the select()..
             if not self.__sanity_check(tr):
@@ -519,7 +601,8 @@ class PPSD():
             t1 = tr.stats.starttime
             t2 = tr.stats.endtime
             while t1 + PPSD_LENGTH <= t2:
-                if self.__check_time_present(t1):
+                if self.__check_time_present(t1) or \
+                        self.__check_time_present(t1, pending):
                     msg = "Already covered time spans detected (e.g. %s), " + \
                           "skipping these slices."
                     msg = msg % t1
@@ -528,30 +611,49 @@ class PPSD():
                     # throw warnings if trace length is different
                     # than one hour..!?!
                     slice = tr.slice(t1, t1 + PPSD_LENGTH)
-                    # XXX not good, should be working in place somehow
-                    # XXX how to do it with the padding, though?
-                    success = self.__process(slice)
-                    if success:
-                        self.__insert_used_time(t1)
-                        if verbose:
-                            print t1
-                        changed = True
+                    segments.append((t1, slice))
+                    bisect.insort(pending, t1)
                 t1 += PPSD_STRIDE  # advance half an hour
 
             # enforce time limits, pad zeros if gaps
             #tr.trim(t, t+PPSD_LENGTH, pad=True)
+
+        slices = [segment[1] for segment in segments]
+        if processes > 1 and len(segments) > 1:
+            from multiprocessing import Pool
+            pool = Pool(processes, initializer=_initPPSDWorker,
+                        initargs=(self,))
+            try:
+                # pool.map keeps the order of the segments
+                spectra = pool.map(_processPPSDSegment, slices)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            # XXX not good, should be working in place somehow
+            # XXX how to do it with the padding, though?
+            spectra = [self._process(tr) for tr in slices]
+
+        for (t1, _), spec_octaves in zip(segments, spectra):
+            if spec_octaves is None:
+                continue
+            self.__insert_binned_spectrum(spec_octaves)
+            self.__insert_used_time(t1, spec_octaves)
+            if verbose:
+                print t1
+            changed = True
         return changed
 
-    def __process(self, tr):
+    def _process(self, tr):
         """
-        Processes a one-hour segment of data and adds the information to the
-        PPSD histogram. If Trace is compatible (station, channel, ...) has to
-        checked beforehand.
+        Processes a one-hour segment of data and returns its spectrum binned
+        in the period bins of the PPSD. If Trace is compatible (station,
+        channel, ...) has to checked beforehand.
 
         :type tr: :class:`~obspy.core.trace.Trace`
         :param tr: Compatible Trace with data of one PPSD segment
-        :returns: True if segment was successfully added to histogram, False
-                otherwise.
+        :returns: Binned spectrum in dB as :class:`numpy.ndarray` or None if
+                the segment could not be processed.
         """
         # XXX DIRTY HACK!!
         if len(tr) == self.len + 1:
@@ -561,7 +663,7 @@ class PPSD():
             msg = "Got an non-one-hour piece of data to process. Skipping"
             warnings.warn(msg)
             print len(tr), self.len
-            return False
+            return None
         # being paranoid, only necessary if in-place operations would follow
         tr.data = tr.data.astype("float64")
         # if trace has a masked array we fill in zeros
@@ -581,35 +683,41 @@ class PPSD():
                       "Skipping time segment(s)."
                 msg = msg % (e.__class__.__name__, e.message)
                 warnings.warn(msg)
-                return False
+                return None
             paz = self.paz
         if paz is None:
             msg = "Missing poles and zeros information for response " \
                   "removal. Skipping time segment(s)."
             warnings.warn(msg)
-            return False
-        # restitution:
-        # mcnamara apply the correction at the end in freq-domain,
-        # does it make a difference?
-        # probably should be done earlier on bigger chunk of data?!
-        if self.is_rotational_data:
-            # in case of rotational data just remove sensitivity
-            tr.data /= paz['sensitivity']
+            return None
+        if self.response_in_frequency_domain:
+            spec, _freq = psd(tr.data, self.nfft, self.sampling_rate,
+                              detrend=mlab.detrend_linear, window=fft_taper,
+                              noverlap=self.nlap)
+            spec *= self.__get_response_correction(paz)
         else:
-            tr.simulate(paz_remove=paz, remove_sensitivity=True,
-                        paz_simulate=None, simulate_sensitivity=False)
-
-        # go to acceleration, do nothing for rotational data:
-        if self.is_rotational_data:
-            pass
-        else:
-            tr.data = np.gradient(tr.data, self.delta)
-
-        # use our own wrapper for mlab.psd to have consistent results on all
-        # matplotlib versions
-        spec, _freq = psd(tr.data, self.nfft, self.sampling_rate,
-                          detrend=mlab.detrend_linear, window=fft_taper,
-                          noverlap=self.nlap)
+            # restitution:
+            # mcnamara apply the correction at the end in freq-domain,
+            # does it make a difference?
+            # probably should be done earlier on bigger chunk of data?!
+            if self.is_rotational_data:
+                # in case of rotational data just remove sensitivity
+                tr.data /= paz['sensitivity']
+            else:
+                tr.simulate(paz_remove=paz, remove_sensitivity=True,
+                            paz_simulate=None, simulate_sensitivity=False)
+
+            # go to acceleration, do nothing for rotational data:
+            if self.is_rotational_data:
+                pass
+            else:
+                tr.data = np.gradient(tr.data, self.delta)
+
+            # use our own wrapper for mlab.psd to have consistent results on
+            # all matplotlib versions
+            spec, _freq = psd(tr.data, self.nfft, self.sampling_rate,
+                              detrend=mlab.detrend_linear, window=fft_taper,
+                              noverlap=self.nlap)
 
         # leave out first entry (offset)
         spec = spec[1:]
@@ -625,15 +733,53 @@ class PPSD():
         spec = np.log10(spec)
         spec *= 10
 
-        spec_octaves = []
-        # do this for the whole period range and append the values to our lists
-        for per_left, per_right in zip(self.per_octaves_left,
-                                       self.per_octaves_right):
-            specs = spec[(per_left <= self.per) & (self.per <= per_right)]
-            spec_center = specs.mean()
-            spec_octaves.append(spec_center)
-        spec_octaves = np.array(spec_octaves)
+        # mean of the spectrum in all octave bands at once
+        spec_octaves = np.dot(self.__octave_matrix, spec)
+        spec_octaves /= self.__octave_counts
+        return spec_octaves
 
+    def __get_response_correction(self, paz):
+        """
+        Returns the factors that convert the power spectrum of the raw data
+        to the power spectrum of acceleration (or rotation rate for
+        rotational data) in physical units. The factors are cached for every
+        response epoch.
+
+        :type paz: dict
+        :param paz: Poles and zeros of the current response epoch.
+        """
+        if self.is_rotational_data:
+            key = (paz['sensitivity'],)
+        else:
+            key = (tuple(paz['poles']), tuple(paz['zeros']), paz['gain'],
+                   paz['sensitivity'])
+        try:
+            return self.__response_cache[key]
+        except KeyError:
+            pass
+        if self.is_rotational_data:
+            correction = np.empty(self.nfft // 2 + 1)
+            correction.fill(1.0 / paz['sensitivity'] ** 2)
+        else:
+            resp, freq = pazToFreqResp(paz['poles'], paz['zeros'],
+                                       paz['gain'] * paz['sensitivity'],
+                                       self.delta, self.nfft, freq=True)
+            power = (resp * resp.conj()).real
+            # differentiation to acceleration, the offset is left out later
+            with np.errstate(divide='ignore', invalid='ignore'):
+                correction = (2 * np.pi * freq) ** 2 / power
+            correction[0] = 0.0
+        self.__response_cache[key] = correction
+        return correction
+
+    def __insert_binned_spectrum(self, spec_octaves):
+        """
+        Adds the binned spectrum of one segment to the PPSD histogram.
+
+        :type spec_octaves: :class:`numpy.ndarray`
+        :param spec_octaves: Binned spectrum as returned by
+                :meth:`~PPSD._process`.
+        """
         hist, self.xedges, self.yedges = np.histogram2d(self.per_octaves,
                 spec_octaves, bins=(self.period_bins, self.spec_bins))
 
@@ -644,7 +790,6 @@ class PPSD():
         except TypeError:
             # only during first run initialize stack with first histogram
             self.hist_stack = hist
-        return True
 
     def get_percentile(self, percentile=50, hist_cum=None):
         """
@@ -704,6 +849,136 @@ class PPSD():
         with open(filename, "w") as file:
             pickle.dump(self, file)
 
+    def save_npz(self, filename):
+        """
+        Saves the binned spectra of all processed segments together with
+        their start times, the data/gap coverage and the binning in a
+        compressed numpy ``.npz`` file. Unlike pickled PPSDs these files can
+        be merged (see :meth:`~PPSD.merge`) and loaded with
+        :meth:`~PPSD.load_npz`.
+
+        :type filename: str
+        :param filename: Name of output file.
+        """
+        self.__check_binned_psds()
+        num_bins = len(self.per_octaves)
+        np.savez_compressed(filename,
+            id=self.id, sampling_rate=self.sampling_rate,
+            nfft=self.nfft, nlap=self.nlap,
+            is_rotational_data=self.is_rotational_data,
+            response_in_frequency_domain=self.response_in_frequency_domain,
+            merge_method=self.merge_method,
+            spec_bins=self.spec_bins, per_octaves=self.per_octaves,
+            times_used=np.array([t.timestamp for t in self.times_used],
+                                dtype=np.float64),
+            binned_psds=np.array(self.binned_psds,
+                                 dtype=np.float64).reshape(-1, num_bins),
+            times_data=np.array([[t1.timestamp, t2.timestamp]
+                                 for t1, t2 in self.times_data],
+                                dtype=np.float64).reshape(-1, 2),
+            times_gaps=np.array([[t1.timestamp, t2.timestamp]
+                                 for t1, t2 in self.times_gaps],
+                                dtype=np.float64).reshape(-1, 2))
+
+    @staticmethod
+    def load_npz(filename, paz=None, parser=None):
+        """
+        Loads a PPSD saved with :meth:`~PPSD.save_npz`.
+
+        Response information is not stored in the file, provide ``paz`` or
+        ``parser`` to add more data to the loaded PPSD.
+
+        :type filename: str
+        :param filename: Name of ``.npz`` file.
+        :type paz: dict (optional)
+        :param paz: Response information of instrument, see :class:`PPSD`.
+        :type parser: :class:`obspy.xseed.parser.Parser` (optional)
+        :param parser: Parser instance with response information.
+        :rtype: :class:`PPSD`
+        """
+        data = np.load(filename)
+        # files written before the key existed
+        if 'response_in_frequency_domain' in data.files:
+            response_in_frequency_domain = bool(
+                data['response_in_frequency_domain'])
+        else:
+            response_in_frequency_domain = False
+        network, station, location, channel = str(data['id']).split(".")
+        stats = Stats({'network': network, 'station': station,
+                       'location': location, 'channel': channel,
+                       'sampling_rate': float(data['sampling_rate'])})
+        ppsd = PPSD(stats, paz=paz, parser=parser,
+                    skip_on_gaps=int(data['merge_method']) == -1,
+                    is_rotational_data=bool(data['is_rotational_data']),
+                    response_in_frequency_domain=response_in_frequency_domain)
+        ppsd.spec_bins = data['spec_bins']
+        if ppsd.nfft != int(data['nfft']) or \
+           ppsd.nlap != int(data['nlap']) or \
+           not np.array_equal(ppsd.per_octaves, data['per_octaves']):
+            msg = "Spectral binning in file %s does not match the binning " \
+                  "of the current version." % filename
+            raise ValueError(msg)
+        ppsd.times_data = [[UTCDateTime(t1), UTCDateTime(t2)]
+                           for t1, t2 in data['times_data']]
+        ppsd.times_gaps = [[UTCDateTime(t1), UTCDateTime(t2)]
+                           for t1, t2 in data['times_gaps']]
+        for t, spec_octaves in zip(data['times_used'], data['binned_psds']):
+            ppsd.__insert_binned_spectrum(spec_octaves)
+            ppsd.__insert_used_time(UTCDateTime(t), spec_octaves)
+        return ppsd
+
+    def merge(self, other):
+        """
+        Adds the segments of another PPSD of the same channel to this PPSD.
+
+        Segments overlapping with a segment of this PPSD by more than the
+        regular overlap of consecutive segments are skipped, so PPSDs of
+        adjacent time spans can be merged in any order. Data and gap coverage
+        are combined.
+
+        :type other: :class:`PPSD`
+        :param other: PPSD to merge into this one. Both PPSDs need to have
+                the same ID, sampling rate, FFT parameters and binning.
+        :returns: True if the ppsd statistics were changed, False otherwise.
+        """
+        for attribute in ("id", "sampling_rate", "nfft", "nlap",
+                          "is_rotational_data",
+                          "response_in_frequency_domain"):
+            if getattr(self, attribute) != getattr(other, attribute):
+                msg = "Can not merge PPSDs with different %s." % attribute
+                raise ValueError(msg)
+        for attribute in ("spec_bins", "period_bins"):
+            if not np.array_equal(getattr(self, attribute),
+                                  getattr(other, attribute)):
+                msg = "Can not merge PPSDs with different %s." % attribute
+                raise ValueError(msg)
+        other.__check_binned_psds()
+        changed = False
+        for t, spec_octaves in zip(other.times_used, other.binned_psds):
+            index1 = bisect.bisect_right(self.times_used, t - PPSD_STRIDE)
+            index2 = bisect.bisect_left(self.times_used, t + PPSD_STRIDE)
+            if index1 != index2:
+                msg = "Already covered time spans detected (e.g. %s), " + \
+                      "skipping these slices."
+                msg = msg % t
+                warnings.warn(msg)
+                continue
+            self.__insert_binned_spectrum(spec_octaves)
+            self.__insert_used_time(t, spec_octaves)
+            changed = True
+        self.times_data += other.times_data
+        self.times_gaps += other.times_gaps
+        return changed
+
+    def __add__(self, other):
+        """
+        Returns a new PPSD combining the segments of both PPSDs, see
+        :meth:`~PPSD.merge`.
+        """
+        ppsd = copy.deepcopy(self)
+        ppsd.merge(other)
+        return ppsd
+
     def plot(self, filename=None, show_coverage=True, show_histogram=True,
              show_percentiles=False, percentiles=[0, 25, 50, 75, 100],
              show_noise_models=True, grid=True, show=True):
@@ -847,6 +1122,24 @@ class PPSD():
         ax.autoscale_view()
 
 
+# PPSD instance of the worker processes of PPSD.add()
+_WORKER_DATA = {}
+
+
+def _initPPSDWorker(ppsd):
+    """
+    Initializer of worker processes for PPSD.add().
+    """
+    _WORKER_DATA['ppsd'] = ppsd
+
+
+def _processPPSDSegment(tr):
+    """
+    Binned spectrum of one segment computed in a worker process.
+    """
+    return _WORKER_DATA['ppsd']._process(tr)
+
+
 def get_NLNM():
     """
     Returns periods and psd values for the New Low Noise Model.
@@ -133,6 +133,22 @@ class CpxTraceTestCase(unittest.TestCase):
                       np.sum(self.res[:, 10] ** 2))
         self.assertEqual(rms < 1.0e-5, True)
 
+    def test_windowedEqualsSingle(self):
+        """
+        Attributes of all windows computed at once have to match the
+        attributes of each single window.
+        """
+        windows = self.data_win[::25]
+        sigma = cpxtrace.instBwith(windows, self.fs, self.fk)[0]
+        centroid = cpxtrace.centroid(windows, self.fk)[0]
+        for i, row in enumerate(windows):
+            single = cpxtrace.instBwith(row, self.fs, self.fk)
+            self.assertEqual(single.shape, row.shape)
+            self.assertAlmostEqual(sigma[i], np.median(single))
+            # single trace centroid is shifted by one sample
+            self.assertAlmostEqual(centroid[i] + 1.0 / self.n,
+                                   cpxtrace.centroid(row, self.fk))
+
 
 def suite():
     return unittest.makeSuite(CpxTraceTestCase, 'test')
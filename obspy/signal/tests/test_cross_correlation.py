@@ -6,8 +6,10 @@ The cross correlation test suite.
 
 import os
 import unittest
+import numpy as np
 from obspy import read, UTCDateTime
-from obspy.signal.cross_correlation import xcorrPickCorrection
+from obspy.signal.cross_correlation import xcorrPickCorrection, xcorr, \
+    xcorr_fft, xcorr_many
 
 
 class CrossCorrelationTestCase(unittest.TestCase):
@@ -45,6 +47,54 @@ class CrossCorrelationTestCase(unittest.TestCase):
         self.assertAlmostEqual(dt, -0.013025086360067755)
         self.assertAlmostEqual(coeff, 0.98279277273758803)
 
+    def test_xcorr_fft(self):
+        """
+        Frequency domain cross correlation has to match the time domain
+        routine.
+        """
+        np.random.seed(815)
+        tr1 = np.random.randn(3000).astype('float32') + 2.0
+        tr2 = np.roll(tr1, 37) + 0.3 * np.random.randn(3000)
+        tr2 = tr2.astype('float32')
+        for shift_len in (0, 10, 100, 1000):
+            shift, value, fct = xcorr(tr1, tr2, shift_len, full_xcorr=True)
+            shift2, value2, fct2 = xcorr_fft(tr1, tr2, shift_len,
+                                             full_xcorr=True)
+            self.assertEqual(shift, shift2)
+            self.assertAlmostEqual(value, value2, 6)
+            np.testing.assert_array_almost_equal(fct, fct2, 6)
+        self.assertEqual(shift2, -37)
+        # method keyword of xcorr
+        for method in ("freq", "auto"):
+            shift2, value2 = xcorr(tr1, tr2, 1000, method=method)
+            self.assertEqual(shift, shift2)
+            self.assertAlmostEqual(value, value2, 6)
+        self.assertRaises(ValueError, xcorr, tr1, tr2, 10, method="fancy")
+
+    def test_xcorr_many(self):
+        """
+        Correlating one trace against many traces at once has to give the
+        same result as correlating pair by pair.
+        """
+        np.random.seed(815)
+        tr = np.random.randn(1000)
+        traces = [np.roll(tr, i) + 0.1 * np.random.randn(1000)
+                  for i in (-50, 0, 13, 200)]
+        shifts, values, fcts = xcorr_many(tr, traces, 250, full_xcorr=True)
+        np.testing.assert_array_equal(shifts, [50, 0, -13, -200])
+        for tr2, shift, value, fct in zip(traces, shifts, values, fcts):
+            shift2, value2, fct2 = xcorr_fft(tr, tr2, 250, full_xcorr=True)
+            self.assertEqual(shift, shift2)
+            self.assertAlmostEqual(value, value2)
+            np.testing.assert_array_almost_equal(fct, fct2)
+        # 2-D array input
+        shifts2, values2 = xcorr_many(tr, np.array(traces), 250)
+        np.testing.assert_array_equal(shifts, shifts2)
+        np.testing.assert_array_almost_equal(values, values2)
+        # traces of different length can not be stacked
+        self.assertRaises(ValueError, xcorr_many, tr,
+                          [traces[0], traces[1][:-1]], 250)
+
 
 def suite():
     return unittest.makeSuite(CrossCorrelationTestCase, 'test')
@@ -5,7 +5,9 @@ The Filter test suite.
 """
 
 from obspy.signal import bandpass, lowpass, highpass
-from obspy.signal.filter import envelope, lowpassCheby2
+from obspy.signal import filter as signal_filter
+from obspy.signal.filter import envelope, lowpassCheby2, bandstop, \
+    ContinuousFilter
 import os
 import unittest
 import gzip
@@ -248,6 +250,65 @@ class FilterTestCase(unittest.TestCase):
         # be 0 (1dB ripple) before filter ramp
         self.assertTrue(h_db[freq < 25].min() > -1)
 
+    def test_continuousFilter(self):
+        """
+        Filtering chunk by chunk has to give the same result as filtering all
+        data at once.
+        """
+        np.random.seed(815)
+        data = np.random.randn(5000)
+        df = 200.0
+        for func, type, options in (
+                (bandpass, 'bandpass', {'freqmin': 5, 'freqmax': 10}),
+                (bandstop, 'bandstop', {'freqmin': 5, 'freqmax': 10}),
+                (lowpass, 'lowpass', {'freq': 5, 'corners': 6}),
+                (highpass, 'highpass', {'freq': 5}),
+                (lowpassCheby2, 'lowpassCheby2', {'freq': 50})):
+            expected = func(data, df=df, **options)
+            flt = ContinuousFilter(type, df, **options)
+            chunks = [flt(chunk) for chunk in np.split(data, [1, 700, 2345])]
+            np.testing.assert_array_almost_equal(np.concatenate(chunks),
+                                                 expected)
+            # after reset filtering starts all over
+            flt.reset()
+            np.testing.assert_array_almost_equal(flt(data), expected)
+        self.assertRaises(ValueError, ContinuousFilter, 'remezFIR', df)
+        # zerophase filtering works forwards and backwards
+        expected = bandpass(bandpass(data, 5, 10, df)[::-1], 5, 10, df)[::-1]
+        np.testing.assert_array_almost_equal(
+            bandpass(data, 5, 10, df, zerophase=True), expected)
+
+    def test_filterWithoutSOS(self):
+        """
+        Scipy versions without sosfilt fall back to filter coefficients
+        (b, a) with the same results.
+        """
+        np.random.seed(815)
+        data = np.random.randn(5000)
+        df = 200.0
+        cases = ((bandpass, 'bandpass', {'freqmin': 5, 'freqmax': 20}),
+                 (lowpass, 'lowpass', {'freq': 5}),
+                 (highpass, 'highpass', {'freq': 5, 'zerophase': True}),
+                 (lowpassCheby2, 'lowpassCheby2', {'freq': 50}))
+        expected = [func(data, df=df, **options)
+                    for func, _type, options in cases]
+        sosfilt, zpk2sos = signal_filter.sosfilt, signal_filter.zpk2sos
+        signal_filter._DESIGN_CACHE.clear()
+        signal_filter.sosfilt = signal_filter.zpk2sos = None
+        try:
+            for (func, type, options), exp in zip(cases, expected):
+                np.testing.assert_array_almost_equal(
+                    func(data, df=df, **options), exp)
+                if options.pop('zerophase', False):
+                    continue
+                flt = ContinuousFilter(type, df, **options)
+                chunks = [flt(chunk) for chunk in np.split(data, [700])]
+                np.testing.assert_array_almost_equal(
+                    np.concatenate(chunks), exp)
+        finally:
+            signal_filter.sosfilt, signal_filter.zpk2sos = sosfilt, zpk2sos
+            signal_filter._DESIGN_CACHE.clear()
+
 
 def suite():
     return unittest.makeSuite(FilterTestCase, 'test')
@@ -341,6 +341,99 @@ class InvSimTestCase(unittest.TestCase):
             _h, f = evalresp(*args, **kwargs)
             self.assertEquals(len(f), nfft // 2 + 1)
 
+    def test_evalrespInMemory(self):
+        """
+        evalresp works on RESP strings, file-like objects and Parser objects
+        and caches the evaluated responses.
+        """
+        from StringIO import StringIO
+        from obspy.signal import invsim
+        from obspy.xseed import Parser
+        dt = UTCDateTime(2003, 11, 1, 0, 0, 0)
+        respf = os.path.join(self.path, 'RESP.NZ.CRLZ.10.HHZ')
+        h, f = evalresp(0.01, 1024, respf, dt, freq=True)
+        self.assertEquals(len(h), 513)
+        np.testing.assert_array_almost_equal(f, np.linspace(0, 50, 513))
+        data = open(respf, 'rb').read()
+        for resp in (data, StringIO(data)):
+            h2, f2 = evalresp(0.01, 1024, resp, dt, freq=True)
+            np.testing.assert_array_equal(h, h2)
+            np.testing.assert_array_equal(f, f2)
+        # returned responses are copies of the cached ones
+        h2[:] = 0
+        np.testing.assert_array_equal(evalresp(0.01, 1024, respf, dt), h)
+        invsim._EVALRESP_CACHE.clear()
+        np.testing.assert_array_equal(evalresp(0.01, 1024, data, dt), h)
+        self.assertEquals(len(invsim._EVALRESP_CACHE), 1)
+        # Parser objects, channels are selected via keyword arguments
+        filename = os.path.join(os.path.dirname(__file__), os.pardir,
+                                os.pardir, 'xseed', 'tests', 'data',
+                                'dataless.seed.BW_FURT')
+        parser = Parser(filename)
+        dt = UTCDateTime(2010, 1, 1)
+        resp = parser.getRESP()
+        resp = dict([(k, v.getvalue()) for k, v in resp])
+        # RESP information is generated only once per Parser object
+        calls = []
+        get_resp = parser.getRESP
+        parser.getRESP = lambda: calls.append(1) or get_resp()
+        for cha in ('EHZ', 'EHN', 'EHE'):
+            h = evalresp(0.005, 256, parser, dt, channel=cha)
+            h2 = evalresp(0.005, 256, resp['RESP.BW.FURT..' + cha], dt)
+            np.testing.assert_array_equal(h, h2)
+        self.assertEquals(len(calls), 1)
+        # and released together with the Parser object
+        parser2 = Parser(filename)
+        evalresp(0.005, 256, parser2, dt, channel='EHZ')
+        self.assertTrue(parser2 in invsim._PARSER_RESP)
+        num = len(invsim._PARSER_RESP)
+        del parser2
+        self.assertEquals(len(invsim._PARSER_RESP), num - 1)
+
+    def test_seisSimOperatorCache(self):
+        """
+        Spectral operators of seisSim are cached per instrument, number of
+        FFT points and sampling rate.
+        """
+        from obspy.signal import invsim
+        np.random.seed(815)
+        data = np.random.randn(1000)
+        paz = dict(PAZ_WWSSN_SP)
+        kwargs = {'paz_remove': PAZ_WOOD_ANDERSON, 'paz_simulate': paz,
+                  'pre_filt': (0.1, 0.2, 20.0, 30.0)}
+        invsim._SIMULATION_CACHE.clear()
+        expected = seisSim(data.copy(), 100.0, **kwargs)
+        self.assertEquals(len(invsim._SIMULATION_CACHE), 1)
+        np.testing.assert_array_equal(seisSim(data.copy(), 100.0, **kwargs),
+                                      expected)
+        self.assertEquals(len(invsim._SIMULATION_CACHE), 1)
+        # changed instrument, sampling rate and water level
+        paz['gain'] *= 2.0
+        np.testing.assert_array_almost_equal(
+            seisSim(data.copy(), 100.0, **kwargs), expected * 2.0)
+        seisSim(data.copy(), 50.0, **kwargs)
+        seisSim(data.copy(), 100.0, water_level=10.0, **kwargs)
+        self.assertEquals(len(invsim._SIMULATION_CACHE), 4)
+        # least recently used operators are evicted when the size limit in
+        # bytes is reached, larger operators are not cached at all
+        nbytes = invsim._SIMULATION_CACHE.values()[0].nbytes
+        cache_bytes = invsim.SIMULATION_CACHE_BYTES
+        try:
+            invsim.SIMULATION_CACHE_BYTES = 5 * nbytes
+            for i in xrange(6):
+                seisSim(data.copy(), 100.0 + i, **kwargs)
+            self.assertEquals(len(invsim._SIMULATION_CACHE), 5)
+            self.assertEquals(invsim._SIMULATION_CACHE.keys()[-1][2],
+                              1.0 / 105.0)
+            seisSim(np.random.randn(10000), 100.0, **kwargs)
+            self.assertEquals(len(invsim._SIMULATION_CACHE), 5)
+            self.assertTrue(all([op.nbytes == nbytes for op in
+                                 invsim._SIMULATION_CACHE.values()]))
+        finally:
+            invsim.SIMULATION_CACHE_BYTES = cache_bytes
+        invsim.clearSimulationCache()
+        self.assertEquals(len(invsim._SIMULATION_CACHE), 0)
+
 
 def suite():
     return unittest.makeSuite(InvSimTestCase, 'test')
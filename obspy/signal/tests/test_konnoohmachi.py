@@ -6,7 +6,7 @@ The polarization.core test suite.
 
 from obspy.signal import konnoOhmachiSmoothing
 from obspy.signal.konnoohmachismoothing import konnoOhmachiSmoothingWindow, \
-    calculateSmoothingMatrix
+    calculateSmoothingMatrix, calculateSparseSmoothingMatrix
 import numpy as np
 import unittest
 import warnings
@@ -141,6 +141,52 @@ class KonnoOhmachiTestCase(unittest.TestCase):
         # Input dtype should be output dtype.
         self.assertEqual(smoothed_3.dtype, np.float64)
 
+    def test_sparseSmoothingMatrix(self):
+        """
+        The sparse smoothing matrix only neglects window values below the
+        given tolerance.
+        """
+        frequencies = np.concatenate([[0.0], self.frequencies])
+        temp = np.geterr()
+        np.seterr(all='ignore')
+        matrix = calculateSmoothingMatrix(frequencies)
+        np.seterr(**temp)
+        for tolerance in (1e-2, 1e-6):
+            sparse = calculateSparseSmoothingMatrix(frequencies,
+                                                    tolerance=tolerance)
+            self.assertTrue(sparse.nnz < matrix.size)
+            dense = sparse.toarray()
+            self.assertTrue(np.abs(dense - matrix).max() < tolerance)
+            np.testing.assert_array_almost_equal(dense[dense != 0],
+                                                 matrix[dense != 0], 10)
+        # Normalized rows.
+        sparse = calculateSparseSmoothingMatrix(frequencies, normalize=True)
+        np.testing.assert_array_almost_equal(sparse.toarray().sum(axis=1),
+                                             1.0)
+        # Unsorted frequencies raise.
+        self.assertRaises(ValueError, calculateSparseSmoothingMatrix,
+                          frequencies[::-1])
+        # Smoothing of many spectra with the sparse matrix.
+        np.random.seed(1111)
+        spectra = np.random.ranf((5, 101)) * 50
+        for count in (1, 3):
+            for normalize in (False, True):
+                smoothed_1 = konnoOhmachiSmoothing(spectra, frequencies,
+                    count=count, enforce_no_matrix=True, normalize=normalize)
+                smoothed_2 = konnoOhmachiSmoothing(spectra, frequencies,
+                    count=count, normalize=normalize, tolerance=1e-8)
+                np.testing.assert_allclose(smoothed_1, smoothed_2, rtol=1e-5)
+                # Chunked application without storing the sparse matrix.
+                smoothed_3 = konnoOhmachiSmoothing(spectra, frequencies,
+                    count=count, normalize=normalize, tolerance=1e-8,
+                    max_memory_usage=0)
+                np.testing.assert_allclose(smoothed_2, smoothed_3)
+        # Single spectra.
+        smoothed_4 = konnoOhmachiSmoothing(spectra[0], frequencies,
+                                           count=count, normalize=normalize,
+                                           tolerance=1e-8)
+        np.testing.assert_allclose(smoothed_4, smoothed_2[0])
+
 
 def suite():
     return unittest.makeSuite(KonnoOhmachiTestCase, 'test')
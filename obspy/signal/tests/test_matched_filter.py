@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The matched filter test suite.
+"""
+
+import unittest
+import warnings
+import numpy as np
+from obspy import Trace, Stream, UTCDateTime
+from obspy.signal.matched_filter import normxcorrFFT, matchedFilter
+
+
+class MatchedFilterTestCase(unittest.TestCase):
+    """
+    Test cases for matched filter detection.
+    """
+    def setUp(self):
+        # three stations with noise and two repetitions of the same event
+        # with station dependent moveouts
+        np.random.seed(815)
+        self.df = 50.0
+        self.starttime = UTCDateTime(2012, 1, 1)
+        self.event_times = [self.starttime + 100, self.starttime + 500]
+        self.moveouts = {'A': 0.0, 'B': 2.4, 'C': 5.1}
+        npts = int(1000 * self.df)
+        wavelet = np.sin(np.arange(200) * 0.3) * np.hanning(200) * 10
+        self.stream = Stream()
+        self.template = Stream()
+        for sta, moveout in sorted(self.moveouts.items()):
+            data = np.random.randn(npts)
+            for t in self.event_times:
+                i = int(round((t - self.starttime + moveout) * self.df))
+                data[i:i + 200] += wavelet
+            header = {'network': 'XX', 'station': sta, 'channel': 'HHZ',
+                      'sampling_rate': self.df, 'starttime': self.starttime}
+            tr = Trace(data=data, header=header)
+            self.stream.append(tr)
+            tr = tr.copy()
+            t = self.event_times[0] + moveout
+            tr.trim(t, t + 199 / self.df)
+            self.template.append(tr)
+
+    def test_normxcorrFFT(self):
+        """
+        Compare block-wise normalized cross correlation with brute force
+        correlation coefficients.
+        """
+        np.random.seed(815)
+        data = np.random.randn(20000) + np.linspace(0, 100, 20000)
+        templates = np.array([data[3000:3300], np.random.randn(300)])
+        for nfft in (512, 1024, None):
+            cc = normxcorrFFT(templates, data, nfft=nfft)
+            self.assertEqual(cc.shape, (2, 19701))
+            for k in xrange(0, 19701, 397):
+                for i in xrange(2):
+                    expected = np.corrcoef(templates[i], data[k:k + 300])[0, 1]
+                    self.assertAlmostEqual(cc[i, k], expected)
+        self.assertEqual(cc[0].argmax(), 3000)
+        # 1-D template
+        np.testing.assert_array_almost_equal(
+            normxcorrFFT(templates[0], data), cc[0])
+        # zero data windows give zero correlation
+        data[5000:6000] = 0.0
+        cc = normxcorrFFT(templates[0], data)
+        np.testing.assert_array_equal(cc[5000:5701], 0.0)
+
+    def test_matchedFilter(self):
+        """
+        Both events need to be detected at the correct times.
+        """
+        for processes, per_task in ((1, 50), (2, 1)):
+            detections = matchedFilter(self.stream, [self.template] * 2,
+                                       threshold=8.0,
+                                       template_names=["ev1", "ev2"],
+                                       templates_per_task=per_task,
+                                       processes=processes)
+            self.assertEqual(len(detections), 4)
+            for i, det in enumerate(detections):
+                self.assertEqual(det['template'], ["ev1", "ev2"][i % 2])
+                self.assertAlmostEqual(det['time'] - self.event_times[i // 2],
+                                       0.0)
+                self.assertTrue(det['cross_correlation'] > 0.5)
+                self.assertEqual(det['trace_ids'], [tr.id for tr in
+                                                    self.template])
+        # absolute threshold is too high for the first event with added noise
+        detections = matchedFilter(self.stream, [self.template],
+                                   threshold=0.99, threshold_type="absolute")
+        self.assertEqual(len(detections), 1)
+        self.assertAlmostEqual(detections[0]['time'] - self.event_times[0],
+                               0.0)
+        self.assertAlmostEqual(detections[0]['cross_correlation'], 1.0)
+
+    def test_matchedFilterMissingChannel(self):
+        """
+        Template channels not present in the data are skipped with a warning.
+        """
+        st = self.stream.copy()
+        st.remove(st[2])
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            detections = matchedFilter(st, [self.template])
+        self.assertEqual(len(w), 1)
+        self.assertEqual(len(detections), 2)
+        self.assertEqual(detections[0]['trace_ids'], [tr.id for tr in st])
+        # channels with data shorter than the template are not stacked
+        st = self.stream.copy()
+        st[2].data = st[2].data[:100]
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            detections = matchedFilter(st, [self.template],
+                                       threshold=0.99,
+                                       threshold_type="absolute")
+        self.assertEqual(len(w), 1)
+        self.assertEqual(len(detections), 1)
+        self.assertAlmostEqual(detections[0]['cross_correlation'], 1.0)
+        self.assertEqual(detections[0]['trace_ids'],
+                         [tr.id for tr in st[:2]])
+        # duplicate trace IDs are not allowed
+        st += st
+        self.assertRaises(ValueError, matchedFilter, st, [self.template])
+
+
+def suite():
+    return unittest.makeSuite(MatchedFilterTestCase, 'test')
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -4,6 +4,7 @@
 The polarization.core test suite.
 """
 
+from obspy import Stream, Trace, UTCDateTime
 from obspy.signal import polarization, util
 from scipy import signal
 import numpy as np
@@ -89,6 +90,7 @@ class PolarizationTestCase(unittest.TestCase):
         #[41] drect
         #[42] plan
         #[43] dplan
+        self.data = (data_e, data_n, data_z)
         self.data_win_z, self.nwin, self.no_win = \
             util.enframe(data_z, signal.hamming(self.n), self.inc)
         self.data_win_e, self.nwin, self.no_win = \
@@ -135,6 +137,35 @@ class PolarizationTestCase(unittest.TestCase):
                       np.sum(self.res[:, 43] ** 2))
         self.assertEqual(rms < 1.0e-5, True)
 
+    def test_polarizationAnalysis(self):
+        """
+        Sliding window analysis of a Stream has to match eigval() of the
+        windowed data.
+        """
+        st = Stream()
+        for component, data in zip('ENZ', self.data):
+            header = {'channel': 'HH' + component, 'sampling_rate': self.fs,
+                      'starttime': UTCDateTime(2012, 1, 1)}
+            st.append(Trace(data=data.copy(), header=header))
+        st.reverse()
+        res = polarization.polarizationAnalysis(st, self.n / float(self.fs),
+                                                self.inc / float(self.n),
+                                                self.norm)
+        pol = polarization.eigval(self.data_win_e, self.data_win_n,
+                                  self.data_win_z, self.fk, self.norm)
+        self.assertEqual(res.shape, (self.no_win, 6))
+        self.assertAlmostEqual(res[1, 0] - res[0, 0],
+                               self.inc / float(self.fs))
+        self.assertEqual(res[0, 0], UTCDateTime(2012, 1, 1).timestamp)
+        for i in xrange(5):
+            np.testing.assert_allclose(res[:, i + 1], pol[i], rtol=1e-10)
+        # three components needed
+        self.assertRaises(ValueError, polarization.polarizationAnalysis,
+                          st[:2], 1.0, 0.5)
+        st[0].stats.channel = 'HH1'
+        self.assertRaises(ValueError, polarization.polarizationAnalysis,
+                          st, 1.0, 0.5)
+
 
 def suite():
     return unittest.makeSuite(PolarizationTestCase, 'test')
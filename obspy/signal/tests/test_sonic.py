@@ -5,6 +5,7 @@ from obspy.core.util import AttribDict
 from obspy.signal.array_analysis import array_transff_freqslowness, \
   array_processing
 from obspy.signal.array_analysis import array_transff_wavenumber
+from obspy.signal import array_analysis
 from obspy.signal.util import utlLonLat
 import numpy as np
 import unittest
@@ -16,7 +17,7 @@ class SonicTestCase(unittest.TestCase):
     Test fk analysis, main function is sonic() in array_analysis.py
     """
 
-    def arrayProcessing(self, prewhiten, method):
+    def arrayProcessing(self, prewhiten, method, **kwargs):
         np.random.seed(2348)
 
         geometry = np.array([[0.0, 0.0, 0.0],
@@ -81,8 +82,8 @@ class SonicTestCase(unittest.TestCase):
 
         args = (st, win_len, step_frac, sll_x, slm_x, sll_y, slm_y, sl_s,
                 semb_thres, vel_thres, frqlow, frqhigh, stime, etime)
-        kwargs = dict(prewhiten=prewhiten, coordsys='xy', verbose=False,
-                      method=method)
+        kwargs.update(dict(prewhiten=prewhiten, coordsys='xy',
+                           verbose=False, method=method))
         out = array_processing(*args, **kwargs)
         if 0:  # 1 for debugging
             print '\n', out[:, 1:]
@@ -142,6 +143,23 @@ class SonicTestCase(unittest.TestCase):
         # XXX relative tolerance should be lower!
         self.assertTrue(np.allclose(ref, out[:, 1:], rtol=4e-5))
 
+    def test_sonicProcesses(self):
+        """
+        Distributing the windows over worker processes must not change the
+        results, store gets called for all windows in chronological order.
+        """
+        for method in (0, 1):
+            offsets = []
+            out = self.arrayProcessing(prewhiten=0, method=method,
+                store=lambda relpow, abspow, offset: offsets.append(offset))
+            self.assertEqual(offsets, range(0, 6 * 40, 40))
+            offsets2 = []
+            out2 = self.arrayProcessing(prewhiten=0, method=method,
+                store=lambda relpow, abspow, offset: offsets2.append(offset),
+                processes=2)
+            np.testing.assert_array_equal(out, out2)
+            self.assertEqual(offsets, offsets2)
+
     def test_array_transff_freqslowness(self):
 
         coords = np.array([[10., 60., 0.],
@@ -217,6 +235,40 @@ class SonicTestCase(unittest.TestCase):
         np.testing.assert_array_almost_equal(transff, transffth, decimal=6)
         np.testing.assert_array_almost_equal(transffll, transffth, decimal=6)
 
+    def test_array_transff_chunks(self):
+        """
+        Transfer functions on finer grids with chunking and worker processes
+        compared to straight forward summation over stations.
+        """
+        np.random.seed(815)
+        coords = np.random.rand(7, 3) - 0.5
+        coords[:, 2] = 0.
+        kx = np.arange(-10., 10. + 0.05, 0.5)
+        phase = (coords[:, 0] * kx[:, np.newaxis, np.newaxis] +
+                 coords[:, 1] * kx[np.newaxis, :, np.newaxis])
+        expected = np.abs(np.exp(1j * phase).sum(axis=-1)) ** 2
+        expected /= expected.max()
+        transff = array_transff_wavenumber(coords, 10., 0.5, coordsys='xy')
+        np.testing.assert_array_almost_equal(transff, expected)
+        freqs = np.arange(1., 5. + 0.1, 1.)
+        sx = np.arange(-0.5, 0.5 + 0.01, 0.1)
+        phase = (coords[:, 0] * sx[:, np.newaxis, np.newaxis] +
+                 coords[:, 1] * sx[np.newaxis, :, np.newaxis])
+        buff = np.abs(np.exp(2j * np.pi * phase[..., np.newaxis] *
+                             freqs).sum(axis=2)) ** 2
+        expected = np.trapz(buff, dx=1., axis=-1)
+        expected /= expected.max()
+        chunk_size = array_analysis._TRANSFF_CHUNK_SIZE
+        try:
+            array_analysis._TRANSFF_CHUNK_SIZE = 20
+            for processes in (1, 3):
+                transff = array_transff_freqslowness(
+                    coords, 0.5, 0.1, 1., 5., 1., coordsys='xy',
+                    processes=processes)
+                np.testing.assert_array_almost_equal(transff, expected)
+        finally:
+            array_analysis._TRANSFF_CHUNK_SIZE = chunk_size
+
 
 def suite():
     return unittest.makeSuite(SonicTestCase, 'test')
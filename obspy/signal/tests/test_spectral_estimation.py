@@ -5,10 +5,14 @@ The psd test suite.
 """
 
 from obspy import Trace, Stream, UTCDateTime
+from obspy.core import Stats
 from obspy.signal.spectral_estimation import PPSD, psd, welch_window, \
     welch_taper
+from obspy.core.util import NamedTemporaryFile
+import gzip
 import numpy as np
 import os
+import pickle
 import unittest
 import warnings
 
@@ -78,19 +82,12 @@ class PsdTestCase(unittest.TestCase):
             window_obspy = welch_window(N)
             np.testing.assert_array_almost_equal(window_pitsa, window_obspy)
 
-    def test_PPSD(self):
+    def _get_ppsd_data(self):
         """
-        Test PPSD routine with some real data. Data was downsampled to 100Hz
-        so the ppsd is a bit distorted which does not matter for the purpose
-        of testing.
+        Returns stream and poles and zeros of test data for PPSD.
         """
-        # load test file
         file_data = os.path.join(self.path,
                 'BW.KW1._.EHZ.D.2011.090_downsampled.asc.gz')
-        file_histogram = os.path.join(self.path,
-                'BW.KW1._.EHZ.D.2011.090_downsampled__ppsd_hist_stack.npy')
-        file_binning = os.path.join(self.path,
-                'BW.KW1._.EHZ.D.2011.090_downsampled__ppsd_mixed.npz')
         # parameters for the test
         data = np.loadtxt(file_data)
         stats = {'_format': 'MSEED',
@@ -114,6 +111,21 @@ class PsdTestCase(unittest.TestCase):
                          (-131.04 + 467.29j)],
                'sensitivity': 2516778400.0,
                'zeros': [0j, 0j]}
+        return st, paz
+
+    def test_PPSD(self):
+        """
+        Test PPSD routine with some real data. Data was downsampled to 100Hz
+        so the ppsd is a bit distorted which does not matter for the purpose
+        of testing.
+        """
+        # load test file
+        file_histogram = os.path.join(self.path,
+                'BW.KW1._.EHZ.D.2011.090_downsampled__ppsd_hist_stack.npy')
+        file_binning = os.path.join(self.path,
+                'BW.KW1._.EHZ.D.2011.090_downsampled__ppsd_mixed.npz')
+        st, paz = self._get_ppsd_data()
+        tr = st[0]
         ppsd = PPSD(tr.stats, paz)
         ppsd.add(st)
         # read results and compare
@@ -132,6 +144,135 @@ class PsdTestCase(unittest.TestCase):
         binning = np.load(file_binning)
         np.testing.assert_array_equal(ppsd.spec_bins, binning['spec_bins'])
         np.testing.assert_array_equal(ppsd.period_bins, binning['period_bins'])
+        # parallel processing of the segments gives identical results
+        ppsd2 = PPSD(tr.stats, paz)
+        ppsd2.add(st, processes=2)
+        self.assertEqual(ppsd2.times, ppsd.times)
+        np.testing.assert_array_equal(ppsd2.hist_stack, result_hist)
+
+    def test_PPSDMerge(self):
+        """
+        PPSDs of parts of the data merged together and saved/loaded as npz
+        file have to match the PPSD of all data.
+        """
+        st, paz = self._get_ppsd_data()
+        t0 = st[0].stats.starttime
+        ppsd = PPSD(st[0].stats, paz)
+        ppsd.add(st)
+        ppsd1 = PPSD(st[0].stats, paz)
+        ppsd1.add(st.slice(t0, t0 + 5400))
+        ppsd2 = PPSD(st[0].stats, paz)
+        ppsd2.add(st.slice(t0 + 3600, st[0].stats.endtime))
+        self.assertEqual(len(ppsd1.times), 2)
+        self.assertEqual(len(ppsd2.times), 2)
+        with NamedTemporaryFile(suffix='.npz') as tf:
+            ppsd2.save_npz(tf.name)
+            ppsd2 = PPSD.load_npz(tf.name, paz=paz)
+            # files without response_in_frequency_domain
+            data = dict(np.load(tf.name))
+            del data['response_in_frequency_domain']
+            np.savez(tf.name, **data)
+            ppsd3 = PPSD.load_npz(tf.name, paz=paz)
+        self.assertFalse(ppsd3.response_in_frequency_domain)
+        self.assertEqual(ppsd3.times, ppsd2.times)
+        self.assertEqual(ppsd2.id, ppsd.id)
+        np.testing.assert_array_equal(ppsd2.spec_bins, ppsd.spec_bins)
+        for merged in (ppsd1 + ppsd2, ppsd2 + ppsd1):
+            self.assertEqual(merged.times, ppsd.times)
+            np.testing.assert_array_equal(merged.hist_stack, ppsd.hist_stack)
+            np.testing.assert_array_equal(merged.binned_psds,
+                                          ppsd.binned_psds)
+            self.assertEqual(len(merged.times_data), 2)
+        # ppsd1 was not changed by adding
+        self.assertEqual(len(ppsd1.times), 2)
+        # overlapping segments are skipped
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter('ignore', UserWarning)
+            self.assertFalse(ppsd.merge(ppsd1))
+        self.assertEqual(len(ppsd.times), 4)
+        # incompatible PPSDs can not be merged
+        st[0].stats.station = 'XYZ'
+        self.assertRaises(ValueError, ppsd.merge, PPSD(st[0].stats, paz))
+
+    def test_PPSDOverlappingTraces(self):
+        """
+        Overlapping traces in one call of add() must not insert any piece of
+        data twice, just like adding them one after another in order of their
+        start times.
+        """
+        st, paz = self._get_ppsd_data()
+        t0 = st[0].stats.starttime
+        later = st[0].slice(t0 + 900, t0 + 8000)
+        earlier = st[0].slice(t0, t0 + 8000)
+        # different data to avoid merging
+        earlier.data = earlier.data * 2
+        for traces in ([earlier, earlier.copy()], [later, earlier]):
+            ppsd = PPSD(st[0].stats, paz, skip_on_gaps=True)
+            with warnings.catch_warnings(record=True):
+                warnings.simplefilter('ignore', UserWarning)
+                ppsd.add(Stream([tr.copy() for tr in traces]))
+            expected = PPSD(st[0].stats, paz, skip_on_gaps=True)
+            with warnings.catch_warnings(record=True):
+                warnings.simplefilter('ignore', UserWarning)
+                # traces are merged and thus sorted by start time in add()
+                for tr in sorted(traces, key=lambda tr: tr.stats.starttime):
+                    expected.add(tr.copy())
+            self.assertEqual(ppsd.times, expected.times)
+            np.testing.assert_array_equal(ppsd.hist_stack,
+                                          expected.hist_stack)
+
+    def test_PPSDResponseInFrequencyDomain(self):
+        """
+        Removing the response from the power spectra has to match the time
+        domain restitution in the passband of the instrument.
+        """
+        st, paz = self._get_ppsd_data()
+        ppsd = PPSD(st[0].stats, paz)
+        ppsd.add(st)
+        ppsd2 = PPSD(st[0].stats, paz, response_in_frequency_domain=True)
+        ppsd2.add(st)
+        self.assertEqual(ppsd2.times, ppsd.times)
+        idx = (ppsd.per_octaves > 0.2) & (ppsd.per_octaves < 40)
+        np.testing.assert_allclose(np.array(ppsd2.binned_psds)[:, idx],
+                                   np.array(ppsd.binned_psds)[:, idx],
+                                   rtol=0, atol=0.2)
+        # merging needs the same kind of processing
+        self.assertRaises(ValueError, ppsd.merge, ppsd2)
+
+    def test_PPSDOldPickle(self):
+        """
+        PPSDs pickled by older versions without the binned spectra of the
+        single segments can still be loaded and used.
+        """
+        fh = gzip.open(os.path.join(self.path, 'ppsd_old_pickle.pkl.gz'))
+        try:
+            ppsd = pickle.load(fh)
+        finally:
+            fh.close()
+        self.assertEqual(len(ppsd.times), 2)
+        self.assertEqual(ppsd.binned_psds, [None, None])
+        self.assertTrue(ppsd.times is ppsd.times_used)
+        # spectra of the old segments are missing
+        with NamedTemporaryFile(suffix='.npz') as tf:
+            self.assertRaises(ValueError, ppsd.save_npz, tf.name)
+        stats = Stats({'network': 'XX', 'station': 'OLD', 'channel': 'LHZ',
+                       'sampling_rate': 1.0})
+        other = PPSD(stats, ppsd.paz)
+        self.assertRaises(ValueError, other.merge, ppsd)
+        # more data can be added, giving the same result as a new PPSD
+        np.random.seed(815)
+        header = {'network': 'XX', 'station': 'OLD', 'channel': 'LHZ',
+                  'sampling_rate': 1.0, 'starttime': UTCDateTime(2012, 1, 1)}
+        st = Stream([Trace(np.random.randn(4 * 3600) * 1000, header)])
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter('ignore', UserWarning)
+            self.assertTrue(ppsd.add(st))
+        self.assertFalse(ppsd.response_in_frequency_domain)
+        other.add(st)
+        self.assertEqual(ppsd.times, other.times)
+        np.testing.assert_array_equal(ppsd.hist_stack, other.hist_stack)
+        np.testing.assert_array_equal(ppsd.binned_psds[2:],
+                                      other.binned_psds[2:])
 
 
 def suite():
@@ -4,8 +4,9 @@
 The tf_misfit test suite.
 """
 
+from obspy.signal import tf_misfit
 from obspy.signal.tf_misfit import tfem, tfpm, tem, fem, fpm, pg, em, pm, eg, \
-    tfpg, teg, feg, fpg, tpg, tfeg, tpm
+    tfpg, teg, feg, fpg, tpg, tfeg, tpm, tfMisfitsAndGofs, cwt
 from scipy.signal import hilbert
 import numpy as np
 import os
@@ -222,6 +223,75 @@ class TfTestCase(unittest.TestCase):
         self.assertTrue(np.allclose(EG, 10., rtol=tol))
         self.assertTrue(np.allclose(PG, 10., rtol=tol))
 
+    def test_misfitsAndGofs(self):
+        """
+        All misfits and gofs from one pair of transforms, also for
+        multicomponent data and batches of signal pairs.
+        """
+        t = self.t
+        kwargs = {'dt': self.dt, 'fmin': self.fmin, 'fmax': self.fmax,
+                  'nf': self.nf}
+        functions = {'TFEM': tfem, 'TFPM': tfpm, 'TEM': tem, 'TPM': tpm,
+                     'FEM': fem, 'FPM': fpm, 'EM': em, 'PM': pm,
+                     'TFEG': tfeg, 'TFPG': tfpg, 'TEG': teg, 'TPG': tpg,
+                     'FEG': feg, 'FPG': fpg, 'EG': eg, 'PG': pg}
+        st1 = np.array([self.S1a(t), self.s1p])
+        st2 = np.array([self.S1(t), self.S1(t)])
+        for norm in ('global', 'local'):
+            for st2_isref in (True, False):
+                for s1, s2 in ((st1[0], st2[0]), (st1, st2)):
+                    result = tfMisfitsAndGofs(s1, s2, norm=norm,
+                                              st2_isref=st2_isref, **kwargs)
+                    self.assertEqual(sorted(result), sorted(functions))
+                    for key, func in functions.items():
+                        expected = func(s1, s2, norm=norm,
+                                        st2_isref=st2_isref, **kwargs)
+                        self.assertEqual(np.shape(result[key]),
+                                         np.shape(expected))
+                        np.testing.assert_allclose(result[key], expected)
+        # batch of signal pairs
+        batch = tfMisfitsAndGofs(np.array([st1, st2]), np.array([st2, st1]),
+                                 **kwargs)
+        self.assertEqual(len(batch), 2)
+        np.testing.assert_allclose(batch[1]['TFPM'], tfpm(st2, st1, **kwargs))
+        np.testing.assert_allclose(batch[0]['EG'], eg(st1, st2, **kwargs))
+        # cwt of several signals at once
+        W = cwt(st1, self.dt, self.w0, self.fmin, self.fmax, self.nf)
+        self.assertEqual(W.shape, (2, self.nf, self.npts))
+        np.testing.assert_allclose(W[1], cwt(st1[1], self.dt, self.w0,
+                                             self.fmin, self.fmax, self.nf))
+        self.assertRaises(ValueError, cwt, st1, self.dt, self.w0, self.fmin,
+                          self.fmax, self.nf, wl='mexh')
+
+    def test_cwtBlocks(self):
+        """
+        Wavelet banks exceeding the cache limit are not cached, transforming
+        block by block gives the same result.
+        """
+        st = np.array([self.S1a(self.t), self.s1p])
+        args = (st, self.dt, self.w0, self.fmin, self.fmax, self.nf)
+        expected = cwt(*args)
+        cache_bytes = tf_misfit.WAVELET_CACHE_BYTES
+        block_bytes = tf_misfit._CWT_BLOCK_BYTES
+        try:
+            tf_misfit._WAVELET_CACHE.clear()
+            tf_misfit.WAVELET_CACHE_BYTES = 0
+            tf_misfit._CWT_BLOCK_BYTES = 1
+            np.testing.assert_allclose(cwt(*args), expected)
+            self.assertEqual(len(tf_misfit._WAVELET_CACHE), 0)
+            # only banks fitting into the limit together are kept
+            tf_misfit.WAVELET_CACHE_BYTES = 10 * self.nf * self.npts * 16
+            for fmax in (self.fmax, self.fmax / 2., self.fmax / 4.):
+                cwt(st, self.dt, self.w0, self.fmin, fmax, self.nf)
+            nbytes = sum([b.nbytes
+                          for b in tf_misfit._WAVELET_CACHE.values()])
+            self.assertEqual(len(tf_misfit._WAVELET_CACHE), 2)
+            self.assertTrue(nbytes <= tf_misfit.WAVELET_CACHE_BYTES)
+        finally:
+            tf_misfit.WAVELET_CACHE_BYTES = cache_bytes
+            tf_misfit._CWT_BLOCK_BYTES = block_bytes
+            tf_misfit._WAVELET_CACHE.clear()
+
 
 def suite():
     return unittest.makeSuite(TfTestCase, 'test')
@@ -3,9 +3,13 @@
 The obspy.signal.trigger test suite.
 """
 from ctypes import ArgumentError
-from obspy import read, Stream, UTCDateTime
+from obspy import read, Stream, Trace, UTCDateTime
 from obspy.signal import recSTALTA, recSTALTAPy, triggerOnset, pkBaer, \
-    coincidenceTrigger, arPick, classicSTALTA, classicSTALTAPy
+    coincidenceTrigger, coincidenceTriggerChunked, arPick, classicSTALTA, \
+    classicSTALTAPy
+from obspy.signal.trigger import RecSTALTADetector, ClassicSTALTADetector, \
+    TriggerDetector, recSTALTABatch, classicSTALTABatch, delayedSTALTA, \
+    delayedSTALTABatch, zDetect, zDetectBatch, carlSTATrig, carlSTATrigBatch
 from obspy.signal.util import clibsignal
 import gzip
 import numpy as np
@@ -411,6 +415,129 @@ class TriggerTestCase(unittest.TestCase):
         ref = np.array([0.38012302, 0.37704431, 0.47674533, 0.67992292])
         self.assertTrue(np.allclose(ref, c2[99:103]))
 
+    def test_STALTADetectors(self):
+        """
+        Chunk-wise processing with stateful STA/LTA detectors has to give the
+        same characteristic functions as processing all data at once.
+        """
+        nsta, nlta = 50, 500
+        c1 = recSTALTA(self.data, nsta, nlta)
+        c2 = classicSTALTA(self.data, nsta, nlta)
+        for chunk_sizes in ([1, 7, 30], [512], [499, 500, 501, 2000]):
+            rec = RecSTALTADetector(nsta, nlta)
+            classic = ClassicSTALTADetector(nsta, nlta)
+            # recompute running sums often to also test the resync
+            classic._resync_interval = 5000
+            r1, r2 = [], []
+            i = 0
+            while i < len(self.data):
+                n = chunk_sizes[len(r1) % len(chunk_sizes)]
+                r1.append(rec(self.data[i:i + n]))
+                r2.append(classic(self.data[i:i + n]))
+                i += n
+            np.testing.assert_array_almost_equal(np.concatenate(r1), c1)
+            np.testing.assert_array_almost_equal(np.concatenate(r2), c2)
+        # reset starts over
+        rec.reset()
+        np.testing.assert_array_almost_equal(rec(self.data[:1000]),
+                                             c1[:1000])
+        self.assertRaises(ValueError, ClassicSTALTADetector, 10, 5)
+
+    def test_TriggerDetector(self):
+        """
+        Chunk-wise trigger detection has to find the same triggers as
+        triggerOnset, also for triggers spanning chunk boundaries.
+        """
+        on_of = [(6, 31), (69, 94), (131, 181), (215, 265), (278, 315),
+                 (480, 505), (543, 568)]
+        cft = np.concatenate((np.sin(np.arange(0, 5 * np.pi, 0.1)) + 1,
+                              np.sin(np.arange(0, 5 * np.pi, 0.1)) + 2.1,
+                              np.sin(np.arange(0, 5 * np.pi, 0.1)) + 0.4,
+                              np.sin(np.arange(0, 5 * np.pi, 0.1)) + 1))
+        for chunk_size in (1, 10, 33, 1000):
+            for max_len_delete, expected in ((False, on_of),
+                                             (True, [on_of[i] for i in
+                                                     (0, 1, 5, 6)])):
+                detector = TriggerDetector(1.5, 1.0, max_len=50,
+                                           max_len_delete=max_len_delete)
+                for i in xrange(0, len(cft), chunk_size):
+                    detector(cft[i:i + chunk_size])
+                # last trigger is still active at the end of the data
+                self.assertEqual(detector.triggers, expected)
+        # process() returns triggers completed in given chunk
+        detector = TriggerDetector(1.5, 1.0)
+        self.assertEqual(detector.process(cft[:20]), [])
+        self.assertEqual(detector.process(cft[20:40]), [(6, 31)])
+        self.assertEqual(detector.triggers, [])
+
+    def test_batchTriggers(self):
+        """
+        Batch variants of characteristic functions have to give the same
+        results as the single channel routines.
+        """
+        data = self.data.reshape(10, -1)
+        for batch_func, func, args in (
+                (recSTALTABatch, recSTALTA, (10, 100)),
+                (classicSTALTABatch, classicSTALTA, (10, 100)),
+                (delayedSTALTABatch, delayedSTALTA, (10, 100)),
+                (zDetectBatch, zDetect, (10,)),
+                (carlSTATrigBatch, carlSTATrig, (10, 100, 0.8, 0.8))):
+            charfct = batch_func(data, *args)
+            self.assertEqual(charfct.shape, data.shape)
+            for i in xrange(len(data)):
+                np.testing.assert_array_almost_equal(
+                    charfct[i], func(data[i], *args))
+        for batch_func in (recSTALTABatch, classicSTALTABatch):
+            np.testing.assert_array_equal(
+                batch_func(data, 10, 100, threads=4),
+                batch_func(data, 10, 100))
+        # Stream.trigger uses batch routines on traces of same length
+        st = read()
+        st2 = st.copy()
+        st.trigger('classicstalta', sta=0.5, lta=5)
+        for tr in st2:
+            tr.trigger('classicstalta', sta=0.5, lta=5)
+        for tr, tr2 in zip(st, st2):
+            np.testing.assert_array_almost_equal(tr.data, tr2.data)
+            self.assertEqual(tr.stats.processing, tr2.stats.processing)
+
+    def test_coincidenceTriggerChunked(self):
+        """
+        Network coincidence triggers of chunked data have to match those of
+        the whole data, also if an event spans two chunks.
+        """
+        df = 10.0
+        t0 = UTCDateTime(2012, 1, 1)
+        single_triggers = {'A': [(100, 110), (298, 305), (450, 460)],
+                           'B': [(105, 115), (301, 310)],
+                           'C': [(112, 120)]}
+        st = Stream()
+        for sta, triggers in sorted(single_triggers.items()):
+            data = np.zeros(int(600 * df))
+            for on, off in triggers:
+                data[int(on * df):int(off * df)] = 5.0
+            st.append(Trace(data=data, header={
+                'network': 'XX', 'station': sta, 'channel': 'EHZ',
+                'sampling_rate': df, 'starttime': t0}))
+        kwargs = {'trigger_off_extension': 2, 'details': True}
+        expected = coincidenceTrigger(None, 1.0, 0.5, st, 2, **kwargs)
+        self.assertEqual(len(expected), 2)
+        self.assertEqual(expected[0]['stations'], ['A', 'B', 'C'])
+        self.assertEqual(expected[1]['stations'], ['A', 'B'])
+        self.assertAlmostEqual(expected[1]['duration'], 11.9, 5)
+        for splits in ([], [300], [200, 300]):
+            bounds = [0] + splits + [600]
+            chunks = [st.slice(t0 + t1, t0 + t2 - 1 / df)
+                      for t1, t2 in zip(bounds[:-1], bounds[1:])]
+            events = list(coincidenceTriggerChunked(None, 1.0, 0.5, chunks, 2,
+                                                    **kwargs))
+            self.assertEqual(len(events), len(expected))
+            for event, event2 in zip(events, expected):
+                for key in ('time', 'stations', 'trace_ids',
+                            'coincidence_sum'):
+                    self.assertEqual(event[key], event2[key])
+                self.assertAlmostEqual(event['duration'], event2['duration'])
+
 
 def suite():
     return unittest.makeSuite(TriggerTestCase, 'test')
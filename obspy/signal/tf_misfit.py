@@ -21,11 +21,20 @@ Kristekova et. al. (2009).
 """
 
 import numpy as np
+from obspy.core.util import OrderedDict
 from obspy.signal import util
 import matplotlib.pyplot as plt
 from matplotlib.ticker import NullFormatter
 from matplotlib.colors import LinearSegmentedColormap
 
+# wavelet banks of cwt() are cached, see _waveletBank(). The cache holds at
+# most WAVELET_CACHE_BYTES bytes of wavelet banks, larger banks are not cached
+# at all. Set to 0 to disable caching.
+WAVELET_CACHE_BYTES = 32 * 1024 ** 2
+_WAVELET_CACHE = OrderedDict()
+# cwt() transforms blocks of frequencies with spectra of about this size
+_CWT_BLOCK_BYTES = 16 * 1024 ** 2
+
 
 def cwt(st, dt, w0, fmin, fmax, nf=100., wl='morlet'):
     """
@@ -33,7 +42,8 @@ def cwt(st, dt, w0, fmin, fmax, nf=100., wl='morlet'):
 
     .. seealso:: [Kristekova2006]_, eq. (4)
 
-    :param st: time dependent signal.
+    :param st: time dependent signal. Several signals of the same length can
+        be transformed at once with time along the last axis.
     :param dt: time step between two samples in st (in seconds)
     :param w0: parameter for the wavelet, tradeoff between time and frequency
         resolution
@@ -44,15 +54,37 @@ def cwt(st, dt, w0, fmin, fmax, nf=100., wl='morlet'):
     :param wl: wavelet to use, for now only 'morlet' is implemented
 
     :return: time frequency representation of st, type numpy.ndarray of complex
-        values, shape = (nf, len(st)).
+        values, shape = (nf, len(st)). For several signals the shape is
+        st.shape[:-1] + (nf, st.shape[-1]).
     """
-    npts = len(st) * 2
+    st = np.asarray(st)
+    npts = st.shape[-1] * 2
+    nfft = util.nextpow2(npts) * 2
     tmax = (npts - 1) * dt
     t = np.linspace(0., tmax, npts)
     f = np.logspace(np.log10(fmin), np.log10(fmax), nf)
+    tminin = int(t[-1] / 2. / (t[1] - t[0]))
+    psihf = _waveletBank(npts, dt, w0, fmin, fmax, nf, wl, nfft)
+    sf = np.fft.fft(st, n=nfft)[..., np.newaxis, :]
+    cwt = np.empty(st.shape[:-1] + (len(f), npts / 2), dtype=np.complex)
+    # frequencies are transformed block by block to limit memory usage
+    nblock = max(1, _CWT_BLOCK_BYTES // sf.nbytes)
+    for i in xrange(0, len(f), nblock):
+        if psihf is None:
+            block = _wavelets(t, w0, f[i:i + nblock], wl, nfft)
+        else:
+            block = psihf[i:i + nblock]
+        cwt[..., i:i + nblock, :] = \
+            np.fft.ifft(block * sf)[..., tminin:tminin + npts / 2]
+    cwt *= t[1] - t[0]
+    return cwt
 
-    cwt = np.zeros((npts / 2, nf), dtype=np.complex)
 
+def _wavelets(t, w0, f, wl, nfft):
+    """
+    Returns the Fourier transforms of the wavelets of :func:`cwt` for the
+    given frequencies, with shape (len(f), nfft).
+    """
     if wl == 'morlet':
         psi = lambda t: np.pi ** (-.25) * np.exp(1j * w0 * t) * \
             np.exp(-t ** 2 / 2.)
@@ -60,18 +92,227 @@ def cwt(st, dt, w0, fmin, fmax, nf=100., wl='morlet'):
     else:
         raise ValueError('wavelet type "' + wl + '" not defined!')
 
-    nfft = util.nextpow2(npts) * 2
-    sf = np.fft.fft(st, n=nfft)
+    a = scale(f)[:, np.newaxis]
+    # time shift necessary, because wavelet is defined around t = 0
+    psih = psi(-1 * (t - t[-1] / 2.) / a).conjugate() / np.abs(a) ** .5
+    return np.fft.fft(psih, n=nfft)
+
+
+def _waveletBank(npts, dt, w0, fmin, fmax, nf, wl, nfft):
+    """
+    Returns the Fourier transforms of the wavelets for all frequencies of
+    :func:`cwt` from a least recently used cache, or None if the wavelet bank
+    exceeds ``WAVELET_CACHE_BYTES`` by itself.
+    """
+    if int(nf) * nfft * np.dtype(np.complex).itemsize > WAVELET_CACHE_BYTES:
+        return None
+    key = (npts, dt, w0, fmin, fmax, nf, wl, nfft)
+    try:
+        psihf = _WAVELET_CACHE.pop(key)
+    except KeyError:
+        pass
+    else:
+        # reinsert as most recently used
+        _WAVELET_CACHE[key] = psihf
+        return psihf
+    tmax = (npts - 1) * dt
+    t = np.linspace(0., tmax, npts)
+    f = np.logspace(np.log10(fmin), np.log10(fmax), nf)
+    psihf = _wavelets(t, w0, f, wl, nfft)
+    nbytes = sum([bank.nbytes for bank in _WAVELET_CACHE.itervalues()])
+    while _WAVELET_CACHE and nbytes + psihf.nbytes > WAVELET_CACHE_BYTES:
+        nbytes -= _WAVELET_CACHE.popitem(last=False)[1].nbytes
+    _WAVELET_CACHE[key] = psihf
+    return psihf
+
+
+def _cwtPair(st1, st2, dt, w0, fmin, fmax, nf):
+    """
+    Returns the transforms of both signals with shape (number of components,
+    nf, number of time samples), also for single component data.
+    """
+    W1 = cwt(st1, dt, w0, fmin, fmax, nf)
+    W2 = cwt(st2, dt, w0, fmin, fmax, nf)
+    if len(st1.shape) == 1:
+        W1 = W1[np.newaxis]
+        W2 = W2[np.newaxis]
+    return W1, W2
+
+
+def _referenceAmplitude(A1, A2, st2_isref, larger=True):
+    """
+    Returns the amplitude of the reference signal. If none is a reference
+    the one with the larger (or smaller) maximum is used.
+    """
+    if st2_isref:
+        return A2
+    if (A1.max() > A2.max()) == larger:
+        return A1
+    return A2
+
+
+def _tfem(A1, A2, Ar, norm):
+    TFEM = (A1 - A2)
+    if norm == 'global':
+        return TFEM / np.max(Ar)
+    elif norm == 'local':
+        return TFEM / Ar
+    else:
+        raise ValueError('norm "' + norm + '" not defined!')
 
-    for n, _f in enumerate(f):
-        a = scale(_f)
-        # time shift necessary, because wavelet is defined around t = 0
-        psih = psi(-1 * (t - t[-1] / 2.) / a).conjugate() / np.abs(a) ** .5
-        psihf = np.fft.fft(psih, n=nfft)
-        tminin = int(t[-1] / 2. / (t[1] - t[0]))
-        cwt[:, n] = np.fft.ifft(psihf * sf)[tminin:tminin + npts / 2] * \
-            (t[1] - t[0])
-    return cwt.T
+
+def _tfpm(P, Ar, norm):
+    if norm == 'global':
+        return Ar * P / np.max(Ar)
+    elif norm == 'local':
+        return P
+    else:
+        raise ValueError('norm "' + norm + '" not defined!')
+
+
+def _tem(A1, A2, Ar, norm):
+    TEM = np.sum((A1 - A2), axis=1)
+    if norm == 'global':
+        return TEM / np.max(np.sum(Ar, axis=1))
+    elif norm == 'local':
+        return TEM / np.sum(Ar, axis=1)
+    else:
+        raise ValueError('norm "' + norm + '" not defined!')
+
+
+def _tpm(P, Ar, norm):
+    TPM = np.sum(Ar * P, axis=1)
+    if norm == 'global':
+        return TPM / np.max(np.sum(Ar, axis=1))
+    elif norm == 'local':
+        return TPM / np.sum(Ar, axis=1)
+    else:
+        raise ValueError('norm "' + norm + '" not defined!')
+
+
+def _fem(A1, A2, Ar, norm):
+    TEM = np.sum(A1 - A2, axis=2)
+    if norm == 'global':
+        return TEM / np.max(np.sum(Ar, axis=2))
+    elif norm == 'local':
+        return TEM / np.sum(Ar, axis=2)
+    else:
+        raise ValueError('norm "' + norm + '" not defined!')
+
+
+def _fpm(P, Ar, norm):
+    TPM = np.sum(Ar * P, axis=2)
+    if norm == 'global':
+        return TPM / np.max(np.sum(Ar, axis=2))
+    elif norm == 'local':
+        return TPM / np.sum(Ar, axis=2)
+    else:
+        raise ValueError('norm "' + norm + '" not defined!')
+
+
+def _em(A1, A2, Ar, norm):
+    EM = (np.sum(np.sum((A1 - A2) ** 2, axis=2), axis=1)) ** .5
+    if norm == 'global':
+        return EM / ((np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5).max()
+    elif norm == 'local':
+        return EM / (np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5
+    else:
+        raise ValueError('norm "' + norm + '" not defined!')
+
+
+def _pm(P, Ar, norm):
+    PM = (np.sum(np.sum((Ar * P) ** 2, axis=2), axis=1)) ** .5
+    if norm == 'global':
+        return PM / ((np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5).max()
+    elif norm == 'local':
+        return PM / (np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5
+    else:
+        raise ValueError('norm "' + norm + '" not defined!')
+
+
+def _envelopeGof(M, A, k):
+    return A * np.exp(-np.abs(M) ** k)
+
+
+def _phaseGof(M, A, k):
+    return A * (1 - np.abs(M) ** k)
+
+
+def _misfitsAndGofs(W1, W2, norm, st2_isref, A, k, single):
+    """
+    Computes all misfits and Goodness-Of-Fits from the transforms of both
+    signals with shape (number of components, nf, number of time samples).
+    """
+    A1 = np.abs(W1)
+    A2 = np.abs(W2)
+    P = np.angle(W1 / W2) / np.pi
+    Ar = _referenceAmplitude(A1, A2, st2_isref)
+    # the time-dependent phase misfit uses the smaller amplitude, if none of
+    # the signals is a reference
+    Ar_tpm = _referenceAmplitude(A1, A2, st2_isref, larger=False)
+    result = {'TFEM': _tfem(A1, A2, Ar, norm),
+              'TFPM': _tfpm(P, Ar, norm),
+              'TEM': _tem(A1, A2, Ar, norm),
+              'TPM': _tpm(P, Ar_tpm, norm),
+              'FEM': _fem(A1, A2, Ar, norm),
+              'FPM': _fpm(P, Ar, norm),
+              'EM': _em(A1, A2, Ar, norm),
+              'PM': _pm(P, Ar, norm)}
+    for key in result.keys():
+        if single:
+            result[key] = result[key][0]
+        gof = key[:-1] + 'G'
+        if key[-2] == 'E':
+            result[gof] = _envelopeGof(result[key], A, k)
+        else:
+            result[gof] = _phaseGof(result[key], A, k)
+    return result
+
+
+def tfMisfitsAndGofs(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6,
+                     norm='global', st2_isref=True, A=10., k=1.):
+    """
+    All Time Frequency Misfits and Goodness-Of-Fits at once
+
+    Computes the continuous wavelet transforms of both signals only once and
+    derives all misfits of :func:`tfem`, :func:`tfpm`, :func:`tem`,
+    :func:`tpm`, :func:`fem`, :func:`fpm`, :func:`em` and :func:`pm` and the
+    corresponding Goodness-Of-Fits (:func:`tfeg`, :func:`tfpg` etc.) from
+    them.
+
+    .. seealso:: [Kristekova2009]_, Table 1. and 2., Eq.(15) and (16)
+
+    :param st1: signal 1 of two signals to compare, type numpy.ndarray with
+        shape (number of components, number of time samples) or (number of
+        timesamples, ) for single component data. A batch of signal pairs can
+        be given with shape (number of pairs, number of components, number of
+        time samples).
+    :param st2: signal 2 of two signals to compare, type and shape as st1
+    :param dt: time step between two samples in st1 and st2
+    :param fmin: minimal frequency to be analyzed
+    :param fmax: maximal frequency to be analyzed
+    :param nf: number of frequencies (will be chosen with logarithmic spacing)
+    :param w0: parameter for the wavelet, tradeoff between time and frequency
+        resolution
+    :param norm: 'global' or 'local' normalization of the misfit
+    :param st2_isref: Boolean, True if st2 is a reference signal, False if none
+        is a reference
+    :param A: Maximum value of Goodness-Of-Fit for perfect agreement
+    :param k: sensitivity of Goodness-Of-Fit to the misfit
+
+    :return: dictionary with the misfits ('TFEM', 'TFPM', 'TEM', 'TPM', 'FEM',
+        'FPM', 'EM', 'PM') and Goodness-Of-Fits ('TFEG', 'TFPG', 'TEG', 'TPG',
+        'FEG', 'FPG', 'EG', 'PG') as keys, shaped as returned by the single
+        functions. A list of such dictionaries for a batch of signal pairs.
+    """
+    if len(st1.shape) == 3:
+        W1 = cwt(st1, dt, w0, fmin, fmax, nf)
+        W2 = cwt(st2, dt, w0, fmin, fmax, nf)
+        return [_misfitsAndGofs(W1[i], W2[i], norm, st2_isref, A, k, False)
+                for i in xrange(len(st1))]
+    W1, W2 = _cwtPair(st1, st2, dt, w0, fmin, fmax, nf)
+    return _misfitsAndGofs(W1, W2, norm, st2_isref, A, k,
+                           len(st1.shape) == 1)
 
 
 def tfem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
@@ -99,42 +340,12 @@ def tfem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         type numpy.ndarray with shape (nf, len(st1)) for single component data
         and (number of components, nf, len(st1)) for multicomponent data
     """
+    W1, W2 = _cwtPair(st1, st2, dt, w0, fmin, fmax, nf)
+    Ar = _referenceAmplitude(np.abs(W1), np.abs(W2), st2_isref)
+    TFEM = _tfem(np.abs(W1), np.abs(W2), Ar, norm)
     if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
-
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
-
-    if st2_isref:
-        Ar = np.abs(W2)
-    else:
-        if np.abs(W1).max() > np.abs(W2).max():
-            Ar = np.abs(W1)
-        else:
-            Ar = np.abs(W2)
-
-    TFEM = (np.abs(W1) - np.abs(W2))
-
-    if norm == 'global':
-        if len(st1.shape) == 1:
-            return  TFEM[0] / np.max(Ar)
-        else:
-            return  TFEM / np.max(Ar)
-    elif norm == 'local':
-        if len(st1.shape) == 1:
-            return  TFEM[0] / Ar[0]
-        else:
-            return  TFEM / Ar
-    else:
-        raise ValueError('norm "' + norm + '" not defined!')
+        return TFEM[0]
+    return TFEM
 
 
 def tfpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
@@ -162,42 +373,12 @@ def tfpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         type numpy.ndarray with shape (nf, len(st1)) for single component data
         and (number of components, nf, len(st1)) for multicomponent data
     """
+    W1, W2 = _cwtPair(st1, st2, dt, w0, fmin, fmax, nf)
+    Ar = _referenceAmplitude(np.abs(W1), np.abs(W2), st2_isref)
+    TFPM = _tfpm(np.angle(W1 / W2) / np.pi, Ar, norm)
     if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
-
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
-
-    if st2_isref:
-        Ar = np.abs(W2)
-    else:
-        if np.abs(W1).max() > np.abs(W2).max():
-            Ar = np.abs(W1)
-        else:
-            Ar = np.abs(W2)
-
-    TFPM = np.angle(W1 / W2) / np.pi
-
-    if norm == 'global':
-        if len(st1.shape) == 1:
-            return Ar[0] * TFPM[0] / np.max(Ar)
-        else:
-            return Ar * TFPM / np.max(Ar)
-    elif norm == 'local':
-        if len(st1.shape) == 1:
-            return TFPM[0]
-        else:
-            return TFPM
-    else:
-        raise ValueError('norm "' + norm + '" not defined!')
+        return TFPM[0]
+    return TFPM
 
 
 def tem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
@@ -225,42 +406,12 @@ def tem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         (len(st1),) for single component data and (number of components,
         len(st1)) for multicomponent data
     """
+    W1, W2 = _cwtPair(st1, st2, dt, w0, fmin, fmax, nf)
+    Ar = _referenceAmplitude(np.abs(W1), np.abs(W2), st2_isref)
+    TEM = _tem(np.abs(W1), np.abs(W2), Ar, norm)
     if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
-
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
-
-    if st2_isref:
-        Ar = np.abs(W2)
-    else:
-        if np.abs(W1).max() > np.abs(W2).max():
-            Ar = np.abs(W1)
-        else:
-            Ar = np.abs(W2)
-
-    TEM = np.sum((np.abs(W1) - np.abs(W2)), axis=1)
-
-    if norm == 'global':
-        if len(st1.shape) == 1:
-            return TEM[0] / np.max(np.sum(Ar, axis=1))
-        else:
-            return TEM / np.max(np.sum(Ar, axis=1))
-    elif norm == 'local':
-        if len(st1.shape) == 1:
-            return TEM[0] / np.sum(Ar, axis=1)[0]
-        else:
-            return TEM / np.sum(Ar, axis=1)
-    else:
-        raise ValueError('norm "' + norm + '" not defined!')
+        return TEM[0]
+    return TEM
 
 
 def tpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
@@ -288,43 +439,12 @@ def tpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         (len(st1),) for single component data and (number of components,
         len(st1)) for multicomponent data
     """
+    W1, W2 = _cwtPair(st1, st2, dt, w0, fmin, fmax, nf)
+    Ar = _referenceAmplitude(np.abs(W1), np.abs(W2), st2_isref, larger=False)
+    TPM = _tpm(np.angle(W1 / W2) / np.pi, Ar, norm)
     if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
-
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
-
-    if st2_isref:
-        Ar = np.abs(W2)
-    else:
-        if np.abs(W1).max() > np.abs(W2).max():
-            Ar = np.abs(W2)
-        else:
-            Ar = np.abs(W1)
-
-    TPM = np.angle(W1 / W2) / np.pi
-    TPM = np.sum(Ar * TPM, axis=1)
-
-    if norm == 'global':
-        if len(st1.shape) == 1:
-            return TPM[0] / np.max(np.sum(Ar, axis=1))
-        else:
-            return TPM / np.max(np.sum(Ar, axis=1))
-    elif norm == 'local':
-        if len(st1.shape) == 1:
-            return TPM[0] / np.sum(Ar, axis=1)[0]
-        else:
-            return TPM / np.sum(Ar, axis=1)
-    else:
-        raise ValueError('norm "' + norm + '" not defined!')
+        return TPM[0]
+    return TPM
 
 
 def fem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
@@ -352,43 +472,12 @@ def fem(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         (nf,) for single component data and (number of components, nf) for
         multicomponent data
     """
+    W1, W2 = _cwtPair(st1, st2, dt, w0, fmin, fmax, nf)
+    Ar = _referenceAmplitude(np.abs(W1), np.abs(W2), st2_isref)
+    FEM = _fem(np.abs(W1), np.abs(W2), Ar, norm)
     if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
-
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
-
-    if st2_isref:
-        Ar = np.abs(W2)
-    else:
-        if np.abs(W1).max() > np.abs(W2).max():
-            Ar = np.abs(W1)
-        else:
-            Ar = np.abs(W2)
-
-    TEM = np.abs(W1) - np.abs(W2)
-    TEM = np.sum(TEM, axis=2)
-
-    if norm == 'global':
-        if len(st1.shape) == 1:
-            return TEM[0] / np.max(np.sum(Ar, axis=2))
-        else:
-            return TEM / np.max(np.sum(Ar, axis=2))
-    elif norm == 'local':
-        if len(st1.shape) == 1:
-            return TEM[0] / np.sum(Ar, axis=2)[0]
-        else:
-            return TEM / np.sum(Ar, axis=2)
-    else:
-        raise ValueError('norm "' + norm + '" not defined!')
+        return FEM[0]
+    return FEM
 
 
 def fpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
@@ -416,43 +505,12 @@ def fpm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
         (nf,) for single component data and (number of components, nf) for
         multicomponent data
     """
+    W1, W2 = _cwtPair(st1, st2, dt, w0, fmin, fmax, nf)
+    Ar = _referenceAmplitude(np.abs(W1), np.abs(W2), st2_isref)
+    FPM = _fpm(np.angle(W1 / W2) / np.pi, Ar, norm)
     if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
-
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
-
-    if st2_isref:
-        Ar = np.abs(W2)
-    else:
-        if np.abs(W1).max() > np.abs(W2).max():
-            Ar = np.abs(W1)
-        else:
-            Ar = np.abs(W2)
-
-    TPM = np.angle(W1 / W2) / np.pi
-    TPM = np.sum(Ar * TPM, axis=2)
-
-    if norm == 'global':
-        if len(st1.shape) == 1:
-            return TPM[0] / np.max(np.sum(Ar, axis=2))
-        else:
-            return TPM / np.max(np.sum(Ar, axis=2))
-    elif norm == 'local':
-        if len(st1.shape) == 1:
-            return TPM[0] / np.sum(Ar, axis=2)[0]
-        else:
-            return TPM / np.sum(Ar, axis=2)
-    else:
-        raise ValueError('norm "' + norm + '" not defined!')
+        return FPM[0]
+    return FPM
 
 
 def em(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
@@ -478,42 +536,12 @@ def em(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
 
     :return: Single Valued Envelope Misfit
     """
+    W1, W2 = _cwtPair(st1, st2, dt, w0, fmin, fmax, nf)
+    Ar = _referenceAmplitude(np.abs(W1), np.abs(W2), st2_isref)
+    EM = _em(np.abs(W1), np.abs(W2), Ar, norm)
     if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
-
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
-
-    if st2_isref:
-        Ar = np.abs(W2)
-    else:
-        if np.abs(W1).max() > np.abs(W2).max():
-            Ar = np.abs(W1)
-        else:
-            Ar = np.abs(W2)
-
-    EM = (np.sum(np.sum((np.abs(W1) - np.abs(W2)) ** 2, axis=2), axis=1)) ** .5
-
-    if norm == 'global':
-        if len(st1.shape) == 1:
-            return EM[0] / (np.sum(Ar ** 2)) ** .5
-        else:
-            return EM / ((np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5).max()
-    elif norm == 'local':
-        if len(st1.shape) == 1:
-            return EM[0] / (np.sum(Ar ** 2)) ** .5
-        else:
-            return EM / (np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5
-    else:
-        raise ValueError('norm "' + norm + '" not defined!')
+        return EM[0]
+    return EM
 
 
 def pm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
@@ -539,44 +567,12 @@ def pm(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
 
     :return: Single Valued Phase Misfit
     """
+    W1, W2 = _cwtPair(st1, st2, dt, w0, fmin, fmax, nf)
+    Ar = _referenceAmplitude(np.abs(W1), np.abs(W2), st2_isref)
+    PM = _pm(np.angle(W1 / W2) / np.pi, Ar, norm)
     if len(st1.shape) == 1:
-        W1 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-        W2 = np.zeros((1, nf, st1.shape[0]), dtype=np.complex)
-
-        W1[0] = cwt(st1, dt, w0, fmin, fmax, nf)
-        W2[0] = cwt(st2, dt, w0, fmin, fmax, nf)
-    else:
-        W1 = np.zeros((st1.shape[0], nf, st1.shape[1]), dtype=np.complex)
-        W2 = np.zeros((st2.shape[0], nf, st2.shape[1]), dtype=np.complex)
-
-        for i in np.arange(st1.shape[0]):
-            W1[i] = cwt(st1[i], dt, w0, fmin, fmax, nf)
-            W2[i] = cwt(st2[i], dt, w0, fmin, fmax, nf)
-
-    if st2_isref:
-        Ar = np.abs(W2)
-    else:
-        if np.abs(W1).max() > np.abs(W2).max():
-            Ar = np.abs(W1)
-        else:
-            Ar = np.abs(W2)
-
-    PM = np.angle(W1 / W2) / np.pi
-
-    PM = (np.sum(np.sum((Ar * PM) ** 2, axis=2), axis=1)) ** .5
-
-    if norm == 'global':
-        if len(st1.shape) == 1:
-            return PM[0] / (np.sum(Ar ** 2)) ** .5
-        else:
-            return PM / ((np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5).max()
-    elif norm == 'local':
-        if len(st1.shape) == 1:
-            return PM[0] / (np.sum(Ar ** 2)) ** .5
-        else:
-            return PM / (np.sum(np.sum(Ar ** 2, axis=2), axis=1)) ** .5
-    else:
-        raise ValueError('norm "' + norm + '" not defined!')
+        return PM[0]
+    return PM
 
 
 def tfeg(st1, st2, dt=0.01, fmin=1., fmax=10., nf=100, w0=6, norm='global',
@@ -959,23 +955,17 @@ def plotTfMisfits(st1, st2, dt=0.01, t0=0., fmin=1., fmax=10., nf=100, w0=6,
 
         cmap = LinearSegmentedColormap('cmap_tfm', CDICT_TFM, 1024)
 
-    # compute time frequency misfits
-    TFEM = tfem(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-                st2_isref=st2_isref)
-    TEM = tem(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref)
-    FEM = fem(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref)
-    EM = em(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-            st2_isref=st2_isref)
-    TFPM = tfpm(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref)
-    TPM = tpm(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref)
-    FPM = fpm(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref)
-    PM = pm(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-            st2_isref=st2_isref)
+    # compute time frequency misfits from one pair of transforms
+    result = tfMisfitsAndGofs(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf,
+                              w0=w0, norm=norm, st2_isref=st2_isref)
+    TFEM = result['TFEM']
+    TEM = result['TEM']
+    FEM = result['FEM']
+    EM = result['EM']
+    TFPM = result['TFPM']
+    TPM = result['TPM']
+    FPM = result['FPM']
+    PM = result['PM']
 
     if len(st1.shape) == 1:
         TFEM = TFEM.reshape((1, nf, npts))
@@ -1229,23 +1219,17 @@ def plotTfGofs(st1, st2, dt=0.01, t0=0., fmin=1., fmax=10., nf=100, w0=6,
 
         cmap = LinearSegmentedColormap('cmap_gof', CDICT_GOF, 1024)
 
-    # compute time frequency misfits
-    TFEG = tfeg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-                st2_isref=st2_isref, A=A, k=k)
-    TEG = teg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref, A=A, k=k)
-    FEG = feg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref, A=A, k=k)
-    EG = eg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-            st2_isref=st2_isref, A=A, k=k)
-    TFPG = tfpg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref, A=A, k=k)
-    TPG = tpg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref, A=A, k=k)
-    FPG = fpg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-              st2_isref=st2_isref, A=A, k=k)
-    PG = pg(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf, w0=w0, norm=norm,
-            st2_isref=st2_isref, A=A, k=k)
+    # compute time frequency misfits from one pair of transforms
+    result = tfMisfitsAndGofs(st1, st2, dt=dt, fmin=fmin, fmax=fmax, nf=nf,
+                              w0=w0, norm=norm, st2_isref=st2_isref, A=A, k=k)
+    TFEG = result['TFEG']
+    TEG = result['TEG']
+    FEG = result['FEG']
+    EG = result['EG']
+    TFPG = result['TFPG']
+    TPG = result['TPG']
+    FPG = result['FPG']
+    PG = result['PG']
 
     if len(st1.shape) == 1:
         TFEG = TFEG.reshape((1, nf, npts))
@@ -1476,23 +1460,10 @@ def plotTfr(st, dt=0.01, t0=0., fmin=1., fmax=10., nf=100, w0=6, left=0.1,
         cmap = LinearSegmentedColormap('cmap_tfr', CDICT_TFR, 1024)
 
     if len(st.shape) == 1:
-        W = np.zeros((1, nf, npts), dtype=np.complex)
-        W[0] = cwt(st, dt, w0, fmin, fmax, nf)
-        ntr = 1
-
-        spec = np.zeros((1, nfft / 2 + 1), dtype=np.complex)
-        spec[0] = np.fft.rfft(st, n=nfft) * dt
-
         st = st.reshape((1, npts))
-    else:
-        W = np.zeros((st.shape[0], nf, npts), dtype=np.complex)
-        spec = np.zeros((st.shape[0], nfft / 2 + 1), dtype=np.complex)
-
-        for i in np.arange(st.shape[0]):
-            W[i] = cwt(st[i], dt, w0, fmin, fmax, nf)
-            spec[i] = np.fft.rfft(st[i], n=nfft) * dt
-
-        ntr = st.shape[0]
+    W = cwt(st, dt, w0, fmin, fmax, nf)
+    spec = np.fft.rfft(st, n=nfft) * dt
+    ntr = st.shape[0]
 
     if mode == 'absolute':
         TFR = np.abs(W)
@@ -28,7 +28,9 @@ characteristic functions and a coincidence triggering routine.
 import warnings
 import ctypes as C
 from collections import deque
+from multiprocessing.pool import ThreadPool
 import numpy as np
+from scipy.signal import lfilter
 from obspy import UTCDateTime
 from obspy.signal.headers import clibsignal, head_stalta_t
 from obspy.signal.cross_correlation import templatesMaxSimilarity
@@ -124,40 +126,7 @@ def carlSTATrig(a, nsta, nlta, ratio, quiet):
     :rtype: NumPy ndarray
     :return: Characteristic function of CarlStaTrig
     """
-    m = len(a)
-    #
-    sta = np.zeros(len(a), dtype='float64')
-    lta = np.zeros(len(a), dtype='float64')
-    star = np.zeros(len(a), dtype='float64')
-    ltar = np.zeros(len(a), dtype='float64')
-    pad_sta = np.zeros(nsta)
-    pad_lta = np.zeros(nlta)  # avoid for 0 division 0/1=0
-    #
-    # compute the short time average (STA)
-    for i in xrange(nsta):  # window size to smooth over
-        sta += np.concatenate((pad_sta, a[i:m - nsta + i]))
-    sta /= nsta
-    #
-    # compute the long time average (LTA), 8 sec average over sta
-    for i in xrange(nlta):  # window size to smooth over
-        lta += np.concatenate((pad_lta, sta[i:m - nlta + i]))
-    lta /= nlta
-    lta = np.concatenate((np.zeros(1), lta))[:m]  # XXX ???
-    #
-    # compute star, average of abs diff between trace and lta
-    for i in xrange(nsta):  # window size to smooth over
-        star += np.concatenate((pad_sta,
-                               abs(a[i:m - nsta + i] - lta[i:m - nsta + i])))
-    star /= nsta
-    #
-    # compute ltar, 8 sec average over star
-    for i in xrange(nlta):  # window size to smooth over
-        ltar += np.concatenate((pad_lta, star[i:m - nlta + i]))
-    ltar /= nlta
-    #
-    eta = star - (ratio * ltar) - abs(sta - lta) - quiet
-    eta[:nlta] = -1.0
-    return eta
+    return carlSTATrigBatch(a, nsta, nlta, ratio, quiet)[0]
 
 
 def classicSTALTA(a, nsta, nlta):
@@ -258,19 +227,7 @@ def delayedSTALTA(a, nsta, nlta):
 
     .. seealso:: [Withers1998]_ (p. 98) and [Trnkoczy2012]_
     """
-    m = len(a)
-    #
-    # compute the short time average (STA) and long time average (LTA)
-    # don't start for STA at nsta because it's muted later anyway
-    sta = np.zeros(m, dtype='float64')
-    lta = np.zeros(m, dtype='float64')
-    for i in xrange(m):
-        sta[i] = (a[i] ** 2 + a[i - nsta] ** 2) / nsta + sta[i - 1]
-        lta[i] = (a[i - nsta - 1] ** 2 + a[i - nsta - nlta - 1] ** 2) / \
-                 nlta + lta[i - 1]
-    sta[0:nlta + nsta + 50] = 0
-    lta[0:nlta + nsta + 50] = 1  # avoid division by zero
-    return sta / lta
+    return delayedSTALTABatch(a, nsta, nlta)[0]
 
 
 def zDetect(a, nsta):
@@ -281,18 +238,211 @@ def zDetect(a, nsta):
 
     .. seealso:: [Withers1998]_, p. 99
     """
-    m = len(a)
-    #
+    return zDetectBatch(a, nsta)[0]
+
+
+def _movingSum(a, n):
+    """
+    Moving sum over the ``n`` samples preceding each sample (excluding the
+    sample itself) along the last axis. The first ``n`` samples are zero.
+    """
+    out = np.zeros(a.shape, dtype='float64')
+    m = a.shape[-1]
+    if n < m:
+        csum = np.cumsum(a, axis=-1)
+        out[..., n] = csum[..., n - 1]
+        out[..., n + 1:] = csum[..., n:m - 1] - csum[..., :m - n - 1]
+    return out
+
+
+def _applyRows(func, a, threads):
+    """
+    Apply a C routine writing into a preallocated output array to all rows of
+    a 2-D array, optionally using several threads. The GIL is released during
+    the foreign function calls, so the threads run in parallel.
+    """
+    out = np.zeros(a.shape, dtype='float64')
+
+    def _work(i):
+        func(a[i], out[i])
+
+    if threads is not None and threads > 1 and len(a) > 1:
+        pool = ThreadPool(min(threads, len(a)))
+        try:
+            pool.map(_work, xrange(len(a)))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for i in xrange(len(a)):
+            _work(i)
+    return out
+
+
+def _require2D(a):
+    """
+    Return data as C contiguous 2-D float64 array with one channel per row.
+    """
+    a = np.require(a, 'float64', ['C_CONTIGUOUS'])
+    if a.ndim == 1:
+        a = a.reshape(1, -1)
+    if a.ndim != 2:
+        msg = "Data has to be a 2-D array (channels x samples)."
+        raise ValueError(msg)
+    return a
+
+
+def recSTALTABatch(a, nsta, nlta, threads=None):
+    """
+    Recursive STA/LTA for many channels at once.
+
+    Same as :func:`~obspy.signal.trigger.recSTALTA` applied to every row of
+    ``a``.
+
+    :type a: NumPy ndarray
+    :param a: 2-D array of seismic traces (channels x samples)
+    :type nsta: Int
+    :param nsta: Length of short time average window in samples
+    :type nlta: Int
+    :param nlta: Length of long time average window in samples
+    :type threads: Int
+    :param threads: Number of threads to distribute the channels on.
+    :rtype: NumPy ndarray dtype float64
+    :return: Characteristic functions of recursive STA/LTA (channels x
+        samples)
+    """
+    a = _require2D(a)
+    ndat = a.shape[1]
+
+    def _func(data, charfct):
+        clibsignal.recstalta(data, charfct, ndat, nsta, nlta)
+
+    return _applyRows(_func, a, threads)
+
+
+def classicSTALTABatch(a, nsta, nlta, threads=None):
+    """
+    Classic STA/LTA for many channels at once.
+
+    Same as :func:`~obspy.signal.trigger.classicSTALTA` applied to every row
+    of ``a``.
+
+    :type a: NumPy ndarray
+    :param a: 2-D array of seismic traces (channels x samples)
+    :type nsta: Int
+    :param nsta: Length of short time average window in samples
+    :type nlta: Int
+    :param nlta: Length of long time average window in samples
+    :type threads: Int
+    :param threads: Number of threads to distribute the channels on.
+    :rtype: NumPy ndarray dtype float64
+    :return: Characteristic functions of classic STA/LTA (channels x samples)
+    """
+    a = _require2D(a)
+    if a.shape[1] < nlta:
+        raise Exception('ERROR 1 stalta: len(data) < nlta')
+    head = np.empty(1, dtype=head_stalta_t)
+    head[:] = (a.shape[1], nsta, nlta)
+
+    def _func(data, charfct):
+        clibsignal.stalta(head, data, charfct)
+
+    return _applyRows(_func, a, threads)
+
+
+def delayedSTALTABatch(a, nsta, nlta):
+    """
+    Delayed STA/LTA for many channels at once.
+
+    Same as :func:`~obspy.signal.trigger.delayedSTALTA` applied to every row
+    of ``a``.
+
+    :type a: NumPy ndarray
+    :param a: 2-D array of seismic traces (channels x samples)
+    :type nsta: Int
+    :param nsta: Length of short time average window in samples
+    :type nlta: Int
+    :param nlta: Length of long time average window in samples
+    :rtype: NumPy ndarray dtype float64
+    :return: Characteristic functions of delayed STA/LTA (channels x samples)
+    """
+    sq = _require2D(a) ** 2
+    # the recursion refers to samples before the start of the data by
+    # negative indices, i.e. it wraps around to the end of the data
+    sta = np.cumsum((sq + np.roll(sq, nsta, axis=1)) / nsta, axis=1)
+    lta = np.cumsum((np.roll(sq, nsta + 1, axis=1) +
+                     np.roll(sq, nsta + nlta + 1, axis=1)) / nlta, axis=1)
+    sta[:, 0:nlta + nsta + 50] = 0
+    lta[:, 0:nlta + nsta + 50] = 1  # avoid division by zero
+    return sta / lta
+
+
+def zDetectBatch(a, nsta):
+    """
+    Z-detector for many channels at once.
+
+    Same as :func:`~obspy.signal.trigger.zDetect` applied to every row of
+    ``a``.
+
+    :type a: NumPy ndarray
+    :param a: 2-D array of seismic traces (channels x samples)
+    :param nsta: Window length in Samples.
+    :rtype: NumPy ndarray dtype float64
+    :return: Characteristic functions of Z-detector (channels x samples)
+    """
     # Z-detector given by Swindell and Snell (1977)
-    sta = np.zeros(len(a), dtype='float64')
-    # Standard Sta
-    pad_sta = np.zeros(nsta)
-    for i in xrange(nsta):  # window size to smooth over
-        sta = sta + np.concatenate((pad_sta, a[i:m - nsta + i] ** 2))
-    a_mean = np.mean(sta)
-    a_std = np.std(sta)
-    Z = (sta - a_mean) / a_std
-    return Z
+    sta = _movingSum(_require2D(a) ** 2, nsta)
+    a_mean = sta.mean(axis=1)[:, np.newaxis]
+    a_std = sta.std(axis=1)[:, np.newaxis]
+    return (sta - a_mean) / a_std
+
+
+def carlSTATrigBatch(a, nsta, nlta, ratio, quiet):
+    """
+    Computes the carlSTATrig characteristic function for many channels at
+    once.
+
+    Same as :func:`~obspy.signal.trigger.carlSTATrig` applied to every row
+    of ``a``.
+
+    :type a: NumPy ndarray
+    :param a: 2-D array of seismic traces (channels x samples)
+    :type nsta: Int
+    :param nsta: Length of short time average window in samples
+    :type nlta: Int
+    :param nlta: Length of long time average window in samples
+    :type ration: Float
+    :param ratio: as ratio gets smaller, carlSTATrig gets more sensitive
+    :type quiet: Float
+    :param quiet: as quiet gets smaller, carlSTATrig gets more sensitive
+    :rtype: NumPy ndarray dtype float64
+    :return: Characteristic functions of CarlStaTrig (channels x samples)
+    """
+    a = _require2D(a)
+    # compute the short time average (STA)
+    sta = _movingSum(a, nsta) / nsta
+    # compute the long time average (LTA), 8 sec average over sta, delayed
+    # by one sample
+    lta = np.zeros(a.shape, dtype='float64')
+    lta[:, 1:] = (_movingSum(sta, nlta) / nlta)[:, :-1]
+    # compute star, average of abs diff between trace and lta
+    star = _movingSum(np.abs(a - lta), nsta) / nsta
+    # compute ltar, 8 sec average over star
+    ltar = _movingSum(star, nlta) / nlta
+    eta = star - (ratio * ltar) - abs(sta - lta) - quiet
+    eta[:, :nlta] = -1.0
+    return eta
+
+
+# batch variants of characteristic functions working on 2-D arrays
+# (channels x samples), keys as used in Trace.trigger()/Stream.trigger()
+BATCH_TRIGGER_FUNCTIONS = {
+    'recstalta': recSTALTABatch,
+    'classicstalta': classicSTALTABatch,
+    'delayedstalta': delayedSTALTABatch,
+    'zdetect': zDetectBatch,
+    'carlstatrig': carlSTATrigBatch,
+}
 
 
 def triggerOnset(charfct, thres1, thres2, max_len=9e99, max_len_delete=False):
@@ -344,7 +494,7 @@ def triggerOnset(charfct, thres1, thres2, max_len=9e99, max_len_delete=False):
     #
     on = deque([ind1[0]])
     of = deque([-1])
-    of.extend(ind2[np.diff(ind2) > 1].tolist())
+    of.extend(ind2[np.where(np.diff(ind2) > 1)[0]].tolist())
     on.extend(ind1[np.where(np.diff(ind1) > 1)[0] + 1].tolist())
     # include last pick if trigger is on or drop it
     if max_len_delete:
@@ -370,6 +520,327 @@ def triggerOnset(charfct, thres1, thres2, max_len=9e99, max_len_delete=False):
     return np.array(pick)
 
 
+class RecSTALTADetector(object):
+    """
+    Recursive STA/LTA for continuous data processed in consecutive chunks.
+
+    The STA and LTA accumulators are kept between calls, so feeding data
+    chunk by chunk gives exactly the same characteristic function as
+    :func:`~obspy.signal.trigger.recSTALTA` on the whole data (including
+    the zeroed LTA warm-up at the start) at a cost proportional to the chunk
+    length.
+
+    Instances are callables taking and returning an array and can therefore
+    directly be used as a real time process in
+    :meth:`~obspy.realtime.rttrace.RtTrace.registerRtProcess`.
+
+    :type nsta: Int
+    :param nsta: Length of short time average window in samples
+    :type nlta: Int
+    :param nlta: Length of long time average window in samples
+
+    .. rubric:: Example
+
+    >>> from obspy import read
+    >>> tr = read()[0]
+    >>> detector = RecSTALTADetector(50, 500)
+    >>> cft = np.concatenate([detector(tr.data[i:i + 512])
+    ...                       for i in xrange(0, len(tr), 512)])
+    >>> np.allclose(cft, recSTALTA(tr.data, 50, 500))
+    True
+    """
+    def __init__(self, nsta, nlta):
+        self.nsta = nsta
+        self.nlta = nlta
+        self.reset()
+
+    def reset(self):
+        """
+        Reset STA and LTA accumulators (e.g. after a gap in the data).
+        """
+        self._sta = 0.0
+        self._lta = 0.0
+        self._count = 0
+
+    def __call__(self, a):
+        """
+        Compute characteristic function for the next chunk of data.
+
+        :type a: NumPy ndarray
+        :param a: Next chunk of seismic trace data
+        :rtype: NumPy ndarray dtype float64
+        :return: Characteristic function of recursive STA/LTA for the chunk
+        """
+        sq = np.require(a, 'float64') ** 2
+        if len(sq) == 0:
+            return sq
+        if self._count == 0:
+            # first sample is not used (see recstalta.c)
+            sq[0] = 0.0
+        csta = 1. / self.nsta
+        clta = 1. / self.nlta
+        sta = lfilter([csta], [1.0, csta - 1.0], sq,
+                      zi=[(1 - csta) * self._sta])[0]
+        lta = lfilter([clta], [1.0, clta - 1.0], sq,
+                      zi=[(1 - clta) * self._lta])[0]
+        self._sta = sta[-1]
+        self._lta = lta[-1]
+        charfct = np.zeros(len(sq), dtype='float64')
+        # LTA warm-up is muted
+        start = max(self.nlta - self._count, 0)
+        charfct[start:] = sta[start:] / lta[start:]
+        self._count += len(sq)
+        return charfct
+
+
+class ClassicSTALTADetector(object):
+    """
+    Classic STA/LTA for continuous data processed in consecutive chunks.
+
+    The last ``nlta`` squared samples are kept in a ring buffer together with
+    the running STA and LTA sums, so feeding data chunk by chunk gives the
+    same characteristic function as :func:`~obspy.signal.trigger.classicSTALTA`
+    on the whole data at a cost proportional to the chunk length.
+
+    Instances are callables taking and returning an array and can therefore
+    directly be used as a real time process in
+    :meth:`~obspy.realtime.rttrace.RtTrace.registerRtProcess`.
+
+    :type nsta: Int
+    :param nsta: Length of short time average window in samples
+    :type nlta: Int
+    :param nlta: Length of long time average window in samples
+
+    .. rubric:: Example
+
+    >>> from obspy import read
+    >>> tr = read()[0]
+    >>> detector = ClassicSTALTADetector(50, 500)
+    >>> cft = np.concatenate([detector(tr.data[i:i + 512])
+    ...                       for i in xrange(0, len(tr), 512)])
+    >>> np.allclose(cft, classicSTALTA(tr.data, 50, 500))
+    True
+    """
+    # number of samples after which running sums are recomputed from the
+    # buffer to avoid accumulation of rounding errors
+    _resync_interval = 2 ** 20
+
+    def __init__(self, nsta, nlta):
+        if not 0 < nsta <= nlta:
+            msg = "nsta has to be positive and not larger than nlta."
+            raise ValueError(msg)
+        self.nsta = nsta
+        self.nlta = nlta
+        self.reset()
+
+    def reset(self):
+        """
+        Reset buffer and running sums (e.g. after a gap in the data).
+        """
+        self._buffer = np.zeros(self.nlta, dtype='float64')
+        # position of the oldest sample in the ring buffer
+        self._pos = 0
+        self._sta = 0.0
+        self._lta = 0.0
+        self._count = 0
+        self._since_resync = 0
+
+    def _leaving(self, sq, width):
+        """
+        Squared samples leaving a window of given width when the samples of
+        the current chunk enter it.
+        """
+        n = len(sq)
+        leaving = np.empty(n, dtype='float64')
+        nbuf = min(n, width)
+        index = (self._pos + self.nlta - width + np.arange(nbuf)) % self.nlta
+        leaving[:nbuf] = self._buffer[index]
+        leaving[nbuf:] = sq[:n - nbuf]
+        return leaving
+
+    def __call__(self, a):
+        """
+        Compute characteristic function for the next chunk of data.
+
+        :type a: NumPy ndarray
+        :param a: Next chunk of seismic trace data
+        :rtype: NumPy ndarray dtype float64
+        :return: Characteristic function of classic STA/LTA for the chunk
+        """
+        sq = np.require(a, 'float64') ** 2
+        n = len(sq)
+        if n == 0:
+            return sq
+        sta = self._sta + np.cumsum(sq - self._leaving(sq, self.nsta))
+        lta = self._lta + np.cumsum(sq - self._leaving(sq, self.nlta))
+        self._sta = sta[-1]
+        self._lta = lta[-1]
+        # update ring buffer with the last nlta squared samples
+        if n >= self.nlta:
+            self._buffer[:] = sq[-self.nlta:]
+            self._pos = 0
+        else:
+            index = (self._pos + np.arange(n)) % self.nlta
+            self._buffer[index] = sq
+            self._pos = (self._pos + n) % self.nlta
+        charfct = np.zeros(n, dtype='float64')
+        # samples before the LTA window is filled up are muted
+        start = max(self.nlta - 1 - self._count, 0)
+        charfct[start:] = sta[start:] / lta[start:] * \
+            (float(self.nlta) / self.nsta)
+        self._count += n
+        self._since_resync += n
+        if self._since_resync >= self._resync_interval:
+            buf = np.roll(self._buffer, -self._pos)
+            self._lta = buf.sum()
+            self._sta = buf[-self.nsta:].sum()
+            self._since_resync = 0
+        return charfct
+
+
+class TriggerDetector(object):
+    """
+    Trigger on and off detection on a characteristic function processed in
+    consecutive chunks.
+
+    Equivalent to :func:`~obspy.signal.trigger.triggerOnset` but the trigger
+    state (on/off, time of last trigger on) is kept between calls, so
+    triggers spanning chunk boundaries are detected correctly. Trigger on
+    and off times are returned as sample indices counted from the first
+    sample ever processed.
+
+    Instances are callables taking the characteristic function and
+    returning it unchanged, completed triggers are appended to
+    :attr:`triggers`. That way they can be registered as a real time process
+    in :meth:`~obspy.realtime.rttrace.RtTrace.registerRtProcess` after
+    a characteristic function process.
+
+    :type thres1: Float
+    :param thres1: Value above which trigger (of characteristic function)
+                   is activated (higher threshold)
+    :type thres2: Float
+    :param thres2: Value below which trigger (of characteristic function)
+        is deactivated (lower threshold)
+    :type max_len: Int
+    :param max_len: Maximum length of triggered event in samples. A new
+                    event will be triggered as soon as the signal reaches
+                    again above thres1.
+    :type max_len_delete: Bool
+    :param max_len_delete: Do not report events longer than max_len.
+
+    .. rubric:: Example
+
+    >>> from obspy.realtime import RtTrace
+    >>> from obspy import read
+    >>> tr = read()[0]
+    >>> tr.filter("bandpass", freqmin=1, freqmax=20)
+    >>> rt_trace = RtTrace()
+    >>> rt_trace.registerRtProcess(RecSTALTADetector(50, 400))
+    1
+    >>> detector = TriggerDetector(4.0, 0.7)
+    >>> rt_trace.registerRtProcess(detector)
+    2
+    >>> for chunk in tr / 6:
+    ...     _ = rt_trace.append(chunk)
+    >>> detector.triggers
+    [(478, 966)]
+    """
+    def __init__(self, thres1, thres2, max_len=9e99, max_len_delete=False):
+        self.thres1 = thres1
+        self.thres2 = thres2
+        self.max_len = max_len
+        self.max_len_delete = max_len_delete
+        self.triggers = []
+        self.reset()
+
+    def reset(self):
+        """
+        Reset trigger state. Sample counting starts again at zero.
+        """
+        self._count = 0
+        # sample index of current trigger on, None if not triggered
+        self._on = None
+        # waiting for the end of a too long trigger that gets deleted
+        self._skip = False
+        self._above1 = False
+
+    def process(self, charfct):
+        """
+        Process the next chunk of the characteristic function.
+
+        :type charfct: NumPy ndarray
+        :param charfct: Next chunk of characteristic function
+        :rtype: List
+        :return: List of trigger on and off sample indices of all triggers
+            completed in this chunk
+        """
+        charfct = np.asarray(charfct)
+        n = len(charfct)
+        if n == 0:
+            return []
+        above1 = charfct > self.thres1
+        previous = np.concatenate(([self._above1], above1[:-1]))
+        # first samples of intervals above thres1 (trigger on candidates)
+        rising = np.where(above1 & ~previous)[0]
+        # samples below thres2 (the sample before ends a trigger)
+        below2 = np.where(charfct <= self.thres2)[0]
+        count = self._count
+        last = count + n - 1
+        picks = []
+        i = 0
+        while True:
+            if self._skip:
+                k = below2.searchsorted(i)
+                if k == len(below2):
+                    break
+                self._skip = False
+                i = below2[k]
+            if self._on is None:
+                k = rising.searchsorted(i)
+                if k == len(rising):
+                    break
+                i = rising[k]
+                self._on = count + i
+            # first sample below thres2 after trigger on
+            k = below2.searchsorted(max(i, self._on - count + 1))
+            if k < len(below2):
+                off = count + below2[k] - 1
+            else:
+                off = None
+            on = self._on
+            if off is not None and off - on <= self.max_len:
+                picks.append((on, off))
+                self._on = None
+                i = below2[k]
+            elif off is None and last - on <= self.max_len:
+                # trigger still active at the end of the chunk
+                break
+            elif self.max_len_delete:
+                self._on = None
+                self._skip = True
+            else:
+                off = int(on + self.max_len)
+                picks.append((on, off))
+                self._on = None
+                i = off - count + 1
+        self._above1 = bool(above1[-1])
+        self._count += n
+        return picks
+
+    def __call__(self, charfct):
+        """
+        Process the next chunk of the characteristic function and store
+        completed triggers in :attr:`triggers`.
+
+        :type charfct: NumPy ndarray
+        :param charfct: Next chunk of characteristic function
+        :rtype: NumPy ndarray
+        :return: The unchanged characteristic function
+        """
+        self.triggers.extend(self.process(charfct))
+        return charfct
+
+
 def pkBaer(reltrc, samp_int, tdownmax, tupevent, thr1, thr2, preset_len,
            p_dur):
     """
@@ -598,106 +1069,262 @@ def coincidenceTrigger(trigger_type, thr_on, thr_off, stream,
     # we always work with a dictionary with trace ids and their weights later
     if isinstance(trace_ids, list) or isinstance(trace_ids, tuple):
         trace_ids = dict.fromkeys(trace_ids, 1)
-    # set up similarity thresholds as a dictionary if necessary
-    if not isinstance(similarity_threshold, dict):
-        similarity_threshold = dict.fromkeys([tr.stats.station for tr in st],
-                                             similarity_threshold)
-
     # the single station triggering
+    triggers = _singleStationTriggers(st, trigger_type, thr_on, thr_off,
+                                      trace_ids, max_trigger_length,
+                                      delete_long_trigger, **options)
+    # the coincidence triggering and coincidence sum computation
+    associator = _CoincidenceAssociator(thr_coincidence_sum, trace_ids,
+                                        trigger_off_extension, details,
+                                        event_templates, similarity_threshold)
+    return associator.associate(triggers, stream)
+
+
+def coincidenceTriggerChunked(trigger_type, thr_on, thr_off, streams,
+                              thr_coincidence_sum, trace_ids=None,
+                              max_trigger_length=1e6,
+                              delete_long_trigger=False,
+                              trigger_off_extension=0, details=False,
+                              event_templates={}, similarity_threshold=0.7,
+                              **options):
+    """
+    Perform a network coincidence trigger on consecutive chunks of data.
+
+    Works like :func:`coincidenceTrigger` but takes an iterable of streams
+    holding consecutive, non-overlapping time spans (e.g. a generator reading
+    one day of data after the other) and yields network coincidence triggers
+    as soon as they are complete. Only single station triggers that may still
+    be part of an event continuing in the next chunk are carried over, so
+    weeks of data can be processed with bounded memory.
+
+    .. note::
+        Characteristic functions are computed separately for every chunk, so
+        chunks should be long compared to the trigger's averaging windows.
+        Single station triggers still active at the end of a chunk are
+        released at the end of that chunk. Similarity to event templates is
+        evaluated on the chunk in which the coincidence trigger starts.
+
+    :type streams: iterable of :class:`~obspy.core.stream.Stream`
+    :param streams: Consecutive chunks of waveform data for all stations.
+        The streams themselves are not changed.
+
+    See :func:`coincidenceTrigger` for all other parameters.
+
+    :rtype: generator
+    :returns: Event triggers in chronological order, see
+        :func:`coincidenceTrigger`.
+    """
+    if trace_ids is None:
+        # weights of newly encountered trace ids are added chunk by chunk
+        trace_ids = {}
+        use_all = True
+    else:
+        use_all = False
+        if isinstance(trace_ids, list) or isinstance(trace_ids, tuple):
+            trace_ids = dict.fromkeys(trace_ids, 1)
+    associator = _CoincidenceAssociator(thr_coincidence_sum, trace_ids,
+                                        trigger_off_extension, details,
+                                        event_templates, similarity_threshold)
+    for stream in streams:
+        st = stream.copy()
+        if use_all:
+            for tr in st:
+                trace_ids.setdefault(tr.id, 1)
+        triggers = _singleStationTriggers(st, trigger_type, thr_on, thr_off,
+                                          trace_ids, max_trigger_length,
+                                          delete_long_trigger, **options)
+        if not len(st):
+            continue
+        # all single station triggers up to the end of this chunk are known
+        watermark = max([tr.stats.endtime.timestamp for tr in st])
+        for event in associator.associate(triggers, stream, watermark):
+            yield event
+    for event in associator.associate([]):
+        yield event
+
+
+def _singleStationTriggers(st, trigger_type, thr_on, thr_off, trace_ids,
+                           max_trigger_length, delete_long_trigger,
+                           **options):
+    """
+    Helper function that computes the single station triggers of all traces
+    in a stream for :func:`coincidenceTrigger`.
+
+    Traces with IDs not in ``trace_ids`` are removed from the stream, the
+    data of all other traces is replaced by the characteristic function.
+
+    :returns: List of tuples (on, off, trace ID, peak and standard deviation
+        of characteristic function) with on and off times as POSIX
+        timestamps.
+    """
     triggers = []
     # prepare kwargs for triggerOnset
     kwargs = {'max_len_delete': delete_long_trigger}
-    for tr in st:
+    for tr in st.traces[:]:
         if tr.id not in trace_ids:
             msg = "At least one trace's ID was not found in the " + \
                   "trace ID list and was disregarded (%s)" % tr.id
             warnings.warn(msg, UserWarning)
-            continue
-        if trigger_type is not None:
-            tr.trigger(trigger_type, **options)
+            st.remove(tr)
+    # characteristic functions of all traces with same sampling rate and
+    # length are computed at once
+    if trigger_type is not None:
+        st.trigger(trigger_type, **options)
+    for tr in st:
         kwargs['max_len'] = max_trigger_length * tr.stats.sampling_rate
         tmp_triggers = triggerOnset(tr.data, thr_on, thr_off, **kwargs)
         for on, off in tmp_triggers:
-            cft_peak = tr.data[on:off].max()
-            cft_std = tr.data[on:off].std()
+            cft_peak = tr.data[int(on):int(off)].max()
+            cft_std = tr.data[int(on):int(off)].std()
             on = tr.stats.starttime + float(on) / tr.stats.sampling_rate
             off = tr.stats.starttime + float(off) / tr.stats.sampling_rate
             triggers.append((on.timestamp, off.timestamp, tr.id, cft_peak,
                              cft_std))
-    triggers.sort()
+    return triggers
 
-    # the coincidence triggering and coincidence sum computation
-    coincidence_triggers = []
-    last_off_time = 0.0
-    while triggers != []:
-        # remove first trigger from list and look for overlaps
-        on, off, tr_id, cft_peak, cft_std = triggers.pop(0)
-        sta = tr_id.split(".")[1]
+
+class _CoincidenceAssociator(object):
+    """
+    Compiles network coincidence triggers from single station triggers.
+
+    All triggers are kept in one chronologically sorted list that is swept
+    once, every trigger starting a candidate event and scanning forward only
+    as long as following triggers overlap. Triggers can be passed in
+    consecutive chunks, triggers of events that might be extended by the
+    next chunk are held back, everything else is discarded.
+
+    See :func:`coincidenceTrigger` for the parameters.
+    """
+    def __init__(self, thr_coincidence_sum, trace_ids,
+                 trigger_off_extension=0, details=False, event_templates={},
+                 similarity_threshold=0.7):
+        self.thr_coincidence_sum = thr_coincidence_sum
+        self.trace_ids = trace_ids
+        self.trigger_off_extension = trigger_off_extension
+        self.details = details
+        self.event_templates = event_templates
+        self.similarity_threshold = similarity_threshold
+        self._pending = []
+        self._streams = {}
+        self._chunk = 0
+        self._last_off_time = 0.0
+
+    def associate(self, triggers, stream=None, watermark=None):
+        """
+        Add single station triggers and return all completed events.
+
+        :type triggers: list
+        :param triggers: Single station triggers as returned by
+            :func:`_singleStationTriggers`.
+        :type stream: :class:`~obspy.core.stream.Stream`
+        :param stream: Waveform data used for the template similarity of
+            events starting in this chunk.
+        :type watermark: float
+        :param watermark: POSIX timestamp up to which all single station
+            triggers have been passed in. Events that might still be extended
+            by later triggers are held back. ``None`` means no more triggers
+            follow and all remaining events are returned.
+        :rtype: list
+        """
+        key = self._chunk
+        self._chunk += 1
+        self._streams[key] = stream
+        pending = self._pending
+        pending.extend([trigger + (key,) for trigger in triggers])
+        pending.sort()
+        extension = self.trigger_off_extension
+        events = []
+        n = len(pending)
+        i = 0
+        while i < n:
+            off = pending[i][1]
+            members = [pending[i]]
+            ids = set([pending[i][2]])
+            complete = False
+            # compile the list of stations that overlap with the current
+            # trigger
+            for j in xrange(i + 1, n):
+                tmp = pending[j]
+                # skip retriggering of already present station in current
+                # coincidence trigger
+                if tmp[2] in ids:
+                    continue
+                # check for overlapping trigger,
+                # break if there is a gap in between the two triggers
+                if tmp[0] > off + extension:
+                    complete = True
+                    break
+                members.append(tmp)
+                ids.add(tmp[2])
+                # allow sets of triggers that overlap only on subsets of all
+                # stations (e.g. A overlaps with B and B overlaps w/ C => ABC)
+                off = max(off, tmp[1])
+            # wait for the next chunk if it might still overlap
+            if not complete and watermark is not None and \
+               off + extension >= watermark:
+                break
+            i += 1
+            # skip coincidence trigger if it is just a subset of the previous
+            # (determined by a shared off-time, this is a bit sloppy)
+            if off <= self._last_off_time:
+                continue
+            event = self._compileEvent(members, off)
+            if event is None:
+                continue
+            events.append(event)
+            self._last_off_time = off
+        self._pending = pending[i:]
+        # release waveform data no longer needed for similarity checks
+        keys = set([trigger[5] for trigger in self._pending])
+        for key in self._streams.keys():
+            if key not in keys:
+                del self._streams[key]
+        return events
+
+    def _compileEvent(self, members, off):
+        """
+        Return coincidence trigger of given single station triggers or
+        ``None`` if neither coincidence sum nor similarity thresholds are met.
+        """
+        on = members[0][0]
         event = {}
         event['time'] = UTCDateTime(on)
-        event['stations'] = [tr_id.split(".")[1]]
-        event['trace_ids'] = [tr_id]
-        event['coincidence_sum'] = float(trace_ids[tr_id])
+        event['stations'] = [trigger[2].split(".")[1] for trigger in members]
+        event['trace_ids'] = [trigger[2] for trigger in members]
+        coincidence_sum = float(self.trace_ids[members[0][2]])
+        for trigger in members[1:]:
+            coincidence_sum += self.trace_ids[trigger[2]]
+        event['coincidence_sum'] = coincidence_sum
         event['similarity'] = {}
-        if details:
-            event['cft_peaks'] = [cft_peak]
-            event['cft_stds'] = [cft_std]
-        # evaluate maximum similarity for station if event templates were
-        # provided
-        templates = event_templates.get(sta)
-        if templates:
-            event['similarity'][sta] = \
-                templatesMaxSimilarity(stream, event['time'],
-                                                              templates)
-        # compile the list of stations that overlap with the current trigger
-        for trigger in triggers:
-            tmp_on, tmp_off, tmp_tr_id, tmp_cft_peak, tmp_cft_std = trigger
-            tmp_sta = tmp_tr_id.split(".")[1]
-            # skip retriggering of already present station in current
-            # coincidence trigger
-            if tmp_tr_id in event['trace_ids']:
-                continue
-            # check for overlapping trigger,
-            # break if there is a gap in between the two triggers
-            if tmp_on > off + trigger_off_extension:
-                break
-            event['stations'].append(tmp_sta)
-            event['trace_ids'].append(tmp_tr_id)
-            event['coincidence_sum'] += trace_ids[tmp_tr_id]
-            if details:
-                event['cft_peaks'].append(tmp_cft_peak)
-                event['cft_stds'].append(tmp_cft_std)
-            # allow sets of triggers that overlap only on subsets of all
-            # stations (e.g. A overlaps with B and B overlaps w/ C => ABC)
-            off = max(off, tmp_off)
-            # evaluate maximum similarity for station if event templates were
-            # provided
-            templates = event_templates.get(tmp_sta)
+        if self.details:
+            event['cft_peaks'] = [trigger[3] for trigger in members]
+            event['cft_stds'] = [trigger[4] for trigger in members]
+        # evaluate maximum similarity once per station if event templates
+        # were provided
+        stream = self._streams[members[0][5]]
+        for sta in set(event['stations']):
+            templates = self.event_templates.get(sta)
             if templates:
-                event['similarity'][tmp_sta] = \
+                event['similarity'][sta] = \
                     templatesMaxSimilarity(stream, event['time'], templates)
         # skip if both coincidence sum and similarity thresholds are not met
-        if event['coincidence_sum'] < thr_coincidence_sum:
+        if event['coincidence_sum'] < self.thr_coincidence_sum:
             if not event['similarity']:
-                continue
-            elif not any([val > similarity_threshold[sta] \
-                          for sta, val in event['similarity'].iteritems()]):
-                continue
-        # skip coincidence trigger if it is just a subset of the previous
-        # (determined by a shared off-time, this is a bit sloppy)
-        if off <= last_off_time:
-            continue
+                return None
+            thresholds = self.similarity_threshold
+            if not isinstance(thresholds, dict):
+                thresholds = dict.fromkeys(event['similarity'], thresholds)
+            if not any([val > thresholds[sta]
+                        for sta, val in event['similarity'].iteritems()]):
+                return None
         event['duration'] = off - on
-        if details:
-            weights = np.array([trace_ids[i] for i in event['trace_ids']])
+        if self.details:
+            weights = np.array([self.trace_ids[i] for i in event['trace_ids']])
             weighted_values = np.array(event['cft_peaks']) * weights
             event['cft_peak_wmean'] = weighted_values.sum() / weights.sum()
             weighted_values = np.array(event['cft_stds']) * weights
-            event['cft_std_wmean'] = \
-                (np.array(event['cft_stds']) * weights).sum() / weights.sum()
-        coincidence_triggers.append(event)
-        last_off_time = off
-    return coincidence_triggers
+            event['cft_std_wmean'] = weighted_values.sum() / weights.sum()
+        return event
 
 
 if __name__ == '__main__':
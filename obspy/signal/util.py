@@ -120,29 +120,42 @@ def enframe(x, win, inc):
     The length of the frames is given by the length of the window win().
     The centre of frame I is x((I-1)*inc+(length(win)+1)/2) for I=1,2,...
 
+    The frames are taken from a strided view of x, only the windowed and
+    demeaned output matrix is allocated.
+
     :param x: signal to split in frames
     :param win: window multiplied to each frame, length determines frame length
     :param inc: increment to shift frames, in samples
     :return f: output matrix, each frame occupies one row
     :return length, no_win: length of each frame in samples, number of frames
+
+    .. rubric:: Example
+
+    >>> f, length, no_win = enframe(np.arange(10.0), np.ones(4), 3)
+    >>> print(f)
+    [[-1.5 -0.5  0.5  1.5]
+     [-1.5 -0.5  0.5  1.5]
+     [-1.5 -0.5  0.5  1.5]]
     """
+    x = np.asarray(x)
     nx = len(x)
     nwin = len(win)
     if (nwin == 1):
-        length = win
+        length = int(win[0])
     else:
         #length = nextpow2(nwin)
         length = nwin
-    nf = int(fix((nx - length + inc) // inc))
-    #f = np.zeros((nf, length))
-    indf = inc * np.arange(nf)
-    inds = np.arange(length) + 1
-    f = x[(np.transpose(np.vstack([indf] * length)) + \
-           np.vstack([inds] * nf)) - 1]
+    nf = max(int(fix((nx - length + inc) // inc)), 0)
+    frames = np.lib.stride_tricks.as_strided(
+        x, shape=(nf, length), strides=(inc * x.strides[0], x.strides[0]))
     if (nwin > 1):
-        w = np.transpose(win)
-        f = f * np.vstack([w] * nf)
-    f = signal.detrend(f, type='constant')
+        f = frames * np.asarray(win)
+    else:
+        f = frames.copy()
+    # same as signal.detrend(f, type='constant') without temporary copies
+    if f.dtype.char not in 'dfDF':
+        f = f.astype('d')
+    f -= f.mean(axis=1)[:, np.newaxis]
     no_win, _ = f.shape
     return f, length, no_win
 